@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Compare loading the JSON dictionaries with opening dictionaries.bin.
+
+Each load path runs in a fresh interpreter so that load time and resident
+memory are measured from the same starting point. Lookups resolve every
+country alias plus as many misses, through a dict and through the packed
+perfect hash.
+
+Usage:
+    python benchmarks/bench_dictionaries.py [--repeat N] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def resident_bytes() -> int:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (FileNotFoundError, ValueError, AttributeError):
+        import resource  # not available on Windows
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def measure(mode: str) -> Dict[str, Any]:
+    """Load dictionaries one way and time lookups (runs in a child process)."""
+    from nns.dictionaries import DEFAULT_DICT_DIR, load_dictionaries, load_json
+    from nns.packed import PACKED_FILE, PackedDictionaries
+
+    before = resident_bytes()
+    start = time.perf_counter()
+    if mode == "json":
+        alias_map = load_dictionaries().country_alias_map
+    elif mode == "json-alias-map":
+        alias_map = load_json(DEFAULT_DICT_DIR / "country_alias_map.json")
+    else:
+        alias_map = PackedDictionaries(DEFAULT_DICT_DIR / PACKED_FILE).country_alias_map
+    load_seconds = time.perf_counter() - start
+    loaded = resident_bytes()
+
+    keys = list(alias_map)
+    queries = keys + [key + "#" for key in keys]
+    start = time.perf_counter()
+    found = sum(1 for q in queries if alias_map.get(q) is not None)
+    lookup_seconds = time.perf_counter() - start
+    assert found == len(keys)
+    return {
+        "mode": mode,
+        "load_ms": load_seconds * 1000,
+        "load_rss_kb": (loaded - before) // 1024,
+        "lookups": len(queries),
+        "lookup_ns": lookup_seconds / len(queries) * 1e9,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs packed dictionary loading")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode (default: 5)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child)))
+        return 0
+
+    results = []
+    for mode in ("json", "json-alias-map", "packed"):
+        runs = [
+            json.loads(subprocess.run(
+                [sys.executable, __file__, "--child", mode],
+                check=True, capture_output=True, text=True,
+            ).stdout)
+            for _ in range(args.repeat)
+        ]
+        results.append({
+            "mode": mode,
+            "runs": len(runs),
+            **{
+                key: statistics.median(run[key] for run in runs)
+                for key in ("load_ms", "load_rss_kb", "lookups", "lookup_ns")
+            },
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'mode':<16}{'load':>10}{'load RSS':>12}{'lookup':>12}")
+    for r in results:
+        print(f"{r['mode']:<16}{r['load_ms']:>8.2f}ms{r['load_rss_kb']:>9.0f} KB{r['lookup_ns']:>9.0f} ns")
+    print(f"  median of {args.repeat} runs; {results[0]['lookups']:.0f} lookups (half misses)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
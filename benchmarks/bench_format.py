@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Formatting cost next to parsing cost, per formatting strategy.
+
+Names are parsed once (timed as "parse"), then the parse results are
+formatted with each strategy:
+
+    per-node    merge the user config for every node, then format_node_name
+                (formatNodeName in plugin.js: mergeConfig on each call)
+    reference   format_node_name with a config merged once
+    compiled    a formatter from compile_formatter
+
+All strategies must produce identical names. Each config below is run in
+turn; the user config is kept as JSON text so that the per-node strategy
+also pays for decoding it, as the plugin does when reading config.json.
+
+Usage:
+    python benchmarks/bench_format.py [--size N] [--repeat N] [--corpus FILE] [--json]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench_rename import corpus, parse_size  # noqa: E402
+from nns import Engine, merge_config  # noqa: E402
+from nns.formatter import format_node_name  # noqa: E402
+
+# (label, user config, spec)
+CONFIGS = [
+    ("default", {}, "v2"),
+    ("en+city", {"language": "en", "includeCity": True, "separator": " | ", "maxTags": 5}, "v2"),
+    ("v1", {}, "v1"),
+]
+
+
+def timed(func: Callable[[], Any], repeat: int) -> float:
+    """Median seconds of repeat runs of func."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - start)
+    return statistics.median(runs)
+
+
+def run(size: int, repeat: int, path: Optional[Path]) -> List[Dict[str, Any]]:
+    engine = Engine.load()
+    names = list(corpus(size, path))
+    parsed: List[Any] = []
+
+    def parse_all() -> None:
+        parsed[:] = [engine.parse(name) for name in names]
+
+    parse_seconds = timed(parse_all, repeat)
+    results = [{"config": "-", "mode": "parse", "ns": parse_seconds / len(names) * 1e9}]
+
+    dicts = engine.dicts
+    for label, user_config, spec in CONFIGS:
+        config_text = json.dumps(user_config)
+        config = merge_config(user_config)
+        render = engine.compile_formatter(config, spec)
+        modes = {
+            "per-node": lambda: [
+                format_node_name(p, dicts, merge_config(json.loads(config_text)), spec) for p in parsed
+            ],
+            "reference": lambda: [format_node_name(p, dicts, config, spec) for p in parsed],
+            "compiled": lambda: [render(p) for p in parsed],
+        }
+        expected = modes["reference"]()
+        for mode, func in modes.items():
+            if func() != expected:
+                raise SystemExit(f"✗ {mode} output differs from format_node_name ({label})")
+            results.append({
+                "config": label,
+                "mode": mode,
+                "ns": timed(func, repeat) / len(names) * 1e9,
+            })
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark formatting separately from parsing")
+    parser.add_argument("--size", default="20k", help="Names to format (default: 20k)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per mode (default: 5)")
+    parser.add_argument("--corpus", type=Path,
+                        help="Names file (one per line, or generate_corpus.py JSON lines)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = run(parse_size(args.size), args.repeat, args.corpus)
+    parse_ns = results[0]["ns"]
+    for r in results[1:]:
+        r["share"] = r["ns"] / (parse_ns + r["ns"])
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'config':<10}{'mode':<11}{'per name':>11}{'of rename':>11}{'speedup':>9}")
+    print(f"{'':<10}{'parse':<11}{parse_ns / 1000:>8.2f} µs")
+    for r in results[1:]:
+        per_node = next(x["ns"] for x in results if x["config"] == r["config"] and x["mode"] == "per-node")
+        print(f"{r['config']:<10}{r['mode']:<11}{r['ns'] / 1000:>8.2f} µs{r['share']:>10.0%}"
+              f"{per_node / r['ns']:>8.1f}x")
+    print(f"  median of {args.repeat} runs over {parse_size(args.size):,} names; "
+          "'of rename' is format / (parse + format)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compare serial IP lookups (the plugin's per-node loop) with the probe scheduler.
+
+A local stub of the ip-api.com JSON API answers every request after a fixed
+latency, and optionally fails a share of first attempts with 503. The corpus
+repeats hosts the way subscriptions do (several nodes per server). Runs:
+
+    serial      one request at a time, in-memory cache (as IP_CACHE)
+    scheduler   ProbeScheduler, cold store
+    warm        the same scheduler again (every host from the store)
+
+Usage:
+    python benchmarks/bench_probe.py [--nodes N] [--hosts N] [--latency-ms MS]
+                                     [--workers N] [--fail-rate F] [--json]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import unquote, urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from nns.probe import ProbeScheduler, ProbeSpec, ProbeStore  # noqa: E402
+
+REGIONS = ["US", "HK", "JP", "SG", "TW", "KR", "DE", "GB"]
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, latency: float, fail_rate: float):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = 0
+        self.failed_once: set = set()
+        self.lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    server: StubServer
+
+    def do_GET(self) -> None:  # noqa: N802 (http.server API)
+        target = unquote(urlsplit(self.path).path.rsplit("/", 1)[-1])
+        digest = zlib.crc32(target.encode("utf-8"))
+        with self.server.lock:
+            self.server.requests += 1
+            fail = digest % 1000 < self.server.fail_rate * 1000 and target not in self.server.failed_once
+            if fail:
+                self.server.failed_once.add(target)
+        time.sleep(self.server.latency)
+        if fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps({
+            "status": "success",
+            "countryCode": REGIONS[digest % len(REGIONS)],
+            "city": "Stub City",
+            "query": target,
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+
+def corpus(nodes: int, hosts: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    servers = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(hosts)]
+    return [servers[i] if i < hosts else rng.choice(servers) for i in range(nodes)]
+
+
+def serial(spec: ProbeSpec, servers: List[str], timeout: float) -> Dict[str, Optional[str]]:
+    """One lookup per node, no retries, in-memory cache: lookupIPLocation's loop."""
+    located: Dict[str, Optional[str]] = {}
+    with ProbeScheduler(spec, ProbeStore(), workers=1, rate=None, retries=0, timeout=timeout) as scheduler:
+        for server in servers:
+            result = scheduler.probe(server)
+            located[server] = result.region if result else None
+    return located
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark serial IP lookups vs the probe scheduler")
+    parser.add_argument("--nodes", type=int, default=2000, help="Nodes in the subscription (default: 2000)")
+    parser.add_argument("--hosts", type=int, default=600, help="Distinct servers (default: 600)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="Stub API latency (default: 20 ms)")
+    parser.add_argument("--workers", type=int, default=32, help="Scheduler workers (default: 32)")
+    parser.add_argument("--fail-rate", type=float, default=0.05,
+                        help="Share of hosts whose first request gets a 503 (default: 0.05)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    server = StubServer(args.latency_ms / 1000, args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    spec = ProbeSpec(url=f"http://127.0.0.1:{server.server_address[1]}/json/${{target}}")
+    servers = corpus(args.nodes, args.hosts)
+    results = []
+
+    def record(mode: str, seconds: float, requests: int, located: int) -> None:
+        results.append({"mode": mode, "seconds": seconds, "requests": requests, "located": located})
+
+    before = server.requests
+    start = time.perf_counter()
+    located = serial(spec, servers, timeout=10)
+    record("serial", time.perf_counter() - start, server.requests - before,
+           sum(1 for s in servers if located[s]))
+
+    server.failed_once.clear()
+    store = ProbeStore()
+    scheduler = ProbeScheduler(spec, store, workers=args.workers, rate=None, backoff=0.05, timeout=10)
+    for mode in ("scheduler", "warm"):
+        before = server.requests
+        start = time.perf_counter()
+        found = scheduler.probe_all(servers)
+        record(mode, time.perf_counter() - start, server.requests - before,
+               sum(1 for s in servers if found[s]))
+    scheduler.close()
+    server.shutdown()
+
+    base = results[0]["seconds"]
+    for r in results:
+        r["speedup"] = base / r["seconds"] if r["seconds"] else float("inf")
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{args.nodes} nodes, {args.hosts} hosts, {args.latency_ms:g} ms API latency, "
+          f"{args.fail_rate:.0%} transient failures")
+    print(f"{'mode':<11}{'time':>10}{'requests':>10}{'located':>9}{'speedup':>9}")
+    for r in results:
+        print(f"{r['mode']:<11}{r['seconds']:>9.2f}s{r['requests']:>10}{r['located']:>9}{r['speedup']:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Parse + format throughput, per-name latency and memory at several corpus
+sizes.
+
+Corpora are built deterministically from spec/corpus/names.txt: the corpus
+is repeated up to the requested size, and every repetition after the first
+gets a node number suffix (" 01", " 02", ...) as real subscriptions do, so
+the same size always yields the same names. --corpus reads the names from a
+file instead (one per line, or the JSON lines of generate_corpus.py), using
+its first N names for size N. Each size runs in a fresh interpreter, which
+reports:
+
+    load_ms         Engine.load() (dictionaries + matcher)
+    names_per_sec   names / (parse + format wall time)
+    p50_us, p99_us  per-name parse + format latency
+    parse_share     fraction of the time spent in parse
+    peak_rss_kb     peak resident memory of the process
+
+Results can be saved with --output (together with the commit, dictionary
+version and file hashes, Python version and platform) and compared with a
+saved run using --compare.
+
+Usage:
+    python benchmarks/bench_rename.py [--sizes 1k,10k,100k,1m] [--repeat N]
+        [--spec v1|v2] [--corpus FILE] [--output FILE]
+        [--compare FILE [--max-slowdown F]] [--json]
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+CORPUS = ROOT / "spec" / "corpus" / "names.txt"
+RESULTS_FORMAT = 1
+DEFAULT_SIZES = "1k,10k,100k"
+
+# Median-of-runs fields; the rest are identical across runs
+MEASURES = ("load_ms", "names_per_sec", "p50_us", "p99_us", "parse_share", "peak_rss_kb")
+
+
+def parse_size(text: str) -> int:
+    """Parse a corpus size such as 5000, 10k or 1m."""
+    text = text.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def corpus(size: int, path: Optional[Path] = None) -> Iterator[str]:
+    """The first size names of the benchmark corpus or of a corpus file."""
+    if path is not None:
+        with path.open(encoding="utf-8") as f:
+            lines = (line.rstrip("\n") for line in f if line.strip())
+            for _, line in zip(range(size), lines):
+                yield json.loads(line)["name"] if line.startswith("{") else line
+        return
+    base = [line for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    for i in range(size):
+        repeat, index = divmod(i, len(base))
+        yield base[index] if repeat == 0 else f"{base[index]} {repeat:02d}"
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process (0 where unavailable)."""
+    try:
+        import resource  # not available on Windows
+    except ImportError:
+        return 0
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def percentile(ordered: List[int], q: float) -> int:
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+
+def measure(size: int, spec: str, path: Optional[Path] = None) -> Dict[str, Any]:
+    """Load the engine and rename a corpus (runs in a child process)."""
+    from nns import Engine, merge_config
+
+    start = time.perf_counter()
+    engine = Engine.load()
+    load_seconds = time.perf_counter() - start
+    config = merge_config()
+
+    clock = time.perf_counter_ns
+    latencies = array("q", bytes(8 * size))
+    parse_ns = total_ns = 0
+    count = 0
+    for i, name in enumerate(corpus(size, path)):
+        t0 = clock()
+        parsed = engine.parse(name)
+        t1 = clock()
+        engine.format(parsed, config, spec)
+        t2 = clock()
+        latencies[i] = t2 - t0
+        parse_ns += t1 - t0
+        total_ns += t2 - t0
+        count += 1
+
+    ordered = sorted(latencies[:count])
+    return {
+        "size": count,
+        "load_ms": load_seconds * 1000,
+        "names_per_sec": count / (total_ns / 1e9) if total_ns else 0.0,
+        "p50_us": percentile(ordered, 0.50) / 1000,
+        "p99_us": percentile(ordered, 0.99) / 1000,
+        "parse_share": parse_ns / total_ns if total_ns else 0.0,
+        "peak_rss_kb": peak_rss_bytes() // 1024,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """HEAD commit, with a "-dirty" suffix when the tree has changes."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, check=True, capture_output=True, text=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def environment(spec: str, repeat: int, path: Optional[Path]) -> Dict[str, Any]:
+    from nns.dictionaries import DEFAULT_DICT_DIR, dictionary_hashes
+
+    version = json.loads((DEFAULT_DICT_DIR / "version.json").read_text(encoding="utf-8"))
+    return {
+        "format": RESULTS_FORMAT,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "dict_version": version.get("version"),
+        "dict_hashes": dictionary_hashes(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "spec": spec,
+        "corpus": str(path) if path is not None else None,
+        "repeat": repeat,
+    }
+
+
+def run(sizes: List[int], spec: str, repeat: int, path: Optional[Path]) -> List[Dict[str, Any]]:
+    results = []
+    corpus_args = ["--corpus", str(path)] if path is not None else []
+    for size in sizes:
+        runs = [
+            json.loads(subprocess.run(
+                [sys.executable, __file__, "--child", str(size), "--spec", spec, *corpus_args],
+                check=True, capture_output=True, text=True,
+            ).stdout)
+            for _ in range(repeat)
+        ]
+        results.append({
+            "size": runs[0]["size"],
+            "runs": len(runs),
+            **{key: statistics.median(r[key] for r in runs) for key in MEASURES},
+        })
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-size change of throughput and p99 latency against a saved run."""
+    previous = {r["size"]: r for r in baseline["results"]}
+    changes = []
+    for r in results:
+        old = previous.get(r["size"])
+        if old is None or not old["names_per_sec"] or not old["p99_us"]:
+            continue
+        changes.append({
+            "size": r["size"],
+            "throughput_change": r["names_per_sec"] / old["names_per_sec"] - 1,
+            "p99_change": r["p99_us"] / old["p99_us"] - 1,
+        })
+    return changes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark parse + format throughput and latency")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated corpus sizes (default: {DEFAULT_SIZES})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per size (default: 3)")
+    parser.add_argument("--spec", choices=("v1", "v2"), default="v2", help="Output spec version")
+    parser.add_argument("--corpus", type=Path,
+                        help="Names file (one per line, or generate_corpus.py JSON lines)")
+    parser.add_argument("-o", "--output", type=Path, help="Save the results as JSON")
+    parser.add_argument("--compare", type=Path, help="Compare with results saved by --output")
+    parser.add_argument("--max-slowdown", type=float,
+                        help="With --compare: exit 1 if throughput dropped by more than this "
+                             "fraction (e.g. 0.1) at any size")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(measure(args.child, args.spec, args.corpus)))
+        return 0
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    report = environment(args.spec, args.repeat, args.corpus)
+    report["results"] = run(sizes, args.spec, args.repeat, args.corpus)
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        report["baseline"] = {key: baseline.get(key) for key in ("commit", "dict_version", "date")}
+        report["changes"] = compare(report["results"], baseline)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    regressed = args.max_slowdown is not None and any(
+        c["throughput_change"] < -args.max_slowdown for c in report.get("changes", [])
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 1 if regressed else 0
+
+    print(f"{'names':>9}{'load':>10}{'names/s':>11}{'p50':>10}{'p99':>10}{'parse':>8}{'peak RSS':>12}")
+    for r in report["results"]:
+        print(
+            f"{r['size']:>9,}{r['load_ms']:>8.1f}ms{r['names_per_sec']:>11,.0f}"
+            f"{r['p50_us']:>8.1f}µs{r['p99_us']:>8.1f}µs{r['parse_share']:>8.0%}"
+            f"{r['peak_rss_kb'] / 1024:>9.1f} MB"
+        )
+    print(f"  median of {args.repeat} runs; commit {report['commit'] or '?'}, "
+          f"dictionaries v{report['dict_version']}, spec {args.spec}")
+    if args.compare:
+        print(f"  vs {args.compare} (commit {report['baseline']['commit'] or '?'}):")
+        for c in report["changes"]:
+            print(f"  {c['size']:>9,}  throughput {c['throughput_change']:+.1%}, p99 {c['p99_change']:+.1%}")
+    if args.output:
+        print(f"  saved to {args.output}")
+    if regressed:
+        print(f"✗ throughput dropped by more than {args.max_slowdown:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
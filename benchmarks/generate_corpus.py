@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic node names with ground-truth labels.
+
+Names are assembled from the generated dictionaries the way providers write
+them: country and city aliases in Chinese, English, ISO codes and flags,
+line and tag aliases, multipliers, relay → exit chains built from
+keywords_connectors.json, node numbers, separators and decorative noise,
+plus status and ad lines. Each name is written as one JSON line together
+with what it was generated to mean:
+
+    {"name": "🇨🇦 加拿大 经由 香港 落地 美国 x2", "kind": "node", "region": "US",
+     "city": null, "line": null, "mult": 2, "tags": [], "path": ["CA", "HK"],
+     "exit": "US"}
+
+kind is "node", "status" or "ad"; the other labels are null/empty for
+status and ad lines. Output is a pure function of the seed, the profile and
+the dictionaries, and is streamed, so memory does not grow with the count.
+Aliases that would trip the status/ad rules are left out of node names,
+keeping the labels unambiguous.
+
+The profile sets the distributions. Keys of a JSON file given with
+--profile replace those of DEFAULT_PROFILE.
+
+--check reads a corpus back, parses every name and reports per-label
+accuracy and throughput.
+
+Usage:
+    python benchmarks/generate_corpus.py -n 1000000 [--seed N] [--profile FILE]
+        [-o corpus.jsonl] [--names-only]
+    python benchmarks/generate_corpus.py --check corpus.jsonl [--limit N] [--errors N]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from nns.dictionaries import Dictionaries, load_dictionaries  # noqa: E402
+from nns.engine import COMMON_COUNTRIES  # noqa: E402
+from nns.keywords import KeywordMatcher  # noqa: E402
+
+
+# Weights are relative; probabilities are in [0, 1]
+DEFAULT_PROFILE: Dict[str, Any] = {
+    "kinds": {"node": 0.9, "status": 0.06, "ad": 0.04},
+    # Share of node names located in COMMON_COUNTRIES
+    "common_countries": 0.8,
+    # How a country is written
+    "country_style": {"zh": 0.4, "en": 0.15, "code": 0.2, "flag": 0.15, "alias": 0.1},
+    # Probability that the exit location is a city (where the country has any)
+    "city": 0.35,
+    # Probability that the country is written before the city ("日本 东京")
+    "city_with_country": 0.5,
+    "line": 0.35,
+    "tag_count": {"0": 0.6, "1": 0.3, "2": 0.1},
+    "multiplier": 0.3,
+    "multiplier_values": {"0.5": 1, "1": 3, "1.5": 2, "2": 3, "3": 1, "5": 0.5, "10": 0.3},
+    # Relay hops before the exit
+    "relays": {"0": 0.8, "1": 0.15, "2": 0.05},
+    "chain_style": {"words": 0.5, "arrows": 0.5},
+    "node_number": 0.5,
+    "separator": {" ": 0.6, " | ": 0.15, "-": 0.1, "_": 0.05, "": 0.1},
+    # Probability of decorative symbols or brackets
+    "noise": 0.2,
+}
+
+NOISE_SYMBOLS = ["★", "☆", "◆", "●", "✦", "⚡", "🔥", "✨", "·", "•"]
+BRACKETS = [("【", "】"), ("[", "]"), ("(", ")"), ("「", "」")]
+ARROWS_SPACED = {"->", "=>"}
+
+STATUS_TEMPLATES = [
+    "剩余流量: {gb}GB | 到期: {date}",
+    "剩余流量：{gb}.{frac} GB",
+    "到期时间: {date}",
+    "Traffic: {gb}GB / {total}GB",
+    "Expire: {date}",
+    "距离下次重置剩余：{days} 天",
+    "{days} days left",
+    "已用流量 {gb}GB",
+]
+AD_TEMPLATES = [
+    "TG频道 @nodes{n}",
+    "官网 www.example{n}.com",
+    "订阅链接 https://sub{n}.example.net",
+    "Telegram: t.me/group{n}",
+    "购买请联系客服",
+    "邀请码 {n}",
+    "加入交流群 QQ群 {n}",
+]
+
+
+class Choice:
+    """Weighted choice over a fixed population."""
+
+    def __init__(self, weights: Dict[Any, float]):
+        self.population = list(weights)
+        self.cum_weights = list(accumulate(float(w) for w in weights.values()))
+        if not self.population or self.cum_weights[-1] <= 0:
+            raise ValueError(f"Weights must not be empty or all zero: {weights!r}")
+
+    def __call__(self, rng: random.Random) -> Any:
+        return rng.choices(self.population, cum_weights=self.cum_weights)[0]
+
+
+def load_profile(path: Optional[Path]) -> Dict[str, Any]:
+    """DEFAULT_PROFILE with the keys of a JSON profile file replaced.
+
+    Raises:
+        ValueError: If the file has keys that are not in DEFAULT_PROFILE
+    """
+    profile = dict(DEFAULT_PROFILE)
+    if path is not None:
+        overrides = json.loads(path.read_text(encoding="utf-8"))
+        unknown = sorted(set(overrides) - set(DEFAULT_PROFILE))
+        if unknown:
+            raise ValueError(f"Unknown profile keys: {', '.join(unknown)}")
+        profile.update(overrides)
+    return profile
+
+
+def _display(alias: str) -> str:
+    """Write a lowercased dictionary alias as a provider would."""
+    if not alias.isascii():
+        return alias
+    return alias.upper() if len(alias) <= 3 else alias.title()
+
+
+class CorpusGenerator:
+    """Seeded generator of labeled node names.
+
+    Args:
+        dicts: Loaded dictionaries
+        profile: Distributions (see DEFAULT_PROFILE)
+        seed: Random seed; equal seeds give equal output
+    """
+
+    def __init__(self, dicts: Dictionaries, profile: Optional[Dict[str, Any]] = None, seed: int = 0):
+        self.profile = profile if profile is not None else dict(DEFAULT_PROFILE)
+        self.rng = random.Random(seed)
+        p = self.profile
+        keywords = [KeywordMatcher(dicts.keywords_status), KeywordMatcher(dicts.keywords_ad)]
+
+        def clean(texts: Sequence[str]) -> List[str]:
+            # Sorted and deduplicated, so the output does not depend on set order
+            return sorted({t for t in texts if t and not any(k.matches(t) for k in keywords)})
+
+        self.countries: Dict[str, Dict[str, List[str]]] = {}
+        for cc, country in dicts.countries.items():
+            aliases = [a for a in country.get("aliases", []) if dicts.country_alias_map.get(a) == cc]
+            styles = {
+                "zh": clean([country.get("name_zh", "")]),
+                "en": clean([country.get("name_en", "")]),
+                "code": clean([cc]),
+                "flag": clean([f"{country['flag']} {country.get('name_zh', '')}"] if country.get("flag") else []),
+                "alias": clean([_display(a) for a in aliases]),
+            }
+            if styles["zh"] or styles["en"]:
+                self.countries[cc] = styles
+        self.common = [cc for cc in COMMON_COUNTRIES if cc in self.countries]
+        self.other = sorted(set(self.countries) - set(self.common))
+
+        self.cities: Dict[str, List[Tuple[str, List[str]]]] = {}
+        for cc, by_key in dicts.cities.items():
+            if cc not in self.countries:
+                continue
+            entries = []
+            for key, city in by_key.items():
+                names = clean([city.get("name_zh", ""), city.get("name_en", "")]
+                              + [_display(a) for a in city.get("aliases", [])])
+                if names:
+                    entries.append((key, names))
+            if entries:
+                self.cities[cc] = entries
+
+        def entity_names(table: Dict[str, Dict[str, Any]]) -> List[Tuple[str, List[str]]]:
+            entries = []
+            for code, entry in table.items():
+                names = clean([entry.get("display_zh", ""), entry.get("display_en", "")]
+                              + [_display(a) for a in entry.get("aliases", [])])
+                if names:
+                    entries.append((code, names))
+            return entries
+
+        self.lines = entity_names(dicts.lines)
+        self.tags = entity_names(dicts.tags)
+        connectors = dicts.keywords_connectors
+        self.via_words = list(connectors.get("via") or [])
+        self.exit_words = list(connectors.get("exit") or [])
+        self.arrows = list(connectors.get("arrow") or [])
+
+        self.kind = Choice(p["kinds"])
+        self.country_style = Choice(p["country_style"])
+        self.tag_count = Choice({int(k): w for k, w in p["tag_count"].items()})
+        self.multiplier_value = Choice({float(k): w for k, w in p["multiplier_values"].items()})
+        self.relays = Choice({int(k): w for k, w in p["relays"].items()})
+        self.chain_style = Choice(p["chain_style"])
+        self.separator = Choice(p["separator"])
+
+    # ---------- parts ----------
+
+    def _country(self, exclude: Sequence[str] = ()) -> str:
+        rng = self.rng
+        pool = self.common if self.common and rng.random() < self.profile["common_countries"] else self.other
+        pool = [cc for cc in pool if cc not in exclude] or [cc for cc in self.countries if cc not in exclude]
+        return rng.choice(pool)
+
+    def _write_country(self, cc: str) -> str:
+        styles = self.countries[cc]
+        style = self.country_style(self.rng)
+        options = styles.get(style) or styles["zh"] or styles["en"]
+        return self.rng.choice(options)
+
+    def _location(self, cc: str, allow_city: bool) -> Tuple[str, Optional[str]]:
+        """Text of a location in cc, and its city key if a city was written."""
+        rng = self.rng
+        if allow_city and cc in self.cities and rng.random() < self.profile["city"]:
+            key, names = rng.choice(self.cities[cc])
+            city = rng.choice(names)
+            if rng.random() < self.profile["city_with_country"]:
+                country = self._write_country(cc)
+                joiner = "" if not country.isascii() and not city.isascii() else " "
+                return f"{country}{joiner}{city}", key
+            return city, key
+        return self._write_country(cc), None
+
+    def _chain(self, relays: List[str], exit_text: str) -> str:
+        rng = self.rng
+        if self.chain_style(rng) == "arrows" and self.arrows:
+            arrow = rng.choice(self.arrows)
+            joiner = f" {arrow} " if arrow in ARROWS_SPACED or rng.random() < 0.5 else arrow
+            return joiner.join(relays + [exit_text])
+        parts = [relays[0]]
+        for relay in relays[1:]:
+            parts += [rng.choice(self.via_words), relay]
+        last = self.exit_words if self.exit_words and (len(relays) > 1 or rng.random() < 0.5) else self.via_words
+        parts += [rng.choice(last), exit_text]
+        return " ".join(parts)
+
+    # ---------- names ----------
+
+    def _status(self) -> Dict[str, Any]:
+        rng = self.rng
+        name = rng.choice(STATUS_TEMPLATES).format(
+            gb=rng.randint(1, 999), frac=rng.randint(0, 99), total=rng.choice([100, 200, 500, 1000]),
+            days=rng.randint(1, 365),
+            date=f"{rng.randint(2024, 2027)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        )
+        return self._labels(name, "status")
+
+    def _ad(self) -> Dict[str, Any]:
+        return self._labels(self.rng.choice(AD_TEMPLATES).format(n=self.rng.randint(1, 9999)), "ad")
+
+    @staticmethod
+    def _labels(name: str, kind: str, **labels: Any) -> Dict[str, Any]:
+        record = {
+            "name": name, "kind": kind, "region": None, "city": None, "line": None,
+            "mult": None, "tags": [], "path": [], "exit": None,
+        }
+        record.update(labels)
+        return record
+
+    def _node(self) -> Dict[str, Any]:
+        rng = self.rng
+        p = self.profile
+        exit_cc = self._country()
+        hops = self.relays(rng) if self.via_words or self.arrows else 0
+        path: List[str] = []
+        for _ in range(hops):
+            path.append(self._country(exclude=path + [exit_cc]))
+        exit_text, city = self._location(exit_cc, allow_city=True)
+        location = self._chain([self._write_country(cc) for cc in path], exit_text) if path else exit_text
+
+        parts = [location]
+        line = None
+        if self.lines and rng.random() < p["line"]:
+            line, names = rng.choice(self.lines)
+            parts.append(rng.choice(names))
+        tags: List[str] = []
+        for _ in range(self.tag_count(rng)):
+            code, names = rng.choice(self.tags)
+            if code not in tags:
+                tags.append(code)
+                parts.append(rng.choice(names))
+        mult = None
+        if rng.random() < p["multiplier"]:
+            mult = self.multiplier_value(rng)
+            value = f"{mult:g}"
+            parts.append(rng.choice([f"x{value}", f"{value}x", f"×{value}", f"x {value}"]))
+        if rng.random() < p["node_number"]:
+            parts.insert(1 if mult is None else -1, f"{rng.randint(1, 99):02d}")
+
+        separator = self.separator(rng)
+        name = parts[0] + "".join(
+            (" " if separator == "" and part.isascii() else separator) + part for part in parts[1:]
+        )
+        if rng.random() < p["noise"]:
+            if rng.random() < 0.5:
+                left, right = rng.choice(BRACKETS)
+                name = f"{left}{name}{right}"
+            else:
+                name = f"{rng.choice(NOISE_SYMBOLS)} {name} {rng.choice(NOISE_SYMBOLS)}".strip()
+        return self._labels(
+            name, "node", region=exit_cc, city=city, line=line, mult=mult,
+            tags=sorted(tags), path=path, exit=exit_cc,
+        )
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        make = {"node": self._node, "status": self._status, "ad": self._ad}
+        while True:
+            yield make[self.kind(self.rng)]()
+
+
+def write_corpus(generator: CorpusGenerator, count: int, out: TextIO, names_only: bool = False) -> None:
+    """Write count names, one JSON object (or bare name) per line."""
+    for _, record in zip(range(count), generator):
+        out.write(record["name"] if names_only else json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+
+
+# ---------- accuracy check ----------
+
+LABELS = ("kind", "region", "city", "line", "mult", "tags", "path", "exit")
+
+
+def read_corpus(path: Path) -> Iterator[Dict[str, Any]]:
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def check_corpus(path: Path, limit: Optional[int] = None, errors: int = 0) -> Dict[str, Any]:
+    """Parse a labeled corpus and compare every label with the engine's result."""
+    from nns import Engine
+
+    engine = Engine.load()
+    correct: Counter = Counter()
+    total: Counter = Counter()
+    exact = names = 0
+    samples: List[Dict[str, Any]] = []
+    seconds = 0.0
+    for record in read_corpus(path):
+        if limit is not None and names >= limit:
+            break
+        start = time.perf_counter()
+        parsed = engine.parse(record["name"])
+        seconds += time.perf_counter() - start
+        names += 1
+
+        kind = "status" if parsed.is_status else "ad" if parsed.is_ad else "node"
+        got = {"kind": kind, "region": parsed.region, "city": parsed.city, "line": parsed.line,
+               "mult": parsed.mult, "tags": sorted(parsed.tags), "path": parsed.path, "exit": parsed.exit}
+        # Location labels only count for names generated as nodes
+        labels = LABELS if record["kind"] == "node" else ("kind",)
+        wrong = [label for label in labels if got[label] != record[label]]
+        for label in labels:
+            total[label] += 1
+            correct[label] += label not in wrong
+        exact += not wrong
+        if wrong and len(samples) < errors:
+            samples.append({"name": record["name"], "wrong": {k: [record[k], got[k]] for k in wrong}})
+    return {
+        "names": names,
+        "names_per_sec": names / seconds if seconds else 0.0,
+        "exact": exact / names if names else 0.0,
+        "accuracy": {label: correct[label] / total[label] for label in LABELS if total[label]},
+        "errors": samples,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Generate labeled synthetic node names")
+    parser.add_argument("-n", "--count", type=int, default=100_000, help="Names to write (default: 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--profile", type=Path, help="JSON file overriding DEFAULT_PROFILE keys")
+    parser.add_argument("-o", "--output", type=Path, help="Output file (default: stdout)")
+    parser.add_argument("--names-only", action="store_true", help="Write bare names, one per line")
+    parser.add_argument("--check", type=Path, metavar="CORPUS", help="Report parse accuracy on a corpus")
+    parser.add_argument("--limit", type=int, help="With --check: names to read")
+    parser.add_argument("--errors", type=int, default=0, help="With --check: mismatches to show")
+    args = parser.parse_args()
+
+    if args.check:
+        report = check_corpus(args.check, args.limit, args.errors)
+        print(f"{report['names']:,} names, {report['names_per_sec']:,.0f} names/s parse, "
+              f"{report['exact']:.1%} fully correct")
+        for label, share in report["accuracy"].items():
+            print(f"  {label:<8}{share:>8.1%}")
+        for sample in report["errors"]:
+            print(f"  ✗ {sample['name']}: " + ", ".join(
+                f"{label} {want!r} got {got!r}" for label, (want, got) in sample["wrong"].items()))
+        return 0
+
+    try:
+        generator = CorpusGenerator(load_dictionaries(), load_profile(args.profile), args.seed)
+    except ValueError as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    if args.output:
+        with args.output.open("w", encoding="utf-8") as out:
+            write_corpus(generator, args.count, out, args.names_only)
+        print(f"✓ Wrote {args.count:,} names to {args.output} "
+              f"(seed {args.seed}) in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    else:
+        write_corpus(generator, args.count, sys.stdout, args.names_only)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
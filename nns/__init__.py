@@ -0,0 +1,74 @@
+"""
+Node Naming Standard (NNS) - Python reference engine.
+
+Loads the generated dictionaries (dict/generated) and parses/formats node
+names with the same semantics as plugin/plugin.js.
+
+Example:
+    >>> from nns import Engine, merge_config
+    >>> engine = Engine.load()
+    >>> engine.rename("香港 IEPL 奈飞", merge_config())
+    '🇭🇰 HK 专线 → HK [奈飞]'
+"""
+from .automaton import AhoCorasick
+from .batch import BatchRenamer
+from .cache import ResultCache
+from .columnar import ParsedColumns
+from .dictionaries import DEFAULT_DICT_DIR, Dictionaries, load_dictionaries
+from .engine import Engine, ParseResult
+from .formatter import DEFAULT_CONFIG, CompiledFormatter, compile_formatter, format_node_name, merge_config
+from .geoip import GeoIPIndex, load_geoip
+from .keywords import KeywordMatcher, compile_keywords
+from .lexer import Lexed, Lexer
+from .matcher import IndexEntry, Match, UniversalMatcher, build_universal_index, normalize
+from .metrics import Profiler
+from .packed import PackedDictionaries, load_packed
+from .probe import ProbeResult, ProbeScheduler, ProbeSpec, ProbeStore
+from .reload import EngineHandle, ReloadStats
+from .rename import Renamer, RenameStats
+from .service import RenameService
+from .tags import TagIndex
+from .update import update_dictionaries, verify_dictionaries
+
+__all__ = [
+    "AhoCorasick",
+    "BatchRenamer",
+    "CompiledFormatter",
+    "DEFAULT_CONFIG",
+    "DEFAULT_DICT_DIR",
+    "Dictionaries",
+    "Engine",
+    "EngineHandle",
+    "GeoIPIndex",
+    "IndexEntry",
+    "KeywordMatcher",
+    "Lexed",
+    "Lexer",
+    "Match",
+    "PackedDictionaries",
+    "ParseResult",
+    "ParsedColumns",
+    "ProbeResult",
+    "ProbeScheduler",
+    "ProbeSpec",
+    "ProbeStore",
+    "Profiler",
+    "ReloadStats",
+    "RenameService",
+    "RenameStats",
+    "Renamer",
+    "ResultCache",
+    "TagIndex",
+    "UniversalMatcher",
+    "build_universal_index",
+    "compile_formatter",
+    "compile_keywords",
+    "format_node_name",
+    "load_dictionaries",
+    "load_geoip",
+    "load_packed",
+    "merge_config",
+    "normalize",
+    "update_dictionaries",
+    "verify_dictionaries",
+]
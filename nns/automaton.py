@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Aho-Corasick multi-pattern automaton.
+
+Finds every occurrence of every pattern in a single pass over the text, so the
+cost per text depends on its length and the number of hits, not on the number
+of patterns.
+"""
+from collections import deque
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher.
+
+    Pattern IDs are the positions of the patterns in the input sequence.
+
+    Example:
+        >>> ac = AhoCorasick(["he", "she", "hers"])
+        >>> sorted(ac.find_all("ushers"))
+        [(0, 2, 4), (1, 1, 4), (2, 2, 6)]
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns: List[str] = list(patterns)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        own: List[List[int]] = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    own.append([])
+                state = nxt
+            own[state].append(pattern_id)
+
+        # Breadth-first pass: failure links and merged outputs
+        self._out = [()] * len(self._goto)
+        queue = deque()
+        for ch, child in self._goto[0].items():
+            self._fail[child] = 0
+            self._out[child] = tuple(own[child])
+            queue.append(child)
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = tuple(own[child]) + self._out[self._fail[child]]
+
+    @classmethod
+    def from_tables(cls, patterns: Sequence[str], tables: Dict[str, Any]) -> "AhoCorasick":
+        """Restore an automaton from tables produced by to_tables, without rebuilding it.
+
+        Args:
+            patterns: Patterns the tables were built from
+            tables: Serialized goto/fail/out tables
+
+        Returns:
+            Ready-to-use automaton
+        """
+        ac = cls.__new__(cls)
+        ac.patterns = list(patterns)
+        ac._goto = [dict(zip(chars, children)) for chars, children in tables["goto"]]
+        ac._fail = list(tables["fail"])
+        ac._out = [tuple(ids) for ids in tables["out"]]
+        if not (len(ac._goto) == len(ac._fail) == len(ac._out)):
+            raise ValueError("Inconsistent automaton tables")
+        return ac
+
+    def to_tables(self) -> Dict[str, Any]:
+        """Serialize the automaton into JSON-compatible tables.
+
+        ``goto`` holds one ``[chars, children]`` pair per state, ``fail`` the
+        failure link and ``out`` the pattern IDs reported at each state.
+        """
+        return {
+            "goto": [["".join(g.keys()), list(g.values())] for g in self._goto],
+            "fail": list(self._fail),
+            "out": [list(ids) for ids in self._out],
+        }
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    @property
+    def state_count(self) -> int:
+        """Number of states in the automaton (including the root)."""
+        return len(self._goto)
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield every pattern occurrence in the text.
+
+        Args:
+            text: Text to scan
+
+        Yields:
+            (pattern_id, start, end) tuples, ordered by end offset
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        patterns = self.patterns
+        state = 0
+        for pos, ch in enumerate(text):
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            if out[state]:
+                end = pos + 1
+                for pattern_id in out[state]:
+                    yield pattern_id, end - len(patterns[pattern_id]), end
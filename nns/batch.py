@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Parallel batch renaming across many subscriptions.
+
+Subscriptions are split into chunks that are renamed by a process pool; each
+worker loads the dictionaries once in its initializer. Results are put back
+in input order (and ``--dedupe`` numbering is applied afterwards in that
+order), so the output does not depend on the number of workers or on
+scheduling (SPEC §10).
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from .cache import DEFAULT_DISK_ENTRIES, ResultCache
+from .engine import Engine
+from .formatter import merge_config
+from .rename import Renamer, RenameStats, UniqueNames
+
+
+# Names per task; large subscriptions are split into several chunks
+DEFAULT_CHUNK_SIZE = 2000
+
+# Per-process state set up by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+
+def available_cores() -> int:
+    """Number of CPU cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+@dataclass
+class WorkerStats:
+    """Work done by one pool process."""
+    pid: int
+    load_seconds: float = 0.0
+    busy_seconds: float = 0.0
+    chunks: int = 0
+    names: int = 0
+    cache_hits: int = 0
+
+    def summary(self) -> str:
+        rate = self.names / self.busy_seconds if self.busy_seconds > 0 else 0.0
+        return (
+            f"worker {self.pid}: {self.names} names in {self.chunks} chunks, "
+            f"busy {self.busy_seconds:.2f}s ({rate:,.0f} names/s), "
+            f"{self.cache_hits} cache hits, dict load {self.load_seconds * 1000:.0f}ms"
+        )
+
+
+def _init_worker(
+    dict_dir: Optional[Path],
+    config: Optional[Dict[str, Any]],
+    spec: str,
+    cache_path: Optional[Path] = None,
+    cache_entries: int = DEFAULT_DISK_ENTRIES,
+    segment_connectors: bool = False,
+) -> None:
+    start = time.perf_counter()
+    engine = Engine.load(dict_dir, segment_connectors)
+    config = merge_config(config)
+    cache = None
+    if cache_path is not None:
+        cache = ResultCache(engine, config, spec, cache_path, disk_entries=cache_entries)
+    _WORKER["renamer"] = Renamer(engine, config, spec, cache=cache)
+    _WORKER["load_seconds"] = time.perf_counter() - start
+
+
+def _rename_chunk(
+    task: Tuple[int, List[str]]
+) -> Tuple[int, int, float, float, int, List[Optional[str]]]:
+    index, names = task
+    renamer: Renamer = _WORKER["renamer"]
+    cache = renamer.cache
+    hits_before = cache.stats.hits if cache is not None else 0
+    start = time.perf_counter()
+    results = [renamer.rename(name) for name in names]
+    if cache is not None:
+        # Pool processes have no shutdown hook: persist after every chunk
+        cache.flush()
+    hits = cache.stats.hits - hits_before if cache is not None else 0
+    busy = time.perf_counter() - start
+    return index, os.getpid(), _WORKER["load_seconds"], busy, hits, results
+
+
+class BatchRenamer:
+    """Rename many subscriptions with a process pool.
+
+    Args:
+        config: User config (config.json); merged over the defaults
+        spec: Output spec version, "v1" or "v2"
+        dedupe: Number repeated output names within each subscription;
+            one flag for all subscriptions or one per subscription
+        workers: Pool size (defaults to the available cores); 1 renames
+            in-process without a pool
+        chunk_size: Names per task
+        dict_dir: Directory of the generated dictionaries
+        cache_path: SQLite result cache shared by the workers (see
+            ResultCache)
+        cache_entries: Maximum entries kept in the cache file
+        segment_connectors: Parse names with connectors by SPEC v2 §7
+            segments (see Engine)
+    """
+
+    def __init__(
+        self,
+        config: Optional[Dict[str, Any]] = None,
+        spec: str = "v2",
+        dedupe: Union[bool, Sequence[bool]] = False,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        dict_dir: Optional[Path] = None,
+        cache_path: Optional[Path] = None,
+        cache_entries: int = DEFAULT_DISK_ENTRIES,
+        segment_connectors: bool = False,
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.config = config
+        self.spec = spec
+        self.dedupe = dedupe
+        self.workers = workers or available_cores()
+        self.chunk_size = chunk_size
+        self.dict_dir = dict_dir
+        self.cache_path = cache_path
+        self.cache_entries = cache_entries
+        self.segment_connectors = segment_connectors
+        self.stats = RenameStats()
+        self.worker_stats: Dict[int, WorkerStats] = {}
+
+    def _tasks(self, subscriptions: Sequence[Sequence[str]]) -> Iterator[Tuple[int, List[str]]]:
+        index = 0
+        for names in subscriptions:
+            for start in range(0, len(names), self.chunk_size):
+                yield index, list(names[start:start + self.chunk_size])
+                index += 1
+
+    def _run(self, tasks: List[Tuple[int, List[str]]]) -> Iterator[Tuple[Any, ...]]:
+        initargs = (
+            self.dict_dir, self.config, self.spec, self.cache_path, self.cache_entries,
+            self.segment_connectors,
+        )
+        if self.workers == 1:
+            _init_worker(*initargs)
+            return map(_rename_chunk, tasks)
+        executor = ProcessPoolExecutor(
+            max_workers=min(self.workers, max(len(tasks), 1)),
+            initializer=_init_worker,
+            initargs=initargs,
+        )
+
+        def results() -> Iterator[Tuple[Any, ...]]:
+            with executor:
+                yield from executor.map(_rename_chunk, tasks)
+
+        return results()
+
+    def rename_all(self, subscriptions: Sequence[Sequence[str]]) -> List[List[Optional[str]]]:
+        """Rename every name of every subscription.
+
+        Args:
+            subscriptions: Proxy names of each subscription
+
+        Returns:
+            New names per subscription, aligned with the input; None marks
+            a dropped proxy
+        """
+        self.stats = RenameStats()
+        self.worker_stats = {}
+        tasks = list(self._tasks(subscriptions))
+
+        chunk_results: List[List[Optional[str]]] = [[] for _ in tasks]
+        for index, pid, load_seconds, busy, hits, results in self._run(tasks):
+            chunk_results[index] = results
+            worker = self.worker_stats.setdefault(pid, WorkerStats(pid, load_seconds))
+            worker.busy_seconds += busy
+            worker.chunks += 1
+            worker.cache_hits += hits
+            worker.names += len(results)
+
+        # Reassemble in input order
+        output: List[List[Optional[str]]] = []
+        chunks = iter(chunk_results)
+        dedupe = (
+            [self.dedupe] * len(subscriptions) if isinstance(self.dedupe, bool) else list(self.dedupe)
+        )
+        if len(dedupe) != len(subscriptions):
+            raise ValueError("Expected one dedupe flag per subscription")
+        for names, dedupe_names in zip(subscriptions, dedupe):
+            unique = UniqueNames() if dedupe_names else None
+            renamed: List[Optional[str]] = []
+            for _ in range(0, len(names), self.chunk_size):
+                renamed.extend(next(chunks))
+            for i, (name, new_name) in enumerate(zip(names, renamed)):
+                if new_name is not None and unique is not None:
+                    new_name = renamed[i] = unique(new_name)
+                self.stats.count(name, new_name)
+            output.append(renamed)
+        self.stats.stop()
+        return output
+
+    def summary(self) -> str:
+        lines = [f"{self.stats.summary()} on {len(self.worker_stats)} worker(s)"]
+        lines.extend(
+            "  " + self.worker_stats[pid].summary() for pid in sorted(self.worker_stats)
+        )
+        return "\n".join(lines)
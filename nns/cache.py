@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Parse/format result cache: an in-memory LRU in front of an optional SQLite
+store.
+
+Entries live in a namespace derived from the SHA-256 of every loaded
+dictionary file, the merged config, the output spec version and the
+engine's parse mode, so a change to any of them never returns stale results. The store is also cleared when
+version.json changes, which drops entries of old dictionary versions instead
+of letting them age out.
+
+Names are used as keys verbatim: the formatter echoes the original name for
+kept status/ad lines and regionless names, and status/ad/multiplier rules
+look at the raw text, so no normalization preserves the results.
+
+Several processes may share one store (nns batch opens one per worker).
+Writes run in BEGIN IMMEDIATE transactions: SQLite assigns row ids, recency
+is a logical clock read inside the transaction, and the row count that
+drives eviction is kept in the meta table and updated in the same
+transactions. Namespace ids are never reused, not even when version.json
+changes, so a process still on the old dictionaries cannot write into the
+namespace of the new ones.
+"""
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from .dictionaries import dictionary_hashes
+from .engine import Engine, ParseResult
+
+
+CACHE_FORMAT = 2
+
+DEFAULT_MEMORY_ENTRIES = 10_000
+DEFAULT_DISK_ENTRIES = 1_000_000
+
+# Pending writes are committed in batches of this size
+WRITE_BATCH = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS namespaces (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    ns INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    parsed TEXT NOT NULL,
+    formatted TEXT,
+    last_used INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS results_key ON results (ns, name);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+"""
+
+
+# ParseResult is stored as a JSON array in field order
+_PARSE_FIELDS = [f.name for f in fields(ParseResult)]
+
+
+def _encode_parsed(parsed: ParseResult) -> str:
+    return json.dumps([getattr(parsed, name) for name in _PARSE_FIELDS], ensure_ascii=False)
+
+
+class CachedResult:
+    """Cached parse and format result of one name (treat as read-only).
+
+    Results read from the store decode the parse result on first access.
+    """
+    __slots__ = ("formatted", "_parsed", "_encoded")
+
+    def __init__(self, parsed: Optional[ParseResult], formatted: Optional[str],
+                 encoded: Optional[str] = None):
+        self.formatted = formatted
+        self._parsed = parsed
+        self._encoded = encoded
+
+    @property
+    def parsed(self) -> ParseResult:
+        if self._parsed is None:
+            self._parsed = ParseResult(*json.loads(self._encoded))
+        return self._parsed
+
+
+@dataclass
+class CacheStats:
+    """Cache counters."""
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"cache {self.hit_rate:.1%} hits ({self.memory_hits} memory, "
+            f"{self.disk_hits} disk, {self.misses} misses, {self.evictions} evicted)"
+        )
+
+
+def config_hash(config: Dict[str, Any], spec: str = "v2") -> str:
+    """Hash of a merged config and output spec version."""
+    payload = json.dumps({"config": config, "spec": spec}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Memoize parse/format results of one engine, config and spec version.
+
+    Args:
+        engine: Engine whose results are cached; its dictionary directory
+            is hashed to build the namespace
+        config: Merged config (see merge_config)
+        spec: Output spec version
+        path: SQLite file for the persistent store; None keeps the cache
+            in memory only
+        memory_entries: LRU capacity
+        disk_entries: Maximum rows in the store; the least recently used
+            rows are evicted beyond it
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        config: Dict[str, Any],
+        spec: str = "v2",
+        path: Optional[Union[str, Path]] = None,
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        disk_entries: int = DEFAULT_DISK_ENTRIES,
+    ):
+        source_dir = engine.dicts.source_dir
+        hashes = dictionary_hashes(source_dir)
+        self.config_hash = config_hash(config, spec)
+        namespace: Dict[str, Any] = {
+            "format": CACHE_FORMAT,
+            "dicts": hashes,
+            "config": self.config_hash,
+        }
+        if engine.segment_connectors:
+            # Parses differently; plugin-compatible namespaces stay as they were
+            namespace["segment_connectors"] = True
+        self.namespace = hashlib.sha256(
+            json.dumps(namespace, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:32]
+        self.version_hash = hashes.get("version.json", "")
+
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.stats = CacheStats()
+        self._memory: "OrderedDict[str, CachedResult]" = OrderedDict()
+        self._pending: Dict[str, CachedResult] = {}
+        self._touched: List[str] = []
+
+        self.path = Path(path) if path is not None else None
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path is not None:
+            self._open()
+
+    def _open(self) -> None:
+        # Transactions are explicit (see _write)
+        self._db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._write() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            version = f"{CACHE_FORMAT}:{self.version_hash}"
+            row = db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or not row[0].startswith(f"{CACHE_FORMAT}:"):
+                # New store or another cache format: recreate the tables
+                db.execute("DROP TABLE IF EXISTS results")
+                db.execute("DROP TABLE IF EXISTS namespaces")
+            elif row[0] != version:
+                # version.json changed: drop the results but keep the
+                # namespaces, whose ids other processes may still hold
+                self.stats.invalidations += 1
+                db.execute("DELETE FROM results")
+            if row is None or row[0] != version:
+                db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (version,))
+                self._set_rows(db, 0)
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    db.execute(statement)
+            if db.execute("SELECT 1 FROM meta WHERE key = 'rows'").fetchone() is None:
+                # Store written before the row count was kept
+                self._set_rows(db, db.execute("SELECT COUNT(*) FROM results").fetchone()[0])
+            db.execute("INSERT OR IGNORE INTO namespaces (key) VALUES (?)", (self.namespace,))
+            self._ns_id = db.execute(
+                "SELECT id FROM namespaces WHERE key = ?", (self.namespace,)
+            ).fetchone()[0]
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction that holds the store's write lock throughout."""
+        assert self._db is not None
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._db
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    @staticmethod
+    def _rows(db: sqlite3.Connection) -> int:
+        """Rows in the store, as counted in the meta table."""
+        return int(db.execute("SELECT value FROM meta WHERE key = 'rows'").fetchone()[0])
+
+    @staticmethod
+    def _set_rows(db: sqlite3.Connection, rows: int) -> None:
+        db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('rows', ?)", (str(rows),))
+
+    def _remember(self, name: str, result: CachedResult) -> None:
+        self._memory[name] = result
+        if len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, name: str) -> Optional[CachedResult]:
+        """Look up a name; returns None on a miss."""
+        result = self._memory.get(name)
+        if result is not None:
+            self._memory.move_to_end(name)
+            self.stats.memory_hits += 1
+            return result
+
+        result = self._pending.get(name)
+        if result is None and self._db is not None:
+            row = self._db.execute(
+                "SELECT parsed, formatted FROM results WHERE ns = ? AND name = ?",
+                (self._ns_id, name),
+            ).fetchone()
+            if row is not None:
+                result = CachedResult(None, row[1], row[0])
+                self._touched.append(name)
+        if result is None:
+            self.stats.misses += 1
+            return None
+
+        self.stats.disk_hits += 1
+        self._remember(name, result)
+        return result
+
+    def put(self, name: str, parsed: ParseResult, formatted: Optional[str]) -> None:
+        """Store the result of a name."""
+        result = CachedResult(parsed, formatted)
+        self._remember(name, result)
+        if self._db is None:
+            return
+        self._pending[name] = result
+        if len(self._pending) + len(self._touched) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending entries and evict rows beyond the size limit."""
+        if self._db is None or not (self._pending or self._touched):
+            return
+        with self._write() as db:
+            # Every row written or read since the last flush gets the same tick
+            tick = db.execute("SELECT COALESCE(MAX(last_used), 0) + 1 FROM results").fetchone()[0]
+            inserted = 0 if not self._pending else db.executemany(
+                "INSERT INTO results (ns, name, parsed, formatted, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (ns, name) DO NOTHING",
+                [
+                    (self._ns_id, name, _encode_parsed(result.parsed), result.formatted, tick)
+                    for name, result in self._pending.items()
+                ],
+            ).rowcount
+            used = list(self._touched)
+            if inserted < len(self._pending):
+                # Another process stored some of these names first
+                used.extend(self._pending)
+            db.executemany(
+                "UPDATE results SET last_used = ? WHERE ns = ? AND name = ?",
+                [(tick, self._ns_id, name) for name in used],
+            )
+
+            rows = self._rows(db) + inserted
+            excess = rows - self.disk_entries
+            if excess > 0:
+                cur = db.execute(
+                    "DELETE FROM results WHERE id IN "
+                    "(SELECT id FROM results ORDER BY last_used, id LIMIT ?)",
+                    (excess,),
+                )
+                rows -= cur.rowcount
+                self.stats.evictions += cur.rowcount
+            self._set_rows(db, rows)
+        self._pending.clear()
+        self._touched.clear()
+
+    def clear(self) -> None:
+        """Drop every entry (memory and store)."""
+        self._memory.clear()
+        self._pending.clear()
+        self._touched.clear()
+        if self._db is not None:
+            with self._write() as db:
+                db.execute("DELETE FROM results")
+                self._set_rows(db, 0)
+
+    def close(self) -> None:
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        if self._db is None:
+            return len(self._memory)
+        return self._rows(self._db) + len(self._pending)
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
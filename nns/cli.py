@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Command-line interface.
+
+Usage:
+    python -m nns rename [INPUT] [-o OUTPUT] [--format FORMAT] [--config config.json]
+                         [--spec v1|v2] [--language zh|en]
+                         [--status-policy hide|keep] [--ad-policy hide|keep] [--profile]
+                         [--segment-connectors]
+    python -m nns batch INPUT... -d OUT_DIR [--jobs N] [--chunk-size N] [options]
+    python -m nns update STORE [--version VERSION] [--dict-dir DIR] [--dry-run]
+    python -m nns verify [--dict-dir DIR] [--store STORE [--version VERSION]]
+    python -m nns probe [INPUT] [-o OUTPUT] [--store probes.db] [--workers N] [--rate R]
+                        [--timeout S] [--retries N] [--spec spec.json]
+    python -m nns serve [--host HOST] [--port PORT | --unix PATH] [--max-batch N]
+                        [--max-delay-ms MS] [--watch SECONDS] [--config config.json]
+                        [--spec v1|v2] [options]
+
+``rename``: INPUT and OUTPUT default to stdin/stdout ("-"). The input is
+processed as a stream and results are written as they are produced; a
+throughput summary is printed to stderr at the end. ``--profile`` adds a
+report of the time spent in each parse/format stage, the slowest names and
+the most matched aliases (nns/metrics.py).
+
+``batch``: renames many subscription files with a process pool and writes
+each result under OUT_DIR with the same file name.
+
+``update``: installs a dictionary release from a release store (URL or
+directory, see scripts/release.py), fetching only the files that changed.
+``verify`` checks the dictionary files against the SHA-256 hashes in
+version.json, or in a release manifest.
+
+``probe``: locates servers (one per line) through an IP lookup API with
+the probe scheduler (nns/probe.py) and writes ``server<TAB>region<TAB>city<TAB>ip``
+per server, with empty fields where the lookup failed.
+
+``serve``: runs the local HTTP rename service (nns/service.py) on a TCP
+port or a Unix socket until interrupted. ``POST /reload`` swaps in updated
+dictionaries without a restart; with --watch the service does so by itself
+whenever version.json changes (e.g. after ``python -m nns update``).
+"""
+import argparse
+import asyncio
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .dictionaries import DEFAULT_DICT_DIR
+from .engine import Engine
+from .formatter import SPEC_VERSIONS, merge_config
+from .metrics import Profiler
+from .probe import (
+    DEFAULT_RATE,
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    DEFAULT_TTL,
+    DEFAULT_WORKERS,
+    ProbeScheduler,
+    ProbeSpec,
+    ProbeStore,
+)
+from .batch import DEFAULT_CHUNK_SIZE, BatchRenamer
+from .cache import DEFAULT_DISK_ENTRIES, ResultCache
+from .reload import EngineHandle
+from .rename import Renamer
+from .service import (
+    DEFAULT_HOST,
+    DEFAULT_MAX_BATCH,
+    DEFAULT_MAX_DELAY,
+    DEFAULT_PORT,
+    RenameService,
+    serve,
+)
+from .streams import FORMATS, UNIQUE_NAME_FORMATS, detect_format, rename_stream, write_stream
+from .update import load_manifest, update_dictionaries, verify_dictionaries
+
+
+def _open_input(path: str):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8-sig", newline=None)
+    return open(path, "r", encoding="utf-8-sig")
+
+
+def _open_output(path: str):
+    if path == "-":
+        return io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="\n", write_through=False)
+    return open(path, "w", encoding="utf-8", newline="\n")
+
+
+def _user_config(args: argparse.Namespace) -> Dict[str, Any]:
+    user_config = {}
+    if args.config:
+        user_config = json.loads(Path(args.config).read_text(encoding="utf-8"))
+    if args.language:
+        user_config["language"] = args.language
+    if args.status_policy:
+        user_config["statusLinePolicy"] = args.status_policy
+    if args.ad_policy:
+        user_config["adPolicy"] = args.ad_policy
+    return user_config
+
+
+def _input_format(args: argparse.Namespace, path: str) -> str:
+    if args.format == "auto":
+        return detect_format(None if path == "-" else path)
+    return args.format
+
+
+def _dedupe(args: argparse.Namespace, fmt: str) -> bool:
+    # Clash and sing-box reject repeated names unless --no-dedupe says otherwise
+    return fmt in UNIQUE_NAME_FORMATS if args.dedupe is None else args.dedupe
+
+
+def cmd_rename(args: argparse.Namespace) -> int:
+    fmt = _input_format(args, args.input)
+    engine = Engine.load(args.dict_dir, args.segment_connectors)
+    config = merge_config(_user_config(args))
+    cache = None
+    if args.cache:
+        cache = ResultCache(engine, config, args.spec, args.cache, disk_entries=args.cache_size)
+    renamer = Renamer(engine, config, spec=args.spec, dedupe=_dedupe(args, fmt), cache=cache)
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.attach(engine)
+
+    source = _open_input(args.input)
+    out = _open_output(args.output)
+    try:
+        write_stream(rename_stream(fmt, source, renamer.rename), out)
+    finally:
+        renamer.stats.stop()
+        if cache is not None:
+            cache.close()
+        if args.input != "-":
+            source.close()
+        if args.output != "-":
+            out.close()
+        elif not out.closed:
+            out.detach()
+
+    if not args.quiet:
+        print(f"✓ {renamer.stats.summary()}", file=sys.stderr)
+        if cache is not None:
+            print(f"  {cache.stats.summary()}", file=sys.stderr)
+    if profiler is not None:
+        print(profiler.report(), file=sys.stderr)
+    return 0
+
+
+def _collect_names(fmt: str, path: Path) -> List[str]:
+    names: List[str] = []
+
+    def collect(name: str) -> str:
+        names.append(name)
+        return name
+
+    with open(path, "r", encoding="utf-8-sig") as source:
+        for _ in rename_stream(fmt, source, collect):
+            pass
+    return names
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    inputs = [Path(p) for p in args.inputs]
+    out_names = [p.name for p in inputs]
+    if len(set(out_names)) != len(out_names):
+        raise ValueError("Input files must have distinct file names")
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    formats = [_input_format(args, str(p)) for p in inputs]
+    subscriptions = [_collect_names(fmt, p) for fmt, p in zip(formats, inputs)]
+
+    batch = BatchRenamer(
+        _user_config(args),
+        spec=args.spec,
+        dedupe=[_dedupe(args, fmt) for fmt in formats],
+        workers=args.jobs,
+        chunk_size=args.chunk_size,
+        dict_dir=args.dict_dir,
+        cache_path=args.cache,
+        cache_entries=args.cache_size,
+        segment_connectors=args.segment_connectors,
+    )
+    results = batch.rename_all(subscriptions)
+
+    # Second pass over each file: the format writers request names in the
+    # same order they were collected in
+    for fmt, path, renamed in zip(formats, inputs, results):
+        replay = iter(renamed)
+        with open(path, "r", encoding="utf-8-sig") as source, \
+                open(args.out_dir / path.name, "w", encoding="utf-8", newline="\n") as out:
+            write_stream(rename_stream(fmt, source, lambda _name: next(replay)), out)
+
+    if not args.quiet:
+        print(f"✓ {len(inputs)} subscription(s): {batch.summary()}", file=sys.stderr)
+    return 0
+
+
+def cmd_update(args: argparse.Namespace) -> int:
+    stats = update_dictionaries(args.store, args.dict_dir, args.version, dry_run=args.dry_run)
+    if not args.quiet:
+        prefix = "(dry run) " if args.dry_run else ""
+        print(f"✓ {prefix}{stats.summary()}", file=sys.stderr)
+    return 0
+
+
+def cmd_verify(args: argparse.Namespace) -> int:
+    manifest = load_manifest(args.store, args.version) if args.store else None
+    problems = verify_dictionaries(args.dict_dir, manifest)
+    for problem in problems:
+        print(f"✗ {problem}", file=sys.stderr)
+    if not problems and not args.quiet:
+        print(f"✓ {args.dict_dir}: all files match", file=sys.stderr)
+    return 1 if problems else 0
+
+
+def cmd_probe(args: argparse.Namespace) -> int:
+    spec = ProbeSpec.from_dict(json.loads(Path(args.spec).read_text(encoding="utf-8"))) if args.spec else None
+    source = _open_input(args.input)
+    try:
+        servers = [line.strip() for line in source if line.strip()]
+    finally:
+        if args.input != "-":
+            source.close()
+
+    store = ProbeStore(args.store, ttl=args.ttl_days * 86400)
+    with ProbeScheduler(spec, store, workers=args.workers, rate=args.rate or None,
+                        timeout=args.timeout, retries=args.retries) as scheduler:
+        results = scheduler.probe_all(servers)
+        out = _open_output(args.output)
+        try:
+            for server in servers:
+                r = results[server]
+                out.write("\t".join([server, *((r.region, r.city or "", r.ip or "") if r else ("", "", ""))]) + "\n")
+        finally:
+            if args.output != "-":
+                out.close()
+            elif not out.closed:
+                out.detach()
+        if not args.quiet:
+            print(f"✓ {scheduler.stats.summary()}", file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    handle = EngineHandle(args.dict_dir)
+    service = RenameService(
+        handle,
+        _user_config(args),
+        spec=args.spec,
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000,
+    )
+
+    def ready(addresses: List[str]) -> None:
+        if not args.quiet:
+            print(f"✓ Serving on {', '.join(addresses)} "
+                  f"(dictionaries v{service.dict_version}, spec {args.spec})", file=sys.stderr)
+        if args.watch:
+            handle.watch(args.watch, on_error=reload_failed)
+
+    def reload_failed(exc: Exception) -> None:
+        print(f"✗ Reload failed, keeping v{service.dict_version}: {exc}", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix, ready=ready))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        handle.stop()
+    if not args.quiet:
+        stats = service.stats.to_dict()
+        print(f"✓ {stats['requests']} requests, {stats['names']} names, "
+              f"mean batch {stats['mean_batch']}, {stats['reloads']} reloads", file=sys.stderr)
+        for reload_stats in handle.history:
+            print(f"  {reload_stats.summary()}", file=sys.stderr)
+    return 0
+
+
+def _add_rename_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "-f", "--format", choices=("auto",) + FORMATS, default="auto",
+        help="Input format; auto detects by extension (.yaml/.yml clash, .json singbox)",
+    )
+    parser.add_argument("--config", help="User config.json (plugin config format)")
+    parser.add_argument("--spec", choices=SPEC_VERSIONS, default="v2", help="Output spec version")
+    parser.add_argument("--language", choices=("zh", "en"), help="Display language")
+    parser.add_argument("--status-policy", choices=("hide", "keep"), help="statusLinePolicy")
+    parser.add_argument("--ad-policy", choices=("hide", "keep"), help="adPolicy")
+    parser.add_argument("--dedupe", action="store_const", const=True, default=None,
+                        help="Number repeated output names so they stay unique "
+                             "(default for Clash and sing-box)")
+    parser.add_argument("--no-dedupe", dest="dedupe", action="store_const", const=False,
+                        help="Keep repeated output names as they are")
+    parser.add_argument("--segment-connectors", action="store_true",
+                        help="Split names at connectors into region/path/exit (SPEC v2 §7) "
+                             "instead of the plugin's scoring")
+    parser.add_argument("--dict-dir", type=Path, default=DEFAULT_DICT_DIR,
+                        help="Directory of the generated dictionaries")
+    parser.add_argument("--cache", type=Path,
+                        help="SQLite file caching results across runs")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_DISK_ENTRIES,
+                        help="Maximum entries kept in the cache file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Do not print the summary")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="nns", description="Node Naming Standard tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rename = sub.add_parser("rename", help="Rename proxies of a subscription file (streaming)")
+    rename.add_argument("input", nargs="?", default="-", help="Input file (default: stdin)")
+    rename.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    rename.add_argument("--profile", action="store_true",
+                        help="Print per-stage timings, the slowest names and the most matched aliases")
+    _add_rename_options(rename)
+    rename.set_defaults(func=cmd_rename)
+
+    batch = sub.add_parser("batch", help="Rename many subscription files in parallel")
+    batch.add_argument("inputs", nargs="+", help="Subscription files")
+    batch.add_argument("-d", "--out-dir", type=Path, required=True, help="Output directory")
+    batch.add_argument("-j", "--jobs", type=int, help="Worker processes (default: available cores)")
+    batch.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                       help="Names per task; large subscriptions are split into chunks")
+    _add_rename_options(batch)
+    batch.set_defaults(func=cmd_batch)
+
+    update = sub.add_parser("update", help="Install a dictionary release, fetching only changes")
+    update.add_argument("store", help="Release store URL or directory")
+    update.add_argument("--version", help="Release to install (default: latest)")
+    update.add_argument("--dry-run", action="store_true", help="Fetch and verify without writing")
+    update.set_defaults(func=cmd_update)
+
+    verify = sub.add_parser("verify", help="Check dictionary files against their SHA-256 hashes")
+    verify.add_argument("--store", help="Check against this release store's manifest instead")
+    verify.add_argument("--version", help="Release of --store (default: latest)")
+    verify.set_defaults(func=cmd_verify)
+
+    probe = sub.add_parser("probe", help="Locate servers through an IP lookup API")
+    probe.add_argument("input", nargs="?", default="-", help="Servers, one per line (default: stdin)")
+    probe.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    probe.add_argument("--store", type=Path, help="SQLite file keeping results across runs")
+    probe.add_argument("--ttl-days", type=float, default=DEFAULT_TTL / 86400,
+                       help=f"Days results are kept (default: {DEFAULT_TTL / 86400:g})")
+    probe.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                       help=f"Probes running at once (default: {DEFAULT_WORKERS})")
+    probe.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                       help=f"Requests per second to the API, 0 for no limit (default: {DEFAULT_RATE:g})")
+    probe.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                       help=f"Seconds per request (default: {DEFAULT_TIMEOUT:g})")
+    probe.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                       help=f"Retries after network errors, 429 and 5xx (default: {DEFAULT_RETRIES})")
+    probe.add_argument("--spec", help="IP lookup API spec JSON (the plugin's customIP format)")
+    probe.add_argument("-q", "--quiet", action="store_true", help="Do not print the summary")
+    probe.set_defaults(func=cmd_probe)
+
+    serve_parser = sub.add_parser("serve", help="Run the local HTTP rename service")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST, help=f"Listen address (default: {DEFAULT_HOST})")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                              help=f"TCP port (default: {DEFAULT_PORT})")
+    serve_parser.add_argument("--unix", type=Path, help="Listen on this Unix socket instead of TCP")
+    serve_parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH,
+                              help=f"Names renamed per pass (default: {DEFAULT_MAX_BATCH})")
+    serve_parser.add_argument("--max-delay-ms", type=float, default=DEFAULT_MAX_DELAY * 1000,
+                              help="Wait for more small requests before a pass "
+                                   f"(default: {DEFAULT_MAX_DELAY * 1000:g} ms)")
+    serve_parser.add_argument("--watch", type=float, metavar="SECONDS",
+                              help="Reload the dictionaries when version.json changes, "
+                                   "checking every SECONDS")
+    serve_parser.add_argument("--config", help="User config.json (plugin config format)")
+    serve_parser.add_argument("--spec", choices=SPEC_VERSIONS, default="v2",
+                              help="Default output spec version")
+    serve_parser.add_argument("--language", choices=("zh", "en"), help="Display language")
+    serve_parser.add_argument("--status-policy", choices=("hide", "keep"), help="statusLinePolicy")
+    serve_parser.add_argument("--ad-policy", choices=("hide", "keep"), help="adPolicy")
+    serve_parser.set_defaults(func=cmd_serve)
+
+    for command in (update, verify, serve_parser):
+        command.add_argument("--dict-dir", type=Path, default=DEFAULT_DICT_DIR,
+                             help="Directory of the generated dictionaries")
+        command.add_argument("-q", "--quiet", action="store_true", help="Do not print the summary")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Output closed early (e.g. piped into head); not an error
+        sys.stderr.close()
+        return 0
+    except (OSError, ValueError, RuntimeError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
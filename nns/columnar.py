@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Parse results of many names as columns (Engine.parse_many).
+
+Every distinct name is parsed once. Results are stored one row per distinct
+name in typed arrays, plus an index that maps each input position to its
+row. Codes are small integers into per-column vocabularies (-1 for None),
+mult is a float (NaN for None), and tags are a bitmask over the tag
+vocabulary. Counting and grouping weigh each row by its number of
+occurrences, so they cost one step per distinct name, not per input.
+
+to_numpy() returns the same data as a NumPy structured array for vectorized
+filtering and grouping. NumPy is optional; everything else uses the
+standard library only.
+"""
+import math
+from array import array
+from collections import Counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .dictionaries import Dictionaries
+    from .engine import ParseResult
+
+
+# kind column
+KIND_NODE = 0
+KIND_STATUS = 1
+KIND_AD = 2
+KINDS = ["node", "status", "ad"]
+
+# Columns holding vocabulary ids
+CODE_COLUMNS = ("region", "city", "line", "exit")
+
+
+def _numpy():
+    try:
+        import numpy  # type: ignore
+    except ImportError as exc:
+        raise RuntimeError(
+            "NumPy is required for to_numpy(). Install it with: pip install numpy"
+        ) from exc
+    return numpy
+
+
+class Vocabulary:
+    """Codes of a column and their ids, in order of first use after the seed codes."""
+
+    def __init__(self, codes: Iterable[str] = ()):
+        self.codes: List[str] = []
+        self.ids: Dict[str, int] = {}
+        for code in codes:
+            self.id(code)
+
+    def id(self, code: Optional[str]) -> int:
+        """Id of a code, adding it if new; -1 for None."""
+        if code is None:
+            return -1
+        value = self.ids.get(code)
+        if value is None:
+            value = self.ids[code] = len(self.codes)
+            self.codes.append(code)
+        return value
+
+    def code(self, value: int) -> Optional[str]:
+        return self.codes[value] if value >= 0 else None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class ParsedColumns:
+    """Columnar parse results of a sequence of names.
+
+    Attributes:
+        names: Distinct names, one per row
+        index: Row of each input position
+        occurrences: Number of inputs of each row
+        region, city, line, exit: Vocabulary ids per row (-1: None)
+        mult: Multiplier per row (NaN: None)
+        tags: Tag bitmask per row, tag_words 64-bit words per row; bit k
+            of the mask (bit k % 64 of word k // 64) is vocabularies["tags"]
+            code k
+        kind: KIND_NODE, KIND_STATUS or KIND_AD per row
+        confidence: Confidence per row
+        path_offsets, path: Region ids of each row's relay path
+            (path[path_offsets[r]:path_offsets[r + 1]])
+        vocabularies: "region" (shared by region, exit and path), "city",
+            "line" and "tags"
+    """
+
+    def __init__(self, dicts: "Dictionaries"):
+        regions = Vocabulary(dicts.countries)
+        self.vocabularies: Dict[str, Vocabulary] = {
+            "region": regions,
+            "exit": regions,
+            "city": Vocabulary(sorted({key for by_key in dicts.cities.values() for key in by_key})),
+            "line": Vocabulary(dicts.lines),
+            "tags": Vocabulary(dicts.tags),
+        }
+        # Widened by _widen_tags if results carry tags outside tags.json
+        self.tag_words = max(1, (len(dicts.tags) + 63) // 64)
+        self.names: List[str] = []
+        self.index = array("I")
+        self.occurrences = array("I")
+        self.region = array("h")
+        self.city = array("h")
+        self.line = array("h")
+        self.exit = array("h")
+        self.mult = array("d")
+        self.tags = array("Q")
+        self.kind = array("b")
+        self.confidence = array("f")
+        self.path_offsets = array("I", [0])
+        self.path = array("h")
+        self._rows: Dict[str, int] = {}
+
+    # ---------- building ----------
+
+    def add(self, name: str, parse: Callable[[str], "ParseResult"]) -> int:
+        """Append one input, parsing it only if the name is new; returns its row."""
+        row = self._rows.get(name)
+        if row is None:
+            row = self._rows[name] = len(self.names)
+            self._append(name, parse(name))
+        else:
+            self.occurrences[row] += 1
+        self.index.append(row)
+        return row
+
+    def _append(self, name: str, result: "ParseResult") -> None:
+        vocab = self.vocabularies
+        self.names.append(name)
+        self.occurrences.append(1)
+        self.region.append(vocab["region"].id(result.region))
+        self.city.append(vocab["city"].id(result.city))
+        self.line.append(vocab["line"].id(result.line))
+        self.exit.append(vocab["exit"].id(result.exit))
+        self.mult.append(math.nan if result.mult is None else result.mult)
+        self.kind.append(KIND_STATUS if result.is_status else KIND_AD if result.is_ad else KIND_NODE)
+        self.confidence.append(result.confidence)
+
+        mask = 0
+        for tag in result.tags:
+            mask |= 1 << vocab["tags"].id(tag)
+        if mask >> (64 * self.tag_words):
+            self._widen_tags(mask.bit_length())
+        for word in range(self.tag_words):
+            self.tags.append((mask >> (64 * word)) & 0xFFFFFFFFFFFFFFFF)
+
+        self.path.extend(vocab["region"].id(code) for code in result.path)
+        self.path_offsets.append(len(self.path))
+
+    def _widen_tags(self, bits: int) -> None:
+        words = (bits + 63) // 64
+        old = self.tag_words
+        widened = array("Q")
+        for row in range(len(self.tags) // old):
+            widened.extend(self.tags[row * old:(row + 1) * old])
+            widened.extend([0] * (words - old))
+        self.tags = widened
+        self.tag_words = words
+
+    # ---------- access ----------
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def rows(self) -> int:
+        """Number of distinct names."""
+        return len(self.names)
+
+    def tag_mask(self, *codes: str) -> int:
+        """Bitmask of tag codes (0 for codes never seen)."""
+        tags = self.vocabularies["tags"].ids
+        return sum(1 << tags[code] for code in set(codes) if code in tags)
+
+    def row_tags(self, row: int) -> List[str]:
+        mask = 0
+        for word in range(self.tag_words):
+            mask |= self.tags[row * self.tag_words + word] << (64 * word)
+        codes = self.vocabularies["tags"].codes
+        return sorted(codes[bit] for bit in range(mask.bit_length()) if mask >> bit & 1)
+
+    def row_path(self, row: int) -> List[str]:
+        regions = self.vocabularies["region"]
+        return [regions.code(v) for v in self.path[self.path_offsets[row]:self.path_offsets[row + 1]]]
+
+    def record(self, position: int) -> Dict[str, Any]:
+        """Decoded result of one input position (mainly for inspection)."""
+        row = self.index[position]
+        mult = self.mult[row]
+        return {
+            "original": self.names[row],
+            **{column: self.vocabularies[column].code(getattr(self, column)[row]) for column in CODE_COLUMNS},
+            "mult": None if math.isnan(mult) else mult,
+            "tags": self.row_tags(row),
+            "path": self.row_path(row),
+            "kind": KINDS[self.kind[row]],
+            "confidence": self.confidence[row],
+        }
+
+    def count(self, column: str) -> Counter:
+        """Number of inputs per value of a column.
+
+        Columns: region, city, line, exit (codes, None for unset), mult
+        (None for unset), kind (names), tags (one count per tag present).
+        """
+        counts: Counter = Counter()
+        if column in CODE_COLUMNS:
+            vocab = self.vocabularies[column]
+            for value, n in zip(getattr(self, column), self.occurrences):
+                counts[vocab.code(value)] += n
+        elif column == "mult":
+            for value, n in zip(self.mult, self.occurrences):
+                counts[None if math.isnan(value) else value] += n
+        elif column == "kind":
+            for value, n in zip(self.kind, self.occurrences):
+                counts[KINDS[value]] += n
+        elif column == "tags":
+            for row, n in enumerate(self.occurrences):
+                for tag in self.row_tags(row):
+                    counts[tag] += n
+        else:
+            raise ValueError(f"Unknown column: {column!r}")
+        return counts
+
+    # ---------- NumPy ----------
+
+    def dtype(self) -> Any:
+        """NumPy dtype of to_numpy()."""
+        np = _numpy()
+        tags = ("tags", "u8") if self.tag_words == 1 else ("tags", "u8", (self.tag_words,))
+        return np.dtype([
+            ("region", "i2"), ("city", "i2"), ("line", "i2"), ("exit", "i2"),
+            ("mult", "f8"), tags, ("kind", "i1"), ("confidence", "f4"),
+            ("hops", "u2"),
+        ])
+
+    def to_numpy(self, unique: bool = False) -> Any:
+        """Results as a NumPy structured array.
+
+        Args:
+            unique: One element per distinct name (row) instead of one per
+                input; combine with ``occurrences`` as weights
+
+        Raises:
+            RuntimeError: If NumPy is not installed
+        """
+        np = _numpy()
+        table = np.empty(self.rows, dtype=self.dtype())
+        for column in CODE_COLUMNS + ("mult", "kind", "confidence"):
+            values = getattr(self, column)
+            table[column] = np.frombuffer(values, dtype=values.typecode) if values else []
+        tags = np.frombuffer(self.tags, dtype=np.uint64) if self.tags else np.empty(0, np.uint64)
+        table["tags"] = tags if self.tag_words == 1 else tags.reshape(self.rows, self.tag_words)
+        table["hops"] = np.diff(np.frombuffer(self.path_offsets, dtype=np.uint32))
+        if unique:
+            return table
+        return table[np.frombuffer(self.index, dtype=np.uint32)] if self.index else table[:0]
+
+    def decode(self, column: str, values: Sequence[int]) -> List[Optional[str]]:
+        """Codes of vocabulary ids (e.g. from to_numpy()["region"])."""
+        vocab = self.vocabularies[column]
+        return [vocab.code(int(v)) for v in values]
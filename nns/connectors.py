@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Connector-driven segmentation of node names (SPEC v2 §7).
+
+The plugin's calculateScore rebuilds the exit regex for every candidate and
+only looks at the first exit connector. Here every connector of
+keywords_connectors.json goes into one pattern (connector_pattern), which
+the engine's lexer (nns/lexer.py) compiles into its single pass over the
+name to find all of them, with their kind. segment() then splits the
+location matches of a name at those connectors:
+
+    加拿大 经由 香港 落地 美国   →   [CA] via [HK] exit [US]
+
+The segment after the last connector of the strongest kind (exit > via >
+arrow, SPEC v2 §7.1) that is followed by a location holds the exit, the
+first segment before it the region, and the locations in between the path
+in name order (§7.2). Connectors
+and matches are both sorted, so segmenting is linear in the number of
+matches.
+
+Match offsets are in the normalized name (nns/matcher.normalize), which
+drops arrows and spaces; connector spans are mapped into the same offsets.
+ASCII connector words only count as whole words ("via" but not "Bolivia").
+"""
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .matcher import Match
+
+
+# Connector kinds, strongest first (SPEC v2 §7.1); the dictionary lists 中转
+# with the via words
+CONNECTOR_KINDS = ("exit", "via", "arrow")
+
+_ASCII_WORD = re.compile(r"[A-Za-z0-9]+")
+
+
+class Connector(NamedTuple):
+    """A connector occurrence; start/end are offsets in the normalized name."""
+    kind: str
+    start: int
+    end: int
+
+
+class Segments(NamedTuple):
+    """Location matches of a name split at its connectors."""
+    region: List[Match]
+    exit: List[Match]
+    locations: List[Match]  # every location not overlapping a connector, in order
+    exit_connector: Connector
+
+
+def connector_kinds(connectors: Dict[str, Sequence[str]]) -> Dict[str, str]:
+    """Lowercased connector word → kind, the strongest kind for duplicates."""
+    kinds: Dict[str, str] = {}
+    for kind in CONNECTOR_KINDS:
+        for word in connectors.get(kind) or []:
+            if word:
+                kinds.setdefault(word.lower(), kind)
+    return kinds
+
+
+def connector_pattern(words: Iterable[str]) -> str:
+    """Regex alternation of connector words, longest first ("=>" before ">").
+
+    ASCII words only match as whole words. Compile with re.IGNORECASE | re.ASCII:
+    Unicode case folding would read "exıt" (dotless i) as "exit".
+    """
+    return "|".join(
+        rf"(?<![A-Za-z0-9]){re.escape(w)}(?![A-Za-z0-9])" if _ASCII_WORD.fullmatch(w) else re.escape(w)
+        for w in sorted(words, key=len, reverse=True)
+    )
+
+
+def segment(locations: List[Match], connectors: List[Connector]) -> Optional[Segments]:
+    """Split location matches at connectors (SPEC v2 §7.2), in one pass.
+
+    Args:
+        locations: Region/city matches ordered by start
+        connectors: Connectors of the same name, ordered by start
+
+    Returns:
+        The region, exit and remaining locations, or None without connectors.
+        Locations overlapping a connector (its word read as an alias, like
+        "via" for VI) are dropped. The exit segment may be empty ("香港 落地")
+        and so may the region segment ("落地 美国").
+    """
+    if not connectors:
+        return None
+
+    # segments[i] holds the locations between connectors i-1 and i
+    segments: List[List[Match]] = [[] for _ in range(len(connectors) + 1)]
+    kept: List[Match] = []
+    c = 0
+    for m in locations:
+        while c < len(connectors) and connectors[c].end <= m.start:
+            c += 1
+        if c < len(connectors) and m.start < connectors[c].end and connectors[c].start < m.end:
+            continue  # overlaps the connector
+        segments[c].append(m)
+        kept.append(m)
+
+    # Last connector of the strongest kind, among those followed by a location
+    rank = {kind: i for i, kind in enumerate(CONNECTOR_KINDS)}
+    followed = [i for i in range(len(connectors)) if segments[i + 1]] or list(range(len(connectors)))
+    exit_index = min(followed, key=lambda i: (rank[connectors[i].kind], -i))
+
+    region_segment = next((s for s in segments[:exit_index + 1] if s), [])
+    return Segments(region_segment, segments[exit_index + 1], kept, connectors[exit_index])
+
+
+def location_code(m: Match) -> str:
+    """Country code of a region or city match."""
+    return m.entry.region or m.entry.code
+
+
+def ordered_codes(matches: List[Match], excluded: Tuple[Optional[str], ...]) -> List[str]:
+    """Distinct country codes of matches in order, without the excluded ones."""
+    return list(dict.fromkeys(
+        code for code in (location_code(m) for m in matches) if code and code not in excluded
+    ))
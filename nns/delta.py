@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Binary delta patches between two versions of a dictionary file.
+
+A patch is a list of COPY (range of the old file) and INSERT (literal bytes)
+operations, found by indexing the old file in fixed-size blocks and
+extending every block match in both directions. The operation stream is
+zlib-compressed, so the size of a patch follows the size of the change.
+
+Patch layout:
+
+    magic "NNSP", u8 format, old SHA-256, new SHA-256, u32 new size,
+    zlib(ops) where an op is varint(length << 1 | is_insert), followed by
+    varint(old offset) for a copy or the literal bytes for an insert
+"""
+import hashlib
+import struct
+import zlib
+from typing import Dict, Iterator, List, Tuple
+
+
+PATCH_FORMAT = 1
+MAGIC = b"NNSP"
+_HEADER = struct.Struct("<4sB32s32sI")
+
+# Minimum match length worth a copy
+BLOCK_SIZE = 16
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _operations(old: bytes, new: bytes) -> Iterator[Tuple[int, int, int]]:
+    """Yield (is_insert, start, length): start indexes old for copies, new for inserts."""
+    blocks: Dict[bytes, int] = {}
+    for i in range(0, len(old) - BLOCK_SIZE + 1, BLOCK_SIZE):
+        blocks.setdefault(old[i:i + BLOCK_SIZE], i)
+
+    pending = 0  # start of the literal run not yet emitted
+    j = 0
+    end = len(new) - BLOCK_SIZE
+    while j <= end:
+        i = blocks.get(new[j:j + BLOCK_SIZE])
+        if i is None:
+            j += 1
+            continue
+        start_old, start_new = i, j
+        while start_new > pending and start_old > 0 and old[start_old - 1] == new[start_new - 1]:
+            start_old -= 1
+            start_new -= 1
+        stop_old, stop_new = i + BLOCK_SIZE, j + BLOCK_SIZE
+        while stop_new < len(new) and stop_old < len(old) and old[stop_old] == new[stop_new]:
+            stop_old += 1
+            stop_new += 1
+        if start_new > pending:
+            yield 1, pending, start_new - pending
+        yield 0, start_old, stop_new - start_new
+        pending = j = stop_new
+    if pending < len(new):
+        yield 1, pending, len(new) - pending
+
+
+def make_patch(old: bytes, new: bytes) -> bytes:
+    """Encode new as a patch against old."""
+    ops: List[bytes] = []
+    for is_insert, start, length in _operations(old, new):
+        ops.append(_varint(length << 1 | is_insert))
+        ops.append(new[start:start + length] if is_insert else _varint(start))
+    header = _HEADER.pack(
+        MAGIC,
+        PATCH_FORMAT,
+        hashlib.sha256(old).digest(),
+        hashlib.sha256(new).digest(),
+        len(new),
+    )
+    return header + zlib.compress(b"".join(ops), 9)
+
+
+def patch_hashes(patch: bytes) -> Tuple[str, str]:
+    """SHA-256 (hex) of the file a patch applies to and of its result."""
+    if len(patch) < _HEADER.size:
+        raise ValueError("Not a dictionary patch")
+    magic, fmt, old_hash, new_hash, _ = _HEADER.unpack_from(patch)
+    if magic != MAGIC or fmt != PATCH_FORMAT:
+        raise ValueError("Not a dictionary patch")
+    return old_hash.hex(), new_hash.hex()
+
+
+def apply_patch(old: bytes, patch: bytes) -> bytes:
+    """Rebuild the new file from old and a patch.
+
+    Raises:
+        ValueError: If the patch is malformed, was made for a different old
+            file, or does not reproduce the expected result
+    """
+    old_hash, new_hash = patch_hashes(patch)
+    size = _HEADER.unpack_from(patch)[4]
+    if hashlib.sha256(old).hexdigest() != old_hash:
+        raise ValueError("Patch does not apply to this file (SHA-256 mismatch)")
+    try:
+        ops = zlib.decompress(patch[_HEADER.size:])
+    except zlib.error as exc:
+        raise ValueError(f"Corrupt patch: {exc}") from exc
+
+    out = bytearray()
+    pos = 0
+    try:
+        while pos < len(ops):
+            code, pos = _read_varint(ops, pos)
+            length = code >> 1
+            if code & 1:
+                out += ops[pos:pos + length]
+                pos += length
+            else:
+                offset, pos = _read_varint(ops, pos)
+                out += old[offset:offset + length]
+    except IndexError as exc:
+        raise ValueError("Corrupt patch: truncated operation") from exc
+    result = bytes(out)
+    if len(result) != size or hashlib.sha256(result).hexdigest() != new_hash:
+        raise ValueError("Patched file does not match the expected SHA-256")
+    return result
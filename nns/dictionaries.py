@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Load the generated NNS dictionaries (dict/generated/*.json) into memory.
+"""
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+DEFAULT_DICT_DIR = Path(__file__).resolve().parents[1] / "dict" / "generated"
+
+# Same file set as DICT_FILE_LIST in plugin/plugin.js
+DICT_FILES = {
+    "version": "version.json",
+    "countries": "countries.json",
+    "country_alias_map": "country_alias_map.json",
+    "lines": "lines.json",
+    "line_alias_map": "line_alias_map.json",
+    "tags": "tags.json",
+    "tag_alias_map": "tag_alias_map.json",
+    "cities": "cities.json",
+    "city_alias_map": "city_alias_map.json",
+    "city_conflicts": "city_conflicts.json",
+    "keywords_status": "keywords_status.json",
+    "keywords_ad": "keywords_ad.json",
+    "keywords_connectors": "keywords_connectors.json",
+}
+
+
+def _is_array_index(key: str) -> bool:
+    """Check whether a key is an integer-like property name in JavaScript."""
+    if not key.isdigit() or not key.isascii():
+        return False
+    if len(key) > 1 and key[0] == "0":
+        return False
+    return int(key) < 2**32 - 1
+
+
+def js_object(pairs: List[Tuple[str, Any]]) -> Dict[str, Any]:
+    """Build a dict whose iteration order matches a parsed JavaScript object.
+
+    JavaScript enumerates integer-like keys first (ascending), then the rest
+    in insertion order. The JS engine's greedy matcher relies on that order
+    for tie-breaking, so the Python engine must iterate the same way.
+
+    Args:
+        pairs: Key/value pairs as produced by json.load
+
+    Returns:
+        Dictionary in JavaScript property order
+    """
+    obj = dict(pairs)
+    index_keys = [k for k in obj if _is_array_index(k)]
+    if not index_keys:
+        return obj
+    ordered = {k: obj[k] for k in sorted(index_keys, key=int)}
+    for k, v in obj.items():
+        if k not in ordered:
+            ordered[k] = v
+    return ordered
+
+
+def load_json(path: Path) -> Any:
+    """Load a JSON file with JavaScript object key ordering."""
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f, object_pairs_hook=js_object)
+
+
+@dataclass
+class Dictionaries:
+    """All generated dictionaries, keyed like DICTS in plugin.js."""
+    countries: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    country_alias_map: Dict[str, str] = field(default_factory=dict)
+    lines: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    line_alias_map: Dict[str, str] = field(default_factory=dict)
+    tags: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    tag_alias_map: Dict[str, str] = field(default_factory=dict)
+    cities: Dict[str, Dict[str, Dict[str, Any]]] = field(default_factory=dict)
+    city_alias_map: Dict[str, List[str]] = field(default_factory=dict)
+    city_conflicts: Dict[str, Any] = field(default_factory=dict)
+    keywords_status: Dict[str, Any] = field(default_factory=dict)
+    keywords_ad: Dict[str, Any] = field(default_factory=dict)
+    keywords_connectors: Dict[str, List[str]] = field(default_factory=dict)
+    version: Dict[str, Any] = field(default_factory=dict)
+    source_dir: Optional[Path] = None
+
+
+def load_dictionaries(generated_dir: Optional[Union[str, Path]] = None) -> Dictionaries:
+    """Load every dictionary file from a generated directory.
+
+    Args:
+        generated_dir: Directory containing the generated JSON files
+            (defaults to dict/generated in this repository)
+
+    Returns:
+        Loaded dictionaries
+
+    Raises:
+        FileNotFoundError: If a dictionary file is missing
+    """
+    base = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+    data: Dict[str, Any] = {}
+    for attr, file_name in DICT_FILES.items():
+        path = base / file_name
+        if not path.exists():
+            raise FileNotFoundError(f"Dictionary file not found: {path}")
+        data[attr] = load_json(path)
+    return Dictionaries(source_dir=base, **data)
+
+
+def dictionary_hashes(generated_dir: Optional[Union[str, Path]] = None) -> Dict[str, str]:
+    """SHA-256 of each dictionary file the engine loads (missing files are skipped).
+
+    Includes matcher.json and tag_index.json when present, since the engine
+    loads them as well.
+    """
+    base = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+    hashes = {}
+    for file_name in sorted(set(DICT_FILES.values()) | {"matcher.json", "tag_index.json"}):
+        path = base / file_name
+        if path.exists():
+            hashes[file_name] = hashlib.sha256(path.read_bytes()).hexdigest()
+    return hashes
@@ -0,0 +1,603 @@
+#!/usr/bin/env python3
+"""
+NNS v2 parse engine (Python reference implementation).
+
+Same semantics as parseNodeName in plugin/plugin.js: status/ad detection,
+multiplier extraction, greedy alias matching, candidate generation and
+scoring, v1 manual tags and context inference. Results are expected to be
+identical to the JS engine (see scripts/conformance.py). The multiplier,
+the normalized name and the manual tags come from a single lexer pass
+(nns/lexer.py).
+
+Low-confidence results can be located by their server address with the
+offline geoip.bin index (nns/geoip.py) instead of the plugin's ip-api.com
+lookup.
+
+With segment_connectors, names with connectors are split into region, path
+and exit segments as SPEC v2 §7 describes (nns/connectors.py) instead of the
+plugin's scoring, which always makes the exit the region. This changes
+results, so it is off by default and not covered by the conformance check.
+"""
+import re
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Tuple, Union
+
+from .columnar import ParsedColumns
+from .connectors import Connector, location_code, ordered_codes, segment
+from .dictionaries import Dictionaries, load_dictionaries
+from .formatter import CompiledFormatter, compile_formatter, format_node_name, merge_config
+from .geoip import GeoIPIndex, load_geoip
+from .keywords import KeywordMatcher
+from .lexer import Lexed, Lexer
+from .matcher import IndexEntry, Match, UniversalMatcher, load_matcher
+from .tags import TagIndex, load_tag_index
+
+
+# JavaScript \s (ECMAScript WhiteSpace + LineTerminator)
+JS_SPACE = r"\t\n\x0b\x0c\r \xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+
+# Matches x2, 2x, x1.5, 1.5x, ... (extractMultiplier)
+_MULTIPLIER = re.compile(
+    rf"(?:^|[^0-9])([x×]?[{JS_SPACE}]*([0-9]+(?:\.[0-9]+)?)[{JS_SPACE}]*[x×]?)",
+    re.IGNORECASE,
+)
+
+# Statistical prior: common countries (used for scoring)
+COMMON_COUNTRIES = ["US", "HK", "SG", "JP", "TW", "KR", "GB", "DE"]
+
+# Fallback inference when no location was matched
+LINE_INFERENCE = {"IPLC": "HK", "IEPL": "HK", "BGP": "CN", "CN2": "CN", "GIA": "CN"}
+TAG_INFERENCE = {
+    "Netflix": "US",
+    "Disney": "US",
+    "ChatGPT": "US",
+    "TikTok": "SG",
+    "Bilibili": "CN",
+    "TVB": "HK",
+}
+
+# Results below this confidence are located by IP (formatNodeName)
+IP_LOOKUP_CONFIDENCE = 0.5
+
+
+def utf16_offset(text: str, index: int) -> int:
+    """Convert a code point offset into a JavaScript (UTF-16) string index."""
+    return index + sum(1 for ch in text[:index] if ord(ch) > 0xFFFF)
+
+
+@dataclass
+class ParseResult:
+    """Parsed node name (the result object of parseNodeName)."""
+    original: str
+    region: Optional[str] = None
+    city: Optional[str] = None
+    line: Optional[str] = None
+    mult: Optional[float] = None
+    tags: List[str] = field(default_factory=list)
+    path: List[str] = field(default_factory=list)
+    exit: Optional[str] = None
+    is_status: bool = False
+    is_ad: bool = False
+    confidence: float = 0
+    source: str = "parsed"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result with the JS engine's field names and order."""
+        return {
+            "original": self.original,
+            "region": self.region,
+            "city": self.city,
+            "line": self.line,
+            "mult": self.mult,
+            "tags": list(self.tags),
+            "path": list(self.path),
+            "exit": self.exit,
+            "isStatus": self.is_status,
+            "isAd": self.is_ad,
+            "confidence": self.confidence,
+            "source": self.source,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ParseResult":
+        """Inverse of to_dict."""
+        return cls(
+            original=data["original"],
+            region=data.get("region"),
+            city=data.get("city"),
+            line=data.get("line"),
+            mult=data.get("mult"),
+            tags=list(data.get("tags") or []),
+            path=list(data.get("path") or []),
+            exit=data.get("exit"),
+            is_status=bool(data.get("isStatus")),
+            is_ad=bool(data.get("isAd")),
+            confidence=data.get("confidence", 0),
+            source=data.get("source", "parsed"),
+        )
+
+
+@dataclass
+class Candidate:
+    """A possible region/path/exit reading of the matched locations."""
+    region: Optional[str]
+    city: Optional[str]
+    path: List[str]
+    exit: Optional[str]
+    exit_index: int
+    exit_match: Optional[Match] = None
+
+
+class Engine:
+    """NNS parse/format engine bound to one set of dictionaries.
+
+    Example:
+        >>> engine = Engine.load()
+        >>> engine.parse("香港 IEPL x2").region
+        'HK'
+    """
+
+    def __init__(
+        self,
+        dicts: Dictionaries,
+        matcher: Optional[UniversalMatcher] = None,
+        tag_index: Optional[TagIndex] = None,
+        geoip: Optional[GeoIPIndex] = None,
+        segment_connectors: bool = False,
+    ):
+        self.dicts = dicts
+        self.matcher = matcher or UniversalMatcher.from_dictionaries(dicts)
+        self._tag_index = tag_index
+        self.geoip = geoip
+        self.status_matcher = KeywordMatcher(dicts.keywords_status)
+        self.ad_matcher = KeywordMatcher(dicts.keywords_ad)
+        self.exit_connector = self._compile_exit_connector(dicts.keywords_connectors)
+        self.segment_connectors = segment_connectors
+        # Connector words are lexer tokens only when segmenting
+        self.lexer = Lexer(dicts.keywords_connectors if segment_connectors else None)
+        self.city_conflicts: Dict[str, Any] = (dicts.city_conflicts or {}).get("aliases") or {}
+        # Compiled formatters of the default config, by spec version
+        self._default_formatters: Dict[str, CompiledFormatter] = {}
+
+    @classmethod
+    def load(
+        cls,
+        generated_dir: Optional[Union[str, Path]] = None,
+        segment_connectors: bool = False,
+    ) -> "Engine":
+        """Create an engine from a generated dictionary directory.
+
+        Uses the compiled matcher.json and tag_index.json when they match
+        the dictionaries, otherwise builds them from the dictionaries.
+        geoip.bin is opened when present and built for these cities.
+        """
+        dicts = load_dictionaries(generated_dir)
+        return cls(
+            dicts,
+            load_matcher(generated_dir),
+            load_tag_index(dicts.tag_alias_map, generated_dir),
+            load_geoip(generated_dir),
+            segment_connectors,
+        )
+
+    @property
+    def tag_index(self) -> TagIndex:
+        """Contained tag alias index (built on first use without tag_index.json)."""
+        if self._tag_index is None:
+            self._tag_index = TagIndex(self.dicts.tag_alias_map)
+        return self._tag_index
+
+    @staticmethod
+    def _compile_exit_connector(connectors: Dict[str, List[str]]) -> Optional[Pattern[str]]:
+        # Exit words and arrows both mark the exit location
+        words = list(connectors.get("exit") or []) + list(connectors.get("arrow") or [])
+        if not words:
+            return None
+        return re.compile("|".join(re.escape(w) for w in words), re.IGNORECASE | re.ASCII)
+
+    # ---------- line filters ----------
+
+    def is_status_line(self, name: str) -> bool:
+        """Check whether a name is a status line (traffic, expiry, ...)."""
+        return self.status_matcher.matches(name)
+
+    def is_ad_line(self, name: str) -> bool:
+        """Check whether a name is an advertising line."""
+        return self.ad_matcher.matches(name)
+
+    # ---------- parsing ----------
+
+    def match_tags(self, tokens: Iterable[str], excluded: Iterable[str] = ()) -> List[str]:
+        """Tags of a name's tokens, including aliases contained in CJK tokens.
+
+        Args:
+            tokens: Raw tokens of a node name
+            excluded: Normalized tokens already used by other fields
+
+        Returns:
+            Sorted tag codes
+        """
+        return self.tag_index.find(tokens, excluded)
+
+    def lex(self, name: str) -> Lexed:
+        """Multiplier, normalized name, manual tags and connectors in one pass."""
+        return self.lexer.lex(name)
+
+    @staticmethod
+    def extract_multiplier(name: str) -> Optional[float]:
+        """Extract the multiplier (x2, 1.5x, ...) as a number, or None.
+
+        parse() takes it from lex(); both give the same value.
+        """
+        match = _MULTIPLIER.search(name)
+        if match:
+            num = float(match.group(2))
+            if num > 0:
+                return num
+        return None
+
+    def resolve_city_conflicts(self, matches: List[Match]) -> List[Match]:
+        """Pick the city of aliases shared by several cities (city_conflicts.json).
+
+        The city of the first country named in the name that has a
+        candidate wins, otherwise the alias's default city.
+        """
+        if not self.city_conflicts:
+            return matches
+        context = [m.entry.code for m in matches if m.entry.category == "region"]
+        resolved = []
+        for m in matches:
+            conflict = self.city_conflicts.get(m.entry.alias) if m.entry.category == "city" else None
+            if conflict is None:
+                resolved.append(m)
+                continue
+            country = next((cc for cc in context if cc in conflict["context"]), None)
+            region, city = conflict["context"][country] if country is not None else conflict["default"]
+            entry = IndexEntry(m.entry.alias, city, "city", m.entry.weight, region)
+            resolved.append(m._replace(entry=entry))
+        return resolved
+
+    @staticmethod
+    def generate_candidates(matches: List[Match]) -> List[Candidate]:
+        """Generate every possible region/path/exit reading of the matches."""
+        locations = [m for m in matches if m.entry.category in ("region", "city")]
+
+        if not locations:
+            return [Candidate(None, None, [], None, -1)]
+
+        if len(locations) == 1:
+            loc = locations[0].entry
+            code = loc.region or loc.code
+            city = loc.code if loc.category == "city" else None
+            return [Candidate(code, city, [], code, 0)]
+
+        # Several locations: every "relay -> exit" split
+        candidates = []
+        for i, exit_match in enumerate(locations):
+            exit_entry = exit_match.entry
+            path = [l.entry.region or l.entry.code for l in locations[:i]]
+            code = exit_entry.region or exit_entry.code
+            candidates.append(
+                Candidate(
+                    region=code,
+                    city=exit_entry.code if exit_entry.category == "city" else None,
+                    path=list(dict.fromkeys(p for p in path if p)),
+                    exit=code,
+                    exit_index=i,
+                    exit_match=exit_match,
+                )
+            )
+        return candidates
+
+    @staticmethod
+    def calculate_score(
+        candidate: Candidate,
+        matches: List[Match],
+        connector_pos: Optional[int],
+    ) -> float:
+        """Score a candidate (calculateScore in plugin.js).
+
+        Args:
+            candidate: Candidate to score
+            matches: All greedy matches of the name
+            connector_pos: Position of the exit connector, compared with the
+                start of the exit match, or None if there is none. The two
+                callers pass different offset spaces: parse() passes the
+                UTF-16 index of the first exit connector in the raw name,
+                as plugin.js does (so the comparison with a normalized match
+                offset is only approximate, kept for parity);
+                segment_locations() passes the exit connector's start in
+                the normalized name, the space of the match offsets
+        """
+        score = 0.0
+
+        # 1. Position (40%): later locations are more likely the exit
+        total_locs = sum(1 for m in matches if m.entry.category in ("region", "city"))
+        if total_locs > 0 and candidate.exit_index >= 0:
+            score += (candidate.exit_index + 1) / total_locs * 40
+
+        # 2. Context (25%): exit location after an exit connector
+        if connector_pos is not None and candidate.exit_match:
+            if candidate.exit_match.start > connector_pos:
+                score += 25
+
+        # 3. Alias length (15%): longer aliases are more precise
+        if candidate.exit_match:
+            score += min(len(candidate.exit_match.entry.alias) / 10, 1) * 15
+
+        # 4. City/country consistency
+        if candidate.city and candidate.exit_match:
+            city_match = next(
+                (m for m in matches if m.entry.code == candidate.city and m.entry.category == "city"),
+                None,
+            )
+            if city_match:
+                if city_match.entry.region == candidate.region:
+                    score += 25
+                else:
+                    score -= 50
+
+        # 5. Prior (10%): common countries
+        if candidate.region in COMMON_COUNTRIES:
+            score += 10
+
+        return score
+
+    def segment_locations(
+        self, connectors: List[Connector], matches: List[Match],
+    ) -> Optional[Tuple[Candidate, float]]:
+        """Region, path and exit of a name split at its connectors (SPEC v2 §7).
+
+        The first location after the exit connector is the exit; cities of
+        that country in the same segment are scored against it as exit
+        candidates (calculate_score, with the exit connector as context).
+        The first location of the region segment gives the region and the
+        locations between region and exit form the path, in name order.
+        Locations after the exit (service names, tags) are left out. Without
+        a location after the exit connector, the region segment is used and
+        the region is its own exit.
+
+        Args:
+            connectors: Connectors of the name (Lexed.connectors)
+            matches: Alias matches of the name
+
+        Returns:
+            The candidate and its score, or None when the name has no
+            connector or no location outside the connectors
+        """
+        locations = [m for m in matches if m.entry.category in ("region", "city")]
+        segments = segment(locations, connectors) if locations else None
+        if segments is None or not segments.locations:
+            return None
+        index = {m.start: i for i, m in enumerate(locations)}
+        connector_pos = segments.exit_connector.start  # normalized, like the matches
+        exit_segment = segments.exit or segments.region
+        exit_code = location_code(exit_segment[0])
+
+        best: Optional[Candidate] = None
+        best_score = 0.0
+        for m in exit_segment:
+            if m is not exit_segment[0] and (m.entry.category != "city" or m.entry.region != exit_code):
+                continue
+            candidate = Candidate(
+                region=exit_code,
+                city=m.entry.code if m.entry.category == "city" else None,
+                path=[],
+                exit=exit_code,
+                exit_index=index[m.start],
+                exit_match=m,
+            )
+            score = self.calculate_score(candidate, matches, connector_pos)
+            if best is None or score > best_score:
+                best, best_score = candidate, score
+        assert best is not None
+
+        if segments.exit and segments.region:
+            region_match = segments.region[0]
+            best.region = location_code(region_match)
+            best.path = ordered_codes(
+                [m for m in segments.locations if region_match.start < m.start < exit_segment[0].start],
+                (best.region, best.exit),
+            )
+        return best, best_score
+
+    @staticmethod
+    def infer_country(result: ParseResult) -> Optional[Dict[str, Any]]:
+        """Infer a region from the line or tags when no location matched."""
+        if result.line and result.line in LINE_INFERENCE:
+            return {"region": LINE_INFERENCE[result.line], "confidence": 0.3, "source": "line_inference"}
+        for tag in result.tags:
+            if tag in TAG_INFERENCE:
+                return {"region": TAG_INFERENCE[tag], "confidence": 0.25, "source": "tag_inference"}
+        return None
+
+    def parse(self, name: str) -> ParseResult:
+        """Parse a node name (parseNodeName in plugin.js).
+
+        Args:
+            name: Raw node name
+
+        Returns:
+            Parse result
+        """
+        result = ParseResult(
+            original=name,
+            is_status=self.is_status_line(name),
+            is_ad=self.is_ad_line(name),
+        )
+        if result.is_status or result.is_ad:
+            return result
+
+        # 1. Multiplier, normalized name, manual tags and connectors
+        lexed = self.lex(name)
+        result.mult = lexed.multiplier
+
+        # 2. Greedy alias matching
+        # (no alias may span a connector: "sg→hk" is not Ghana)
+        cuts = [offset for c in lexed.connectors for offset in (c.start, c.end)]
+        matches = self.resolve_city_conflicts(self.matcher.find_matches_normalized(lexed.normalized, cuts))
+        line_code = None
+        tag_codes = set()
+        for m in matches:
+            if m.entry.category == "line":
+                if not line_code:
+                    line_code = m.entry.code
+            elif m.entry.category == "tag":
+                tag_codes.add(m.entry.code)
+        result.line = line_code
+        result.tags = sorted(tag_codes)
+
+        # 3. Location by connector segments or candidate scoring
+        segmented = self.segment_locations(lexed.connectors, matches) if self.segment_connectors else None
+        if segmented is not None:
+            best, best_score = segmented
+        else:
+            best = None
+            best_score = 0.0
+            candidates = self.generate_candidates(matches)
+            if candidates and candidates[0].region:
+                connector_pos = None
+                if self.exit_connector is not None:
+                    connector = self.exit_connector.search(name)
+                    if connector:
+                        # Raw-name UTF-16 index, as calculateScore in plugin.js
+                        connector_pos = utf16_offset(name, connector.start())
+
+                for candidate in candidates:
+                    score = self.calculate_score(candidate, matches, connector_pos)
+                    if best is None or score > best_score:
+                        best, best_score = candidate, score
+
+        if best is not None:
+            result.region = best.region
+            result.city = best.city
+            result.path = best.path
+            result.exit = best.exit
+            result.confidence = min(best_score / 100, 1.0)
+
+        # 4. v1 manual tags (highest priority)
+        if lexed.manual:
+            for kind, code in lexed.manual:
+                if kind == "via":
+                    if code not in result.path:
+                        result.path.append(code)
+                elif kind == "exit":
+                    result.exit = code
+                    result.region = code
+            result.confidence = 1.0
+            result.source = "manual"
+
+        # 5. Fallback inference
+        if not result.region:
+            inferred = self.infer_country(result)
+            if inferred:
+                result.region = inferred["region"]
+                result.confidence = inferred["confidence"]
+                result.source = inferred["source"]
+
+        # 6. Final confidence
+        if result.region and result.city:
+            result.confidence = max(result.confidence, 0.9)
+        elif result.region:
+            result.confidence = max(result.confidence, 0.7)
+        elif result.line or result.mult or result.tags:
+            result.confidence = max(result.confidence, 0.2)
+
+        return result
+
+    def parse_many(self, names: Iterable[str]) -> ParsedColumns:
+        """Parse many names into columns, parsing each distinct name once.
+
+        Example:
+            >>> cols = engine.parse_many(["香港 01", "香港 01", "日本 IPLC"])
+            >>> cols.rows, cols.count("region")["HK"]
+            (2, 2)
+        """
+        columns = ParsedColumns(self.dicts)
+        for name in names:
+            columns.add(name, self.parse)
+        return columns
+
+    @staticmethod
+    def locate(parsed: ParseResult, region: str, city: Optional[str] = None) -> ParseResult:
+        """Apply a looked-up exit location (the autoIPLookup step of formatNodeName).
+
+        Results with a confidence below 0.5 (other than status/ad lines)
+        take the region, and the city when one is given, with confidence
+        1.0. Used with geoip.bin (locate_ip) and with probe results
+        (nns/probe.py).
+
+        Returns:
+            A located copy of the result, or the result itself if it is not
+            located (it is never modified, so cached results are safe)
+        """
+        if parsed.is_status or parsed.is_ad or parsed.confidence >= IP_LOOKUP_CONFIDENCE or not region:
+            return parsed
+        return replace(
+            parsed, region=region, city=city or parsed.city, confidence=1.0,
+            tags=list(parsed.tags), path=list(parsed.path),
+        )
+
+    def locate_ip(self, parsed: ParseResult, address: str) -> ParseResult:
+        """Locate a low-confidence result by its server address with geoip.bin.
+
+        Offline counterpart of lookupIPLocation: the city is a cities.json
+        key when the range has one. Host names are not resolved.
+        """
+        if self.geoip is None or parsed.confidence >= IP_LOOKUP_CONFIDENCE:
+            return parsed
+        location = self.geoip.lookup(address)
+        if location is None:
+            return parsed
+        return self.locate(parsed, *location)
+
+    # ---------- formatting ----------
+
+    def compile_formatter(self, config: Optional[Dict[str, Any]] = None, spec: str = "v2") -> CompiledFormatter:
+        """Compile a merged config (defaults to merge_config()) for format/rename.
+
+        Example:
+            >>> render = engine.compile_formatter(merge_config({"language": "en"}))
+            >>> engine.rename("香港 IEPL 奈飞", render)
+            '🇭🇰 HK IEPL → HK [Netflix]'
+        """
+        return compile_formatter(self.dicts, merge_config() if config is None else config, spec)
+
+    def format(
+        self,
+        parsed: ParseResult,
+        config: Union[None, Dict[str, Any], CompiledFormatter] = None,
+        spec: str = "v2",
+        address: Optional[str] = None,
+    ) -> Optional[str]:
+        """Format a parse result.
+
+        ``config`` is a merged config (see merge_config) or, when formatting
+        many names with one config, a formatter from compile_formatter
+        (which carries its own spec version). The default config is
+        compiled once per spec.
+
+        With the proxy's server address, a low-confidence result is first
+        located by IP (see locate_ip).
+        """
+        if address is not None:
+            parsed = self.locate_ip(parsed, address)
+        if isinstance(config, CompiledFormatter):
+            return config(parsed)
+        if config is None:
+            formatter = self._default_formatters.get(spec)
+            if formatter is None:
+                formatter = self._default_formatters[spec] = self.compile_formatter(None, spec)
+            return formatter(parsed)
+        return format_node_name(parsed, self.dicts, config, spec)
+
+    def rename(
+        self,
+        name: str,
+        config: Union[None, Dict[str, Any], CompiledFormatter] = None,
+        spec: str = "v2",
+        address: Optional[str] = None,
+    ) -> Optional[str]:
+        """Parse and format a name. Returns None when the line is dropped."""
+        return self.format(self.parse(name), config, spec, address)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Config merging and node name formatting (mergeConfig/formatNodeName in plugin.js).
+
+format_node_name follows formatNodeName step by step: it walks fieldOrder
+and looks up display names for every node. compile_formatter does that work
+once per merged config and spec: visible fields, language, separator,
+maxTags and the display strings of every flag, city, line and tag are
+resolved into a CompiledFormatter, which renders a node by concatenating
+precomputed parts. Both give identical output.
+"""
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .dictionaries import Dictionaries
+
+
+# Field keys known to the formatter, in the default v2 order
+ALL_FIELDS = ["flag", "region", "city", "line", "mult", "path", "exit", "tags"]
+
+# Output spec versions: v1 has no path/exit fields (SPEC v2 §8.2 downgrade)
+SPEC_VERSIONS = ("v1", "v2")
+
+# Defaults of the plugin Configuration UI
+DEFAULT_CONFIG: Dict[str, Any] = {
+    "language": "zh",
+    "includeFlag": True,
+    "includeCity": False,
+    "includeLine": True,
+    "includeMult": True,
+    "includeTags": True,
+    "includePath": True,
+    "includeExit": True,
+    "maxTags": 3,
+    "statusLinePolicy": "hide",
+    "adPolicy": "hide",
+}
+
+
+def _js_truthy(value: Any) -> bool:
+    """Truthiness as in JavaScript (empty lists/dicts are truthy)."""
+    if value is None or value is False:
+        return False
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value == value and value != 0
+    if isinstance(value, str):
+        return value != ""
+    return True
+
+
+def _js_or(*values: Any) -> Any:
+    """Evaluate ``a || b || c`` with JavaScript semantics."""
+    for value in values[:-1]:
+        if _js_truthy(value):
+            return value
+    return values[-1]
+
+
+def format_number(value: float) -> str:
+    """Format a number the way JavaScript's Number#toString does.
+
+    Examples:
+        >>> format_number(2.0)
+        '2'
+        >>> format_number(1.5)
+        '1.5'
+        >>> format_number(1e-7)
+        '1e-7'
+    """
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == int(value) and abs(value) < 1e16:
+        return str(int(value))
+    text = repr(float(value))
+    if "e" not in text:
+        return text
+    mantissa, exponent = text.split("e")
+    exp = int(exponent)
+    if -7 < exp < 21:
+        return format(Decimal(text), "f")
+    return f"{mantissa}e{'+' if exp > 0 else '-'}{abs(exp)}"
+
+
+def merge_config(
+    user_config: Optional[Dict[str, Any]] = None,
+    default_config: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Merge user config over defaults, as mergeConfig in plugin.js.
+
+    Legacy ``fieldOrder`` string lists are migrated to ``{key, visible}``
+    objects using the ``include<Field>`` switches, and missing fields are
+    appended.
+
+    Args:
+        user_config: Saved user config (config.json), may be None
+        default_config: Plugin defaults (defaults to DEFAULT_CONFIG)
+
+    Returns:
+        Merged config with language, fieldOrder, separator, maxTags,
+        statusLinePolicy and adPolicy
+    """
+    user = user_config or {}
+    default = DEFAULT_CONFIG if default_config is None else default_config
+
+    raw_order = list(_js_or(user.get("fieldOrder"), default.get("fieldOrder"), list(ALL_FIELDS)))
+    current_keys = [f if isinstance(f, str) else (f or {}).get("key") for f in raw_order]
+    for key in ALL_FIELDS:
+        if key not in current_keys:
+            raw_order.append(key)
+
+    field_order: List[Dict[str, Any]] = []
+    for f in raw_order:
+        if isinstance(f, str):
+            legacy_key = f"include{f[:1].upper()}{f[1:]}"
+            visible = True
+            if legacy_key in user:
+                visible = user[legacy_key]
+            elif legacy_key in default:
+                visible = default[legacy_key]
+            field_order.append({"key": f, "visible": visible})
+        elif isinstance(f, dict) and _js_truthy(f.get("key")):
+            field_order.append(f)
+
+    return {
+        "language": _js_or(user.get("language"), default.get("language"), "zh"),
+        "fieldOrder": field_order,
+        "separator": _js_or(user.get("separator"), " "),
+        "maxTags": _js_or(user.get("maxTags"), default.get("maxTags"), 3),
+        "statusLinePolicy": _js_or(
+            user.get("statusLinePolicy"), default.get("statusLinePolicy"), "hide"
+        ),
+        "adPolicy": _js_or(user.get("adPolicy"), default.get("adPolicy"), "hide"),
+    }
+
+
+def _display(value: Any) -> str:
+    # Array#join renders undefined/null as an empty string
+    return "" if value is None else str(value)
+
+
+def format_node_name(
+    parsed: Any,
+    dicts: Dictionaries,
+    config: Dict[str, Any],
+    spec: str = "v2",
+) -> Optional[str]:
+    """Render a parsed node name.
+
+    With ``spec="v1"`` the path/exit fields are downgraded to the reserved
+    tags ``[via:XX]`` and ``[exit:XX]`` appended at the end (SPEC v2 §8.2);
+    ``[exit:XX]`` is only written when the exit differs from the region.
+
+    Args:
+        parsed: ParseResult from Engine.parse
+        dicts: Loaded dictionaries (display names, flags)
+        config: Merged config from merge_config
+        spec: Output spec version, "v1" or "v2"
+
+    Returns:
+        The formatted name, the original name (kept status/ad lines or no
+        region), or None when the line should be dropped
+    """
+    is_zh = config.get("language") == "zh"
+
+    if parsed.is_status:
+        return parsed.original if config.get("statusLinePolicy") == "keep" else None
+    if parsed.is_ad:
+        return parsed.original if config.get("adPolicy") == "keep" else None
+
+    if not parsed.region:
+        return parsed.original
+
+    downgrade = spec == "v1"
+    parts: List[str] = []
+    for field_obj in config.get("fieldOrder") or []:
+        if field_obj.get("visible") is False:
+            continue
+        key = field_obj.get("key")
+        if downgrade and key in ("path", "exit"):
+            continue
+        if key == "flag":
+            country = dicts.countries.get(parsed.region)
+            if country and country.get("flag"):
+                parts.append(country["flag"])
+        elif key == "region":
+            parts.append(parsed.region)
+        elif key == "city":
+            if parsed.city:
+                lookup_region = parsed.exit or parsed.region
+                city = dicts.cities.get(lookup_region, {}).get(parsed.city)
+                if city:
+                    parts.append(_display(city.get("name_zh" if is_zh else "name_en")))
+        elif key == "line":
+            if parsed.line:
+                line = dicts.lines.get(parsed.line)
+                if line:
+                    parts.append(_display(line.get("display_zh" if is_zh else "display_en")))
+        elif key == "mult":
+            if parsed.mult:
+                parts.append(f"x{format_number(parsed.mult)}")
+        elif key == "path":
+            if parsed.path:
+                parts.append(f"via {', '.join(parsed.path)}")
+        elif key == "exit":
+            if parsed.exit:
+                parts.append(f"→ {parsed.exit}")
+        elif key == "tags":
+            for tag_code in parsed.tags[: config.get("maxTags")]:
+                tag_info = dicts.tags.get(tag_code)
+                if tag_info:
+                    parts.append(f"[{_display(tag_info.get('display_zh' if is_zh else 'display_en'))}]")
+
+    if downgrade:
+        parts.extend(f"[via:{code}]" for code in parsed.path)
+        if parsed.exit and parsed.exit != parsed.region:
+            parts.append(f"[exit:{parsed.exit}]")
+
+    return _js_or(config.get("separator"), " ").join(parts)
+
+
+
+# Renders one field of a parsed name into parts
+FieldRenderer = Callable[[Any, List[str]], None]
+
+
+class CompiledFormatter:
+    """format_node_name specialized for one merged config and spec.
+
+    Build with compile_formatter; call with a ParseResult. Holds the display
+    strings of the dictionaries it was compiled against, so compile a new
+    one after the dictionaries are reloaded.
+    """
+
+    __slots__ = ("config", "spec", "_renderers", "_separator", "_keep_status", "_keep_ad")
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        spec: str,
+        renderers: List[FieldRenderer],
+        separator: str,
+    ):
+        self.config = config
+        self.spec = spec
+        self._renderers = tuple(renderers)
+        self._separator = separator
+        self._keep_status = config.get("statusLinePolicy") == "keep"
+        self._keep_ad = config.get("adPolicy") == "keep"
+
+    def __call__(self, parsed: Any) -> Optional[str]:
+        if parsed.is_status:
+            return parsed.original if self._keep_status else None
+        if parsed.is_ad:
+            return parsed.original if self._keep_ad else None
+        if not parsed.region:
+            return parsed.original
+        parts: List[str] = []
+        for render in self._renderers:
+            render(parsed, parts)
+        return self._separator.join(parts)
+
+
+def compile_formatter(dicts: Dictionaries, config: Dict[str, Any], spec: str = "v2") -> CompiledFormatter:
+    """Compile a merged config into a renderer (same output as format_node_name).
+
+    Args:
+        dicts: Loaded dictionaries (display names, flags)
+        config: Merged config from merge_config
+        spec: Output spec version, "v1" or "v2"
+
+    Example:
+        >>> render = compile_formatter(engine.dicts, merge_config())
+        >>> render(engine.parse("香港 IEPL 奈飞"))
+        '🇭🇰 HK 专线 → HK [奈飞]'
+    """
+    is_zh = config.get("language") == "zh"
+    downgrade = spec == "v1"
+
+    # Display strings of the chosen language; entries that would be skipped
+    # (missing or empty) are left out
+    flags = {
+        code: country["flag"]
+        for code, country in dicts.countries.items()
+        if country and country.get("flag")
+    }
+    city_names: Dict[Tuple[str, str], str] = {
+        (region, key): _display(city.get("name_zh" if is_zh else "name_en"))
+        for region, by_key in dicts.cities.items()
+        for key, city in by_key.items()
+        if city
+    }
+    line_names = {
+        code: _display(line.get("display_zh" if is_zh else "display_en"))
+        for code, line in dicts.lines.items()
+        if line
+    }
+    tag_names = {
+        code: f"[{_display(tag.get('display_zh' if is_zh else 'display_en'))}]"
+        for code, tag in dicts.tags.items()
+        if tag
+    }
+    mult_text = lru_cache(maxsize=256)(lambda mult: f"x{format_number(mult)}")
+    tag_slice = slice(None, config.get("maxTags"))
+
+    def render_flag(parsed: Any, parts: List[str]) -> None:
+        flag = flags.get(parsed.region)
+        if flag:
+            parts.append(flag)
+
+    def render_region(parsed: Any, parts: List[str]) -> None:
+        parts.append(parsed.region)
+
+    def render_city(parsed: Any, parts: List[str]) -> None:
+        if parsed.city:
+            name = city_names.get((parsed.exit or parsed.region, parsed.city))
+            if name is not None:
+                parts.append(name)
+
+    def render_line(parsed: Any, parts: List[str]) -> None:
+        if parsed.line:
+            name = line_names.get(parsed.line)
+            if name is not None:
+                parts.append(name)
+
+    def render_mult(parsed: Any, parts: List[str]) -> None:
+        if parsed.mult:
+            parts.append(mult_text(parsed.mult))
+
+    def render_path(parsed: Any, parts: List[str]) -> None:
+        if parsed.path:
+            parts.append(f"via {', '.join(parsed.path)}")
+
+    def render_exit(parsed: Any, parts: List[str]) -> None:
+        if parsed.exit:
+            parts.append(f"→ {parsed.exit}")
+
+    def render_tags(parsed: Any, parts: List[str]) -> None:
+        for tag_code in parsed.tags[tag_slice]:
+            name = tag_names.get(tag_code)
+            if name is not None:
+                parts.append(name)
+
+    def render_v1_tags(parsed: Any, parts: List[str]) -> None:
+        parts.extend(f"[via:{code}]" for code in parsed.path)
+        if parsed.exit and parsed.exit != parsed.region:
+            parts.append(f"[exit:{parsed.exit}]")
+
+    by_key: Dict[str, FieldRenderer] = {
+        "flag": render_flag,
+        "region": render_region,
+        "city": render_city,
+        "line": render_line,
+        "mult": render_mult,
+        "path": render_path,
+        "exit": render_exit,
+        "tags": render_tags,
+    }
+    renderers: List[FieldRenderer] = []
+    for field_obj in config.get("fieldOrder") or []:
+        if field_obj.get("visible") is False:
+            continue
+        key = field_obj.get("key")
+        if downgrade and key in ("path", "exit"):
+            continue
+        if isinstance(key, str) and key in by_key:
+            renderers.append(by_key[key])
+    if downgrade:
+        renderers.append(render_v1_tags)
+
+    return CompiledFormatter(config, spec, renderers, _js_or(config.get("separator"), " "))
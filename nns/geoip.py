@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Offline IP geolocation (dict/generated/geoip.bin).
+
+The plugin's lookupIPLocation asks ip-api.com for every low-confidence node.
+geoip.bin, compiled by scripts/build_geoip.py from a local IP-range CSV,
+answers the same question without the network: the file is opened with mmap
+and an address is resolved with one binary search over the sorted range
+starts of its family, in microseconds.
+
+Layout (little-endian unless noted, sections 8-byte aligned):
+
+    header      magic "NNSG", u32 format, u32 IPv4 ranges, u32 IPv6 ranges,
+                u32 meta length
+    meta        JSON object: version, sources (SHA-256 of cities.json and
+                of the CSV), locations ([country code, city key or null]
+                per location id)
+    ipv4        u32 starts[n], u32 ends[n] (inclusive), u32 location ids[n]
+    ipv6        16-byte big-endian starts[n], ends[n], u32 location ids[n]
+
+Ranges of a family are sorted and do not overlap. City keys are keys of
+cities.json, so a located node formats like a parsed one.
+"""
+import bisect
+import hashlib
+import json
+import mmap
+import socket
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .dictionaries import DEFAULT_DICT_DIR
+
+
+GEOIP_FILE = "geoip.bin"
+GEOIP_FORMAT = 1
+# Generated files the city keys of geoip.bin refer to
+GEOIP_SOURCES = ["cities.json"]
+
+MAGIC = b"NNSG"
+_V4_MAPPED_PREFIX = b"\0" * 10 + b"\xff\xff"
+_HEADER = struct.Struct("<4sIIII")
+
+# (country code, cities.json key or None)
+Location = Tuple[str, Optional[str]]
+# Inclusive integer range and its location id
+Range = Tuple[int, int, int]
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def pack_geoip(ipv4: List[Range], ipv6: List[Range], meta: Dict[str, Any]) -> bytes:
+    """Serialize sorted, non-overlapping ranges and their meta into geoip.bin."""
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    out = bytearray(_HEADER.pack(MAGIC, GEOIP_FORMAT, len(ipv4), len(ipv6), len(meta_bytes)))
+
+    def section(data: bytes) -> None:
+        out.extend(b"\0" * (_align(len(out)) - len(out)))
+        out.extend(data)
+
+    section(meta_bytes)
+    for column in range(3):
+        section(struct.pack(f"<{len(ipv4)}I", *(r[column] for r in ipv4)))
+    for column in range(2):
+        section(b"".join(r[column].to_bytes(16, "big") for r in ipv6))
+    section(struct.pack(f"<{len(ipv6)}I", *(r[2] for r in ipv6)))
+    return bytes(out)
+
+
+class _U128Column:
+    """Read-only sequence of big-endian 128-bit integers in a buffer (for bisect)."""
+
+    __slots__ = ("_view", "_count")
+
+    def __init__(self, view: memoryview, count: int):
+        self._view = view
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> int:
+        offset = index * 16
+        return int.from_bytes(self._view[offset:offset + 16], "big")
+
+
+def _u32_column(view: memoryview, count: int) -> Sequence[int]:
+    if sys.byteorder == "little":
+        return view[:count * 4].cast("I")
+    column = array("I", view[:count * 4].tobytes())
+    column.byteswap()
+    return column
+
+
+class GeoIPIndex:
+    """Memory-mapped IP range → location index.
+
+    Args:
+        path: geoip.bin to open
+
+    Raises:
+        ValueError: If the file is not a geoip.bin of a supported format
+
+    Example:
+        >>> with GeoIPIndex("dict/generated/geoip.bin") as geoip:
+        ...     geoip.lookup("1.0.16.1")
+        ('JP', 'Tokyo')
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            view = memoryview(self._mmap)
+            magic, fmt, n4, n6, meta_len = _HEADER.unpack_from(view, 0)
+            if magic != MAGIC or fmt != GEOIP_FORMAT:
+                raise ValueError(f"{self.path}: not a geoip.bin of format {GEOIP_FORMAT}")
+            offset = _align(_HEADER.size)
+            self.meta: Dict[str, Any] = json.loads(bytes(view[offset:offset + meta_len]).decode("utf-8"))
+            offset = _align(offset + meta_len)
+            columns: List[Any] = []
+            for count, width in ((n4, 4), (n4, 4), (n4, 4), (n6, 16), (n6, 16), (n6, 4)):
+                data = view[offset:offset + count * width]
+                columns.append(_U128Column(data, count) if width == 16 else _u32_column(data, count))
+                offset = _align(offset + count * width)
+        except Exception:
+            self._mmap.close()
+            raise
+        self._v4_starts, self._v4_ends, self._v4_locations = columns[:3]
+        self._v6_starts, self._v6_ends, self._v6_locations = columns[3:]
+        self.locations: List[Location] = [(cc, city) for cc, city in self.meta["locations"]]
+
+    @property
+    def range_counts(self) -> Tuple[int, int]:
+        """Number of IPv4 and IPv6 ranges."""
+        return len(self._v4_starts), len(self._v6_starts)
+
+    def lookup(self, address: str) -> Optional[Location]:
+        """Country code and cities.json key (or None) of an IP address.
+
+        IPv4-mapped IPv6 addresses resolve as IPv4. Returns None for
+        addresses outside every range and for anything that is not an IP
+        literal (host names are never resolved).
+        """
+        address = address.strip()
+        try:
+            packed = socket.inet_pton(socket.AF_INET, address)
+        except OSError:
+            try:
+                packed = socket.inet_pton(socket.AF_INET6, address.strip("[]"))
+            except OSError:
+                return None
+            if packed.startswith(_V4_MAPPED_PREFIX):
+                packed = packed[12:]
+        if len(packed) == 4:
+            starts, ends, locations = self._v4_starts, self._v4_ends, self._v4_locations
+        else:
+            starts, ends, locations = self._v6_starts, self._v6_ends, self._v6_locations
+        value = int.from_bytes(packed, "big")
+        i = bisect.bisect_right(starts, value) - 1
+        if i < 0 or value > ends[i]:
+            return None
+        return self.locations[locations[i]]
+
+    def close(self) -> None:
+        # Release the column views before the mapping they point into
+        self._v4_starts = self._v4_ends = self._v4_locations = ()  # type: ignore[assignment]
+        self._v6_starts = self._v6_ends = self._v6_locations = ()  # type: ignore[assignment]
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # still exported by a column held elsewhere; freed with it
+
+    def __enter__(self) -> "GeoIPIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def source_hashes(generated_dir: Path) -> Dict[str, str]:
+    """SHA-256 of each generated file geoip.bin refers to."""
+    return {
+        name: hashlib.sha256((generated_dir / name).read_bytes()).hexdigest()
+        for name in GEOIP_SOURCES
+    }
+
+
+def load_geoip(
+    generated_dir: Optional[Union[str, Path]] = None,
+    verify: bool = True,
+) -> Optional[GeoIPIndex]:
+    """Open geoip.bin if it is present and current.
+
+    Args:
+        generated_dir: Directory containing geoip.bin (defaults to
+            dict/generated)
+        verify: Check that it was built against the current cities.json
+
+    Returns:
+        The index, or None if the file is missing, has an unsupported
+        format or refers to a different cities.json
+    """
+    base = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+    path = base / GEOIP_FILE
+    if not path.exists():
+        return None
+    try:
+        index = GeoIPIndex(path)
+    except ValueError:
+        return None
+    if verify:
+        try:
+            current = source_hashes(base)
+        except FileNotFoundError:
+            current = None
+        recorded = index.meta.get("sources") or {}
+        if current is None or any(recorded.get(name) != digest for name, digest in current.items()):
+            index.close()
+            return None
+    return index
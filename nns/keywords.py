@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Merged status/ad keyword matcher.
+
+All patterns of a category are combined into one alternation in which every
+pattern is a capturing group, so a single regex search answers "does any
+rule match" and reports which rule fired. A list of required literals acts
+as a prefilter: a name that contains none of them cannot match any rule and
+skips regex evaluation entirely.
+"""
+import re
+from typing import Any, Dict, List, Optional, Pattern
+
+
+KEYWORDS_FORMAT = 1
+
+# Flags equivalent to new RegExp(pattern, 'i') for the dictionary patterns
+REGEX_FLAGS = re.IGNORECASE | re.ASCII
+
+_QUANTIFIERS = set("*+?{")
+
+# Python-only escapes; new RegExp reads them as the bare letter
+_PYTHON_ESCAPES = set("AZNU")
+# A {m}, {m,}, {m,n} or (Python only) {,n} and {,} quantifier
+_BRACE_QUANTIFIER = re.compile(r"\{(\d*)(?:,(\d*))?\}")
+
+
+def js_syntax_error(pattern: str) -> Optional[str]:
+    """Python-only regex syntax in a pattern that compiles with re.
+
+    The dictionaries are used by plugin.js as new RegExp(pattern, "i"),
+    which throws on possessive quantifiers, atomic groups, inline flags,
+    conditionals, comments and quantified lookbehinds, and reads \\A, \\Z or {,n} as literals.
+    Any such pattern would make the plugin fall back silently from the
+    combined regex to its per-rule path.
+
+    Returns:
+        A description of the first construct found, or None
+
+    Examples:
+        >>> js_syntax_error(r"\\d++GB")
+        'possessive quantifier at 3'
+        >>> js_syntax_error("(?>abc)")
+        'atomic group at 0'
+        >>> js_syntax_error(r"(?<!剩余)\\d+GB") is None
+        True
+    """
+    i = 0
+    n = len(pattern)
+    quantified = False  # the previous token was a quantifier
+    groups: List[bool] = []  # open groups, True for lookbehinds
+    lookbehind = False  # the previous token closed a lookbehind
+    while i < n:
+        ch = pattern[i]
+        if ch == "\\":
+            nxt = pattern[i + 1] if i + 1 < n else ""
+            if nxt in _PYTHON_ESCAPES:
+                return f"\\{nxt} at {i}"
+            quantified = lookbehind = False
+            i += 2
+            continue
+        if ch == "[":
+            j = i + 1
+            if j < n and pattern[j] == "^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                if pattern[j] == "\\" and j + 1 < n and pattern[j + 1] in _PYTHON_ESCAPES:
+                    return f"\\{pattern[j + 1]} at {j}"
+                j += 2 if pattern[j] == "\\" else 1
+            quantified = lookbehind = False
+            i = j + 1
+            continue
+        if ch == "(" and pattern.startswith("(?", i):
+            kind = pattern[i + 2:i + 3]
+            if kind not in (":", "=", "!") and not pattern.startswith(("(?<=", "(?<!"), i):
+                name = {">": "atomic group", "#": "comment", "(": "conditional", "P": "(?P...) group"}
+                return f"{name.get(kind, 'inline flags')} at {i}"
+            groups.append(kind == "<")
+            quantified = lookbehind = False
+            i += 4 if kind == "<" else 3
+            continue
+        if ch in "()":
+            lookbehind = ch == ")" and bool(groups) and groups.pop()
+            if ch == "(":
+                groups.append(False)
+            quantified = False
+            i += 1
+            continue
+        brace = _BRACE_QUANTIFIER.match(pattern, i) if ch == "{" else None
+        if brace and not brace.group(1) and brace.group(2) is None:
+            brace = None  # "{}" is a literal
+        if ch in "*+?" or brace:
+            if quantified:
+                return f"possessive quantifier at {i}"
+            if lookbehind:
+                return f"quantified lookbehind at {i}"
+            if brace and not brace.group(1) and brace.group(2) is not None:
+                return f"{{,n}} quantifier at {i}"
+            i = brace.end() if brace else i + 1
+            if i < n and pattern[i] == "?":
+                i += 1  # lazy
+            quantified = True
+            continue
+        quantified = lookbehind = False
+        i += 1
+    return None
+
+
+def _is_caseless_literal(ch: str) -> bool:
+    """Characters whose lowercase form is safe to compare against lowercased text."""
+    return ch.isascii() or ch.lower() == ch.upper() == ch
+
+
+def required_literal(pattern: str) -> Optional[str]:
+    """Find the longest literal every match of a pattern must contain.
+
+    The scan is conservative: alternations, groups, classes and escapes end
+    the current literal run, and an optional quantifier removes the character
+    it applies to. The literal is lowercased.
+
+    Args:
+        pattern: Regular expression source
+
+    Returns:
+        Lowercased literal, or None if none could be proven
+
+    Examples:
+        >>> required_literal(r"\\d+GB")
+        'gb'
+        >>> required_literal("days? left")
+        ' left'
+        >>> required_literal("a|b") is None
+        True
+    """
+    runs: List[str] = []
+    run = ""
+    depth = 0
+    i = 0
+    n = len(pattern)
+    while i < n:
+        ch = pattern[i]
+        if ch == "\\":
+            nxt = pattern[i + 1] if i + 1 < n else ""
+            if depth == 0 and nxt and not nxt.isalnum() and _is_caseless_literal(nxt):
+                literal = nxt
+            else:
+                literal = None
+            i += 2
+        elif ch == "[":
+            # Skip the character class
+            j = i + 1
+            if j < n and pattern[j] == "^":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            while j < n and pattern[j] != "]":
+                j += 2 if pattern[j] == "\\" else 1
+            literal = None
+            i = j + 1
+        elif ch == "(":
+            depth += 1
+            literal = None
+            i += 1
+        elif ch == ")":
+            depth -= 1
+            literal = None
+            i += 1
+        elif ch == "|":
+            if depth == 0:
+                return None
+            literal = None
+            i += 1
+        elif ch in ".^$" or depth > 0 or not _is_caseless_literal(ch):
+            literal = None
+            i += 1
+        elif ch in _QUANTIFIERS:
+            literal = None
+            i += 1
+        else:
+            literal = ch
+            i += 1
+
+        # A following quantifier decides whether the token is mandatory
+        optional = False
+        repeated = False
+        if i < n and pattern[i] in _QUANTIFIERS:
+            q = pattern[i]
+            if q in "?*":
+                optional = True
+            elif q == "{":
+                m = re.match(r"\{(\d*)", pattern[i:])
+                optional = not m or not m.group(1) or int(m.group(1)) == 0
+            repeated = True
+
+        if literal is None or optional:
+            runs.append(run)
+            run = ""
+        else:
+            run += literal.lower()
+            if repeated:
+                runs.append(run)
+                run = ""
+        if repeated:
+            # Skip the quantifier itself (and a lazy/possessive suffix)
+            if pattern[i] == "{":
+                close = pattern.find("}", i)
+                i = close + 1 if close != -1 else i + 1
+            else:
+                i += 1
+            if i < n and pattern[i] in "?+":
+                i += 1
+    runs.append(run)
+
+    best = max(runs, key=len)
+    return best or None
+
+
+def _minimize_literals(literals: List[str]) -> List[str]:
+    """Drop literals that contain a shorter literal (they never add a hit)."""
+    unique = sorted(set(literals), key=lambda s: (len(s), s))
+    kept: List[str] = []
+    for lit in unique:
+        if not any(k in lit for k in kept):
+            kept.append(lit)
+    return sorted(kept)
+
+
+def compile_keywords(patterns: List[str], skip_invalid: bool = False) -> Dict[str, Any]:
+    """Validate patterns and compile them into a merged matcher description.
+
+    Args:
+        patterns: Regex patterns of one keyword category
+        skip_invalid: Drop invalid patterns instead of raising
+
+    Returns:
+        Dictionary with ``combined`` (the alternation), ``rules`` (id,
+        pattern, capture group and required literal of every rule) and
+        ``prefilter`` (required literals, or None when some rule has no
+        required literal)
+
+    Patterns must be valid for both re and JavaScript's RegExp (see
+    js_syntax_error).
+
+    Raises:
+        ValueError: If a pattern is invalid and skip_invalid is False
+    """
+    rules = []
+    errors = []
+    group = 1
+    for rule_id, pattern in enumerate(patterns):
+        try:
+            compiled = re.compile(pattern, REGEX_FLAGS)
+        except re.error as exc:
+            if skip_invalid:
+                continue
+            errors.append(f"{pattern!r}: {exc}")
+            continue
+        if compiled.groupindex:
+            errors.append(f"{pattern!r}: named groups are not supported")
+            continue
+        js_error = js_syntax_error(pattern)
+        if js_error:
+            if not skip_invalid:
+                errors.append(f"{pattern!r}: not valid in JavaScript ({js_error})")
+            continue
+        rules.append({
+            "id": rule_id,
+            "pattern": pattern,
+            "group": group,
+            "literal": required_literal(pattern),
+        })
+        group += 1 + compiled.groups
+    if errors:
+        raise ValueError("Invalid keyword patterns:\n  " + "\n  ".join(errors))
+
+    combined = "|".join(f"({rule['pattern']})" for rule in rules)
+    try:
+        re.compile(combined, REGEX_FLAGS)
+    except re.error as exc:
+        raise ValueError(f"Patterns cannot be combined: {exc}") from exc
+
+    literals = [rule["literal"] for rule in rules]
+    prefilter = _minimize_literals(literals) if rules and all(literals) else None
+
+    return {
+        "format": KEYWORDS_FORMAT,
+        "flags": "i",
+        "combined": combined,
+        "rules": rules,
+        "prefilter": prefilter,
+    }
+
+
+class KeywordMatcher:
+    """Matcher for one keyword category (keywords_status.json, keywords_ad.json).
+
+    Uses the build-time ``compiled`` section when it still describes the
+    file's patterns, otherwise compiles the patterns at load time (invalid
+    ones are skipped, like the JS engine does).
+
+    Python's regex engine does not optimize large alternations, so instead of
+    the combined regex each rule is gated by its required literal: after the
+    prefilter, only rules whose literal occurs in the name are evaluated.
+    The result is the same rule the combined alternation would report.
+    """
+
+    def __init__(self, keywords: Dict[str, Any]):
+        patterns = list(keywords.get("patterns") or [])
+        compiled = keywords.get("compiled")
+        if not (
+            isinstance(compiled, dict)
+            and compiled.get("format") == KEYWORDS_FORMAT
+            and [r["pattern"] for r in compiled.get("rules", [])] == patterns
+        ):
+            compiled = compile_keywords(patterns, skip_invalid=True)
+
+        self.patterns = patterns
+        self.rules = compiled["rules"]
+        self.prefilter: Optional[List[str]] = compiled.get("prefilter")
+        self._prefilter_regex: Optional[Pattern[str]] = None
+        if self.prefilter is not None:
+            literals = sorted(self.prefilter, key=len, reverse=True)
+            self._prefilter_regex = re.compile("|".join(re.escape(lit) for lit in literals))
+        self._gated = [
+            (rule["id"], rule.get("literal"), re.compile(rule["pattern"], REGEX_FLAGS))
+            for rule in self.rules
+        ]
+
+    def _scan(self, text: str, first: bool) -> Optional[int]:
+        if not self._gated:
+            return None
+        lowered = text.lower()
+        if self._prefilter_regex is not None and not self._prefilter_regex.search(lowered):
+            return None
+        best_start = -1
+        best_id = None
+        for rule_id, literal, regex in self._gated:
+            if literal and literal not in lowered:
+                continue
+            m = regex.search(text)
+            if m is None:
+                continue
+            if first or m.start() == 0:
+                return rule_id
+            if best_id is None or m.start() < best_start:
+                best_start, best_id = m.start(), rule_id
+        return best_id
+
+    def search(self, text: str) -> Optional[int]:
+        """Return the ID (pattern index) of the rule that fired, or None.
+
+        When several rules match, the one matching earliest in the text wins
+        (ties go to the earlier rule), as with the combined alternation.
+        """
+        return self._scan(text, first=False)
+
+    def matches(self, text: str) -> bool:
+        """Check whether any rule matches the text."""
+        return self._scan(text, first=True) is not None
+
+    def pattern_for(self, rule_id: int) -> str:
+        """Pattern source of a rule ID returned by search."""
+        return self.patterns[rule_id]
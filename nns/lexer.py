@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Single-pass lexer for node names.
+
+parseNodeName reads a name several times: extractMultiplier, v2Normalize
+for alias matching and the [via:XX]/[exit:XX] manual-tag regex each scan it
+again, and so does the connector scan with segment_connectors. A Lexer
+reads the name once with one compiled pattern and returns what those stages
+need:
+
+    香港 IEPL x1.5 [via:JP]   →   香港 · IEPL · x · 1.5 · [via:JP]
+                                  cjk   latin latin multiplier manual
+
+    normalized 香港ieplx15viajp, multiplier 1.5, manual [("via", "JP")]
+
+Runs of ASCII letters, CJK ideographs and digits are exactly the characters
+normalize() keeps, so the normalized name is the tokens joined without the
+decimal points and tag punctuation. The multiplier is the first number
+(extractMultiplier reads digits in a manual tag code such as "[via:U2]"
+too). Connector offsets are in the normalized name, like match offsets.
+
+Status and ad rules are arbitrary dictionary regexes and the plugin's exit
+connector search has substring semantics with UTF-16 offsets, so those keep
+their own scans.
+"""
+import re
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .connectors import Connector, connector_kinds, connector_pattern
+from .matcher import normalize
+
+_LATIN = r"[a-zA-Z]+"
+_NUMBER = r"[0-9]+(?:\.[0-9]+)?"
+# v1 manual tags: [via:XX] / [exit:XX]. Case-insensitive for ASCII only, as
+# /.../gi in plugin.js: Unicode case folding would also take ſ, ı and the
+# Kelvin sign as letters of "via", "exit" or the code
+_MANUAL = r"\[(?ai:(?:via|exit):[a-zA-Z2]+)\]"
+
+_DIGITS = "0123456789"
+_DIGIT_RUN = re.compile(r"[0-9]+")
+
+
+class Lexed(NamedTuple):
+    """Everything the parse stages read from a name, from one lexer pass."""
+    normalized: str
+    multiplier: Optional[float]
+    manual: List[Tuple[str, str]]  # (kind lowercased, code uppercased)
+    connectors: List[Connector]  # only from a segmenting lexer
+
+
+class Lexer:
+    """One compiled pattern for the multiplier, normalization and manual tags.
+
+    Args:
+        connectors: keywords_connectors.json; when given, connector words are
+            tokens of their own (CJK runs are split at them) and lex() reports
+            them with normalized offsets
+
+    Example:
+        >>> lexer = Lexer()
+        >>> lexed = lexer.lex("香港 IEPL x1.5 [via:JP]")
+        >>> lexed.normalized, lexed.multiplier, lexed.manual
+        ('香港ieplx15viajp', 1.5, [('via', 'JP')])
+    """
+
+    def __init__(self, connectors: Optional[Dict[str, Sequence[str]]] = None):
+        self._kinds = connector_kinds(connectors) if connectors else {}
+        if not self._kinds:
+            # Most frequent kinds first; their first characters never overlap
+            self.pattern = re.compile(rf"{_LATIN}|[一-龥]+|{_NUMBER}|{_MANUAL}")
+        else:
+            cjk_words = [w for w in self._kinds if re.search(r"[一-龥]", w)]
+            cjk = r"[一-龥]"
+            if cjk_words:
+                cjk = rf"(?!{'|'.join(re.escape(w) for w in cjk_words)}){cjk}"
+            self.pattern = re.compile(
+                rf"(?ai:({connector_pattern(self._kinds)}))|({_MANUAL}|{_LATIN}|(?:{cjk})+|{_NUMBER})"
+            )
+
+    def lex(self, name: str) -> Lexed:
+        """Lex a raw node name."""
+        connectors: List[Connector] = []
+        if not self._kinds:
+            parts = self.pattern.findall(name)
+        else:
+            # (connector, other token) pairs
+            pairs = self.pattern.findall(name)
+            parts = [connector or other for connector, other in pairs]
+            if any(connector for connector, _ in pairs):
+                offset = 0  # normalized length of the tokens so far
+                for connector, other in pairs:
+                    length = len(normalize(connector or other))
+                    if connector:
+                        connectors.append(Connector(self._kinds[connector.lower()], offset, offset + length))
+                    offset += length
+
+        multiplier = None
+        manual = []
+        for text in parts:
+            first = text[0]
+            if first in _DIGITS:
+                value = float(text)
+                multiplier = value if value > 0 else None
+                break
+            if first == "[":
+                digits = _DIGIT_RUN.search(text)
+                if digits:
+                    value = float(digits.group())
+                    multiplier = value if value > 0 else None
+                    break
+        if "[" in name:
+            for text in parts:
+                if text[0] == "[":
+                    kind, code = text[1:-1].split(":")
+                    manual.append((kind.lower(), code.upper()))
+
+        # Decimal points, tag punctuation and connector symbols are the only
+        # characters of the tokens that normalize() drops
+        normalized = "".join(parts)
+        if "." in normalized or "[" in normalized or connectors:
+            normalized = normalize(normalized)
+        else:
+            normalized = normalized.lower()
+        return Lexed(normalized, multiplier, manual, connectors)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Universal alias index and greedy matcher (NNS v2).
+
+Mirrors buildUniversalIndex/findMatchesGreedy in plugin/plugin.js: aliases
+from countries, cities, lines and tags are normalized, ordered by length
+(descending) then category priority, and matched longest-first without
+overlaps. Instead of calling indexOf for every alias, all occurrences are
+collected in one Aho-Corasick pass and then accepted in index order.
+"""
+import hashlib
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+
+from .automaton import AhoCorasick
+from .dictionaries import DEFAULT_DICT_DIR, Dictionaries
+
+
+# Priority matrix for aliases of equal length
+CATEGORY_PRIORITY = {"region": 10, "city": 9, "line": 8, "tag": 5}
+
+# Compiled matcher artifact (dict/generated/matcher.json)
+MATCHER_FILE = "matcher.json"
+MATCHER_FORMAT = 1
+MATCHER_SOURCES = ["countries.json", "cities.json", "line_alias_map.json", "tag_alias_map.json"]
+
+_NON_ALIAS_CHARS = re.compile(r"[^\u4e00-\u9fa5a-zA-Z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Normalize text for alias matching (v2Normalize in plugin.js).
+
+    Keeps CJK ideographs, ASCII letters and digits, and lowercases the result.
+
+    Examples:
+        >>> normalize("🇭🇰 Hong Kong-01")
+        'hongkong01'
+    """
+    if not text:
+        return ""
+    return _NON_ALIAS_CHARS.sub("", text).lower()
+
+
+@dataclass(frozen=True)
+class IndexEntry:
+    """One normalized alias in the universal index."""
+    alias: str
+    code: str
+    category: str
+    weight: int
+    region: Optional[str] = None
+
+
+class Match(NamedTuple):
+    """An accepted alias occurrence in a normalized name."""
+    entry: IndexEntry
+    start: int
+    end: int
+
+
+def build_universal_index(dicts: Dictionaries) -> List[IndexEntry]:
+    """Build the universal alias index in matching order.
+
+    Args:
+        dicts: Loaded dictionaries
+
+    Returns:
+        Index entries sorted by alias length (descending), then category
+        priority (descending); ties keep dictionary order
+    """
+    index: List[IndexEntry] = []
+
+    for code, data in dicts.countries.items():
+        for alias in data.get("aliases") or []:
+            norm = normalize(alias)
+            if norm:
+                index.append(IndexEntry(norm, code, "region", CATEGORY_PRIORITY["region"]))
+
+    for region, region_cities in dicts.cities.items():
+        for city_code, data in region_cities.items():
+            for alias in data.get("aliases") or []:
+                norm = normalize(alias)
+                if norm:
+                    index.append(
+                        IndexEntry(norm, city_code, "city", CATEGORY_PRIORITY["city"], region)
+                    )
+
+    for alias, code in dicts.line_alias_map.items():
+        norm = normalize(alias)
+        if norm:
+            index.append(IndexEntry(norm, code, "line", CATEGORY_PRIORITY["line"]))
+
+    for alias, code in dicts.tag_alias_map.items():
+        norm = normalize(alias)
+        if norm:
+            index.append(IndexEntry(norm, code, "tag", CATEGORY_PRIORITY["tag"]))
+
+    # Stable sort, same as Array.prototype.sort in the JS engine
+    index.sort(key=lambda e: (-len(e.alias), -e.weight))
+    return index
+
+
+class UniversalMatcher:
+    """Greedy longest-match-first alias matcher.
+
+    Only the first index entry for each distinct alias string can ever be
+    accepted (later duplicates always hit occupied positions), so duplicates
+    are dropped and an entry's rank is its position in the index.
+    """
+
+    def __init__(self, index: List[IndexEntry]):
+        entries: List[IndexEntry] = []
+        seen = set()
+        for entry in index:
+            if entry.alias in seen:
+                continue
+            seen.add(entry.alias)
+            entries.append(entry)
+        self.entries = entries
+        self.automaton = AhoCorasick([e.alias for e in entries])
+
+    @classmethod
+    def from_dictionaries(cls, dicts: Dictionaries) -> "UniversalMatcher":
+        return cls(build_universal_index(dicts))
+
+    @classmethod
+    def from_artifact(cls, data: Dict[str, Any]) -> "UniversalMatcher":
+        """Restore a matcher from a compiled artifact (see to_artifact).
+
+        Entries are already normalized, sorted and deduplicated, and the
+        automaton tables are loaded as-is, so no index work happens here.
+
+        Raises:
+            ValueError: If the artifact format is not supported
+        """
+        if data.get("format") != MATCHER_FORMAT:
+            raise ValueError(f"Unsupported matcher format: {data.get('format')}")
+        matcher = cls.__new__(cls)
+        matcher.entries = [
+            IndexEntry(alias, code, category, CATEGORY_PRIORITY[category], region)
+            for alias, category, code, region in data["entries"]
+        ]
+        matcher.automaton = AhoCorasick.from_tables(
+            [e.alias for e in matcher.entries], data["automaton"]
+        )
+        return matcher
+
+    def to_artifact(self) -> Dict[str, Any]:
+        """Serialize the matcher (entries in matching order + automaton tables)."""
+        return {
+            "format": MATCHER_FORMAT,
+            "priority": CATEGORY_PRIORITY,
+            "entries": [[e.alias, e.category, e.code, e.region] for e in self.entries],
+            "automaton": self.automaton.to_tables(),
+        }
+
+    def find_matches(self, name: str) -> List[Match]:
+        """Find all accepted alias matches in a node name.
+
+        Args:
+            name: Raw node name
+
+        Returns:
+            Non-overlapping matches ordered by start offset in the
+            normalized name
+        """
+        return self.find_matches_normalized(normalize(name))
+
+    def find_matches_normalized(self, norm_name: str, cuts: Sequence[int] = ()) -> List[Match]:
+        """Same as find_matches, for an already normalized name.
+
+        Args:
+            norm_name: Normalized node name
+            cuts: Offsets no match may span (connector boundaries); an
+                occurrence containing one is discarded before the greedy
+                pass, so a shorter alias on either side can be accepted
+        """
+        hits = sorted(self.automaton.find_all(norm_name))
+        if not hits:
+            return []
+        if cuts:
+            cut = bytearray(len(norm_name) + 1)
+            for offset in cuts:
+                cut[offset] = 1
+            hits = [h for h in hits if cut.find(1, h[1] + 1, h[2]) == -1]
+        occupied = bytearray(len(norm_name))
+        entries = self.entries
+        matches = []
+        for entry_id, start, end in hits:
+            if occupied.find(1, start, end) != -1:
+                continue
+            occupied[start:end] = b"\x01" * (end - start)
+            matches.append(Match(entries[entry_id], start, end))
+        matches.sort(key=lambda m: m.start)
+        return matches
+
+
+def source_hashes(generated_dir: Path) -> Dict[str, str]:
+    """SHA-256 of each dictionary file the matcher is compiled from."""
+    return {
+        name: hashlib.sha256((generated_dir / name).read_bytes()).hexdigest()
+        for name in MATCHER_SOURCES
+    }
+
+
+def load_matcher(
+    generated_dir: Optional[Union[str, Path]] = None,
+    verify: bool = True,
+) -> Optional[UniversalMatcher]:
+    """Load the compiled matcher artifact if it is present and current.
+
+    Args:
+        generated_dir: Directory containing matcher.json (defaults to
+            dict/generated)
+        verify: Check the recorded source hashes against the dictionary files
+
+    Returns:
+        The matcher, or None if the artifact is missing, has an unsupported
+        format or was compiled from different dictionaries
+    """
+    base = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+    path = base / MATCHER_FILE
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != MATCHER_FORMAT:
+        return None
+    if verify:
+        try:
+            if data.get("sources") != source_hashes(base):
+                return None
+        except FileNotFoundError:
+            return None
+    return UniversalMatcher.from_artifact(data)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-stage metrics of the parse/format pipeline.
+
+A Profiler attached to an engine times each stage of Engine.parse and
+Engine.format, named after their plugin.js counterparts:
+
+    status      isStatusLine
+    ad          isAdLine
+    lex         extractMultiplier, v2Normalize and the manual-tag and
+                connector scans (one lexer pass, nns/lexer.py)
+    match       findMatchesGreedy
+    segment     connector segmentation (segment_connectors only; SPEC v2 §7,
+                no plugin.js counterpart), including its score calls
+    candidates  generateCandidates
+    score       calculateScore (once per candidate)
+    connector   exit connector search
+    format      formatNodeName
+    parse       the whole parseNodeName call
+
+attach() shadows those methods on the engine instance with timed wrappers
+and detach() removes them again, so an engine without a profiler runs the
+unmodified methods: disabled metrics cost nothing. Timings include a
+wrapper call (well under a microsecond), which matters only for the
+cheapest stages. A profiler is not thread-safe; attach it to an engine used
+by one thread.
+"""
+import heapq
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .engine import Engine
+
+
+# Stages in pipeline order (parse is the total)
+STAGES = ("status", "ad", "lex", "match", "segment", "candidates", "score", "connector", "format", "parse")
+
+# Entries of the slowest names and alias hits kept in snapshots
+DEFAULT_SLOWEST = 10
+DEFAULT_TOP_ALIASES = 20
+
+
+class LatencyHistogram:
+    """Call count, total and power-of-two nanosecond buckets of one stage."""
+
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        # buckets[i] counts durations in [2**(i-1), 2**i) ns
+        self.buckets = [0] * 64
+
+    def record(self, ns: int) -> None:
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min(ns.bit_length(), 63)] += 1
+
+    def percentile(self, fraction: float) -> int:
+        """Upper bound in ns of the bucket holding the given fraction of calls."""
+        if not self.count:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ns / 1e6, 3),
+            "mean_us": round(self.total_ns / self.count / 1e3, 2) if self.count else 0.0,
+            "p50_us": round(self.percentile(0.5) / 1e3, 2),
+            "p90_us": round(self.percentile(0.9) / 1e3, 2),
+            "p99_us": round(self.percentile(0.99) / 1e3, 2),
+            "max_us": round(self.max_ns / 1e3, 2),
+        }
+
+
+class _TimedPattern:
+    """Exit connector pattern whose searches are recorded."""
+
+    def __init__(self, pattern: Any, histogram: LatencyHistogram):
+        self.pattern = pattern
+        self.histogram = histogram
+
+    def search(self, text: str) -> Any:
+        start = time.perf_counter_ns()
+        found = self.pattern.search(text)
+        self.histogram.record(time.perf_counter_ns() - start)
+        return found
+
+
+class Profiler:
+    """Stage latencies, slowest names and alias hits of profiled engines.
+
+    Example:
+        >>> profiler = Profiler()
+        >>> with profiler.attached(engine):
+        ...     for name in names:
+        ...         engine.rename(name)
+        >>> print(profiler.report())
+    """
+
+    def __init__(self, slowest: int = DEFAULT_SLOWEST, top_aliases: int = DEFAULT_TOP_ALIASES):
+        self.slowest_kept = slowest
+        self.top_aliases = top_aliases
+        self.stages: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in STAGES}
+        # (category, normalized alias, code) -> greedy matches
+        self.alias_hits: "Counter[Tuple[str, str, str]]" = Counter()
+        self._slowest: List[Tuple[int, str]] = []  # min-heap of (ns, name)
+
+    # ---------- attaching ----------
+
+    def _timed(self, stage: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        histogram = self.stages[stage]
+        clock = time.perf_counter_ns
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start = clock()
+            result = func(*args, **kwargs)
+            histogram.record(clock() - start)
+            return result
+        return timed
+
+    def attach(self, engine: Engine) -> None:
+        """Record the stages of an engine's parses and formats until detach()."""
+        if "parse" in vars(engine):
+            raise RuntimeError("Engine already has a profiler attached")
+        for stage, method in (
+            ("status", "is_status_line"),
+            ("ad", "is_ad_line"),
+            ("lex", "lex"),
+            ("segment", "segment_locations"),
+            ("candidates", "generate_candidates"),
+            ("score", "calculate_score"),
+            ("format", "format"),
+        ):
+            setattr(engine, method, self._timed(stage, getattr(engine, method)))
+
+        find_matches = self._timed("match", engine.matcher.find_matches_normalized)
+        hits = self.alias_hits
+
+        def counted_find_matches(*args: Any) -> Any:
+            matches = find_matches(*args)
+            for m in matches:
+                hits[(m.entry.category, m.entry.alias, m.entry.code)] += 1
+            return matches
+        engine.matcher.find_matches_normalized = counted_find_matches  # type: ignore[method-assign]
+
+        if engine.exit_connector is not None:
+            engine.exit_connector = _TimedPattern(engine.exit_connector, self.stages["connector"])  # type: ignore[assignment]
+
+        parse = engine.parse
+        histogram = self.stages["parse"]
+        slowest = self._slowest
+        kept = self.slowest_kept
+        clock = time.perf_counter_ns
+
+        def timed_parse(name: str) -> Any:
+            start = clock()
+            result = parse(name)
+            ns = clock() - start
+            histogram.record(ns)
+            if len(slowest) < kept:
+                heapq.heappush(slowest, (ns, name))
+            elif kept and ns > slowest[0][0]:
+                heapq.heapreplace(slowest, (ns, name))
+            return result
+        engine.parse = timed_parse  # type: ignore[method-assign]
+
+    def detach(self, engine: Engine) -> None:
+        """Restore the engine's own methods."""
+        for method in (
+            "is_status_line", "is_ad_line", "lex", "segment_locations",
+            "generate_candidates", "calculate_score", "format", "parse",
+        ):
+            vars(engine).pop(method, None)
+        vars(engine.matcher).pop("find_matches_normalized", None)
+        if isinstance(engine.exit_connector, _TimedPattern):
+            engine.exit_connector = engine.exit_connector.pattern
+
+    @contextmanager
+    def attached(self, engine: Engine) -> Iterator["Profiler"]:
+        self.attach(engine)
+        try:
+            yield self
+        finally:
+            self.detach(engine)
+
+    # ---------- reporting ----------
+
+    def slowest(self) -> List[Tuple[str, float]]:
+        """Slowest parsed names with their parse time in µs, slowest first."""
+        return [(name, ns / 1e3) for ns, name in sorted(self._slowest, reverse=True)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current metrics as a JSON-serializable dict."""
+        return {
+            "names": self.stages["parse"].count,
+            "stages": {stage: h.to_dict() for stage, h in self.stages.items() if h.count},
+            "slowest": [{"name": name, "us": round(us, 2)} for name, us in self.slowest()],
+            "aliases": [
+                {"category": category, "alias": alias, "code": code, "hits": n}
+                for (category, alias, code), n in self.alias_hits.most_common(self.top_aliases)
+            ],
+        }
+
+    def report(self, shown: Optional[int] = None) -> str:
+        """Human-readable report of snapshot().
+
+        Args:
+            shown: Slowest names and aliases listed (defaults to all kept)
+        """
+        snap = self.snapshot()
+        parse_ms = snap["stages"].get("parse", {}).get("total_ms", 0.0)
+        lines = [f"{snap['names']} names parsed in {parse_ms:.1f} ms"]
+        lines.append(f"  {'stage':<11} {'calls':>9} {'total ms':>10} {'share':>6} "
+                     f"{'mean µs':>8} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>9}")
+        for stage, s in snap["stages"].items():
+            share = s["total_ms"] / parse_ms * 100 if parse_ms and stage not in ("parse", "format") else None
+            lines.append(
+                f"  {stage:<11} {s['count']:>9} {s['total_ms']:>10.1f} "
+                f"{(f'{share:.0f}%' if share is not None else ''):>6} {s['mean_us']:>8.2f} "
+                f"{s['p50_us']:>7.1f} {s['p90_us']:>7.1f} {s['p99_us']:>7.1f} {s['max_us']:>9.1f}"
+            )
+        if snap["slowest"]:
+            lines.append("  slowest names:")
+            lines += [f"    {e['us']:>9.1f} µs  {e['name']}" for e in snap["slowest"][:shown]]
+        if snap["aliases"]:
+            lines.append("  most matched aliases:")
+            lines += [
+                f"    {e['hits']:>9}  {e['category']} {e['code']} ('{e['alias']}')"
+                for e in snap["aliases"][:shown]
+            ]
+        return "\n".join(lines)
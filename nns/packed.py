@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Compact binary dictionary (dict/generated/dictionaries.bin).
+
+Packs the entity tables and alias maps into one file that is opened with
+mmap and queried in place: nothing is parsed on load and only the pages a
+lookup touches become resident.
+
+Layout (little-endian, sections 8-byte aligned):
+
+    header      magic "NNSB", u32 format, u32 section count
+    directory   per section: 24-byte name, u32 offset, u32 length
+    strings     u32 count, u32 offsets[count + 1], UTF-8 data; every
+                distinct string is stored once and referenced by id
+    lists       u32 pool; a list is stored as its length followed by items
+    meta        JSON object (version, source hashes), decoded on demand
+    <map>       minimal perfect hash index: u32 size, u32 buckets, then
+                u32 (d0, d1) per bucket and u32 (key, value) per slot
+    <table>     an index as above, followed by fixed-width u32 records
+
+Keys are placed with hash-and-displace (CHD): a key's BLAKE2b digest
+selects a bucket, and the bucket's displacement pair maps it to slot
+(mix(f1 + d0 * f2) + d1) mod size. Every slot holds exactly one key, and lookups
+compare the stored key to reject strings that are not in the map.
+"""
+import hashlib
+import json
+import mmap
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .dictionaries import DEFAULT_DICT_DIR, Dictionaries
+
+
+PACKED_FILE = "dictionaries.bin"
+PACKED_FORMAT = 1
+PACKED_SOURCES = [
+    "countries.json",
+    "country_alias_map.json",
+    "lines.json",
+    "line_alias_map.json",
+    "tags.json",
+    "tag_alias_map.json",
+    "cities.json",
+    "city_alias_map.json",
+    "keywords_status.json",
+    "keywords_ad.json",
+    "keywords_connectors.json",
+]
+
+MAGIC = b"NNSB"
+_HEADER = struct.Struct("<4sII")
+_DIRECTORY_ENTRY = struct.Struct("<24sII")
+_U32 = struct.Struct("<I")
+_PAIR = struct.Struct("<II")
+
+# Average keys per hash bucket
+BUCKET_SIZE = 4
+
+# Maps store a string id per key, or a list pointer for list-valued maps
+SCALAR_MAPS = ["country_alias_map", "line_alias_map", "tag_alias_map"]
+LIST_MAPS = ["city_alias_map"]
+
+# Record fields after the key; "aliases" is a list of strings
+TABLE_FIELDS = {
+    "countries": ["cc", "flag", "name_en", "name_zh", "aliases"],
+    "lines": ["display_en", "display_zh", "aliases"],
+    "tags": ["display_en", "display_zh", "aliases"],
+    "cities": ["name_en", "name_zh", "aliases"],
+}
+_LIST_FIELDS = {"aliases"}
+
+
+_M64 = (1 << 64) - 1
+
+
+_DIGEST = struct.Struct("<QQQ")
+
+
+def _hash(key: bytes) -> Tuple[int, int, int]:
+    """Split the digest of a key into (bucket hash, f1, f2)."""
+    return _DIGEST.unpack(hashlib.blake2b(key, digest_size=24).digest())
+
+
+def _mix(f1: int, f2: int, d0: int) -> int:
+    """Probe of a key for displacement d0.
+
+    Mixing before the reduction keeps keys apart whose f1/f2 agree modulo
+    the table size.
+    """
+    x = (f1 + d0 * f2) & _M64
+    return (((x ^ (x >> 31)) * 0x9E3779B97F4A7C15) & _M64) >> 32
+
+
+def _place(keys: Sequence[bytes]) -> Tuple[int, List[Tuple[int, int]], List[int]]:
+    """Build a minimal perfect hash over distinct keys.
+
+    Returns:
+        Bucket count, displacement pair per bucket, and key index per slot
+    """
+    size = len(keys)
+    bucket_count = max(1, -(-size // BUCKET_SIZE))
+    buckets: List[List[int]] = [[] for _ in range(bucket_count)]
+    hashes = [_hash(key) for key in keys]
+    for i, (h0, _, _) in enumerate(hashes):
+        buckets[h0 % bucket_count].append(i)
+
+    displacements = [(0, 0)] * bucket_count
+    slots = [-1] * size
+    # Bit p is set while slot p is free; rotating it right by a key's base
+    # gives the displacements d1 that would put the key in a free slot
+    full = (1 << size) - 1
+    free = full
+    for b in sorted(range(bucket_count), key=lambda b: -len(buckets[b])):
+        members = buckets[b]
+        if not members:
+            continue
+        for d0 in range(1 << 16):
+            bases = [_mix(hashes[i][1], hashes[i][2], d0) % size for i in members]
+            if len(set(bases)) < len(bases):
+                continue
+            candidates = full
+            for base in bases:
+                candidates &= (free >> base) | ((free << (size - base)) & full)
+                if not candidates:
+                    break
+            if candidates:
+                break
+        else:
+            raise RuntimeError("Could not build the perfect hash (duplicate keys?)")
+        d1 = (candidates & -candidates).bit_length() - 1
+        for i, base in zip(members, bases):
+            slot = (base + d1) % size
+            slots[slot] = i
+            free &= ~(1 << slot)
+        displacements[b] = (d0, d1)
+    return bucket_count, displacements, slots
+
+
+class _Writer:
+    """Accumulates the interned string table and list pool."""
+
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.pool: List[int] = []
+
+    def string(self, value: str) -> int:
+        sid = self.strings.get(value)
+        if sid is None:
+            sid = self.strings[value] = len(self.strings)
+        return sid
+
+    def string_list(self, values: Sequence[str]) -> int:
+        ptr = len(self.pool)
+        self.pool.append(len(values))
+        self.pool.extend(self.string(v) for v in values)
+        return ptr
+
+    def index(self, pairs: Sequence[Tuple[str, int]], records: Sequence[Sequence[int]] = ()) -> bytes:
+        keys = [k.encode("utf-8") for k, _ in pairs]
+        bucket_count, displacements, slots = _place(keys)
+        out = [_PAIR.pack(len(pairs), bucket_count)]
+        out.extend(_PAIR.pack(d0, d1) for d0, d1 in displacements)
+        out.extend(_PAIR.pack(self.string(pairs[i][0]), pairs[i][1]) for i in slots)
+        out.extend(struct.pack(f"<{len(r)}I", *r) for r in records)
+        return b"".join(out)
+
+    def string_section(self) -> bytes:
+        encoded = [s.encode("utf-8") for s in self.strings]
+        offsets = [0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        return struct.pack(f"<I{len(offsets)}I", len(encoded), *offsets) + b"".join(encoded)
+
+
+def _table_rows(dicts: Dictionaries, table: str) -> List[Tuple[str, Dict[str, Any]]]:
+    if table == "cities":
+        return [
+            (f"{cc}.{key}", city)
+            for cc, cities in dicts.cities.items()
+            for key, city in cities.items()
+        ]
+    return list(getattr(dicts, table).items())
+
+
+def _keyword_groups(dicts: Dictionaries) -> Dict[str, List[str]]:
+    groups = {
+        "status": list(dicts.keywords_status.get("patterns") or []),
+        "ad": list(dicts.keywords_ad.get("patterns") or []),
+    }
+    for kind, words in dicts.keywords_connectors.items():
+        groups[f"connectors.{kind}"] = list(words)
+    return groups
+
+
+def pack_dictionaries(dicts: Dictionaries, meta: Optional[Dict[str, Any]] = None) -> bytes:
+    """Serialize dictionaries into the binary format.
+
+    Args:
+        dicts: Loaded dictionaries
+        meta: JSON-serializable metadata stored alongside (version, source
+            hashes)
+
+    Returns:
+        File contents
+    """
+    writer = _Writer()
+    sections: List[Tuple[str, bytes]] = []
+
+    for table, table_fields in TABLE_FIELDS.items():
+        rows = _table_rows(dicts, table)
+        records = []
+        for key, entry in rows:
+            record = [writer.string(key)]
+            for name in table_fields:
+                if name in _LIST_FIELDS:
+                    record.append(writer.string_list(entry.get(name) or []))
+                else:
+                    record.append(writer.string(entry.get(name) or ""))
+            records.append(record)
+        pairs = [(key, i) for i, (key, _) in enumerate(rows)]
+        sections.append((table, writer.index(pairs, records)))
+
+    for name in SCALAR_MAPS:
+        alias_map = getattr(dicts, name)
+        sections.append((name, writer.index([(k, writer.string(v)) for k, v in alias_map.items()])))
+    for name in LIST_MAPS:
+        alias_map = getattr(dicts, name)
+        sections.append((name, writer.index([(k, writer.string_list(v)) for k, v in alias_map.items()])))
+
+    groups = _keyword_groups(dicts)
+    sections.append(("keywords", writer.index([(k, writer.string_list(v)) for k, v in groups.items()])))
+
+    meta_data = json.dumps({"format": PACKED_FORMAT, **(meta or {})}, ensure_ascii=False, sort_keys=True)
+    sections = [
+        ("strings", writer.string_section()),
+        ("lists", struct.pack(f"<{len(writer.pool)}I", *writer.pool)),
+        ("meta", meta_data.encode("utf-8")),
+    ] + sections
+
+    offset = _HEADER.size + _DIRECTORY_ENTRY.size * len(sections)
+    directory = []
+    body = []
+    for name, data in sections:
+        padding = -offset % 8
+        body.append(b"\0" * padding)
+        offset += padding
+        directory.append(_DIRECTORY_ENTRY.pack(name.encode("ascii"), offset, len(data)))
+        body.append(data)
+        offset += len(data)
+    return _HEADER.pack(MAGIC, PACKED_FORMAT, len(sections)) + b"".join(directory) + b"".join(body)
+
+
+class PackedMap(Mapping):
+    """Read-only view of one perfect-hash section.
+
+    Iteration follows slot order, not the key order of the JSON source.
+    """
+
+    def __init__(self, packed: "PackedDictionaries", offset: int, is_list: bool = False):
+        self._packed = packed
+        self._buf = packed._buf
+        self._size, self._bucket_count = _PAIR.unpack_from(self._buf, offset)
+        self._displacements = offset + _PAIR.size
+        self._slots = self._displacements + _PAIR.size * self._bucket_count
+        self._is_list = is_list
+
+    def _slot(self, key: str) -> Optional[int]:
+        """Value stored for a key, or None if the key is absent."""
+        if not self._size:
+            return None
+        data = key.encode("utf-8")
+        h0, f1, f2 = _DIGEST.unpack(hashlib.blake2b(data, digest_size=24).digest())
+        d0, d1 = _PAIR.unpack_from(self._buf, self._displacements + _PAIR.size * (h0 % self._bucket_count))
+        slot = (_mix(f1, f2, d0) + d1) % self._size
+        key_sid, value = _PAIR.unpack_from(self._buf, self._slots + _PAIR.size * slot)
+        if self._packed._string_bytes(key_sid) != data:
+            return None
+        return value
+
+    def _value(self, value: int) -> Any:
+        return self._packed._list(value) if self._is_list else self._packed._string(value)
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._slot(key) if isinstance(key, str) else None
+        if value is None:
+            raise KeyError(key)
+        return self._value(value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._slot(key) if isinstance(key, str) else None
+        return default if value is None else self._value(value)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._slot(key) is not None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        for slot in range(self._size):
+            key_sid, _ = _PAIR.unpack_from(self._buf, self._slots + _PAIR.size * slot)
+            yield self._packed._string(key_sid)
+
+
+class PackedTable(PackedMap):
+    """Read-only view of an entity table; values are decoded into dicts.
+
+    City keys are "CC.Key", as in city_alias_map.json.
+    """
+
+    def __init__(self, packed: "PackedDictionaries", offset: int, table_fields: List[str]):
+        super().__init__(packed, offset)
+        self._fields = table_fields
+        self._record = struct.Struct(f"<{len(table_fields) + 1}I")
+        self._records = self._slots + _PAIR.size * self._size
+
+    def _value(self, value: int) -> Dict[str, Any]:
+        record = self._record.unpack_from(self._buf, self._records + self._record.size * value)
+        packed = self._packed
+        return {
+            name: packed._list(ref) if name in _LIST_FIELDS else packed._string(ref)
+            for name, ref in zip(self._fields, record[1:])
+        }
+
+    def __iter__(self) -> Iterator[str]:
+        """Keys in source order."""
+        for i in range(self._size):
+            (key_sid,) = _U32.unpack_from(self._buf, self._records + self._record.size * i)
+            yield self._packed._string(key_sid)
+
+
+class PackedDictionaries:
+    """Memory-mapped dictionaries.
+
+    Args:
+        path: Packed dictionary file
+
+    Raises:
+        ValueError: If the file is not a packed dictionary of this format
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = self._mmap
+        magic, fmt, count = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or fmt != PACKED_FORMAT:
+            self.close()
+            raise ValueError(f"Not a packed dictionary (format {PACKED_FORMAT}): {self.path}")
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for i in range(count):
+            name, offset, length = _DIRECTORY_ENTRY.unpack_from(self._buf, _HEADER.size + _DIRECTORY_ENTRY.size * i)
+            self._sections[name.rstrip(b"\0").decode("ascii")] = (offset, length)
+
+        strings = self._sections["strings"][0]
+        (self.string_count,) = _U32.unpack_from(self._buf, strings)
+        self._offsets = strings + _U32.size
+        self._string_data = self._offsets + _U32.size * (self.string_count + 1)
+        self._pool = self._sections["lists"][0]
+
+        self.countries = self._table("countries")
+        self.lines = self._table("lines")
+        self.tags = self._table("tags")
+        self.cities = self._table("cities")
+        self.country_alias_map = PackedMap(self, self._sections["country_alias_map"][0])
+        self.line_alias_map = PackedMap(self, self._sections["line_alias_map"][0])
+        self.tag_alias_map = PackedMap(self, self._sections["tag_alias_map"][0])
+        self.city_alias_map = PackedMap(self, self._sections["city_alias_map"][0], is_list=True)
+        self.keywords = PackedMap(self, self._sections["keywords"][0], is_list=True)
+
+    def _table(self, name: str) -> PackedTable:
+        return PackedTable(self, self._sections[name][0], TABLE_FIELDS[name])
+
+    def _string_bytes(self, sid: int) -> bytes:
+        start, end = _PAIR.unpack_from(self._buf, self._offsets + _U32.size * sid)
+        return self._buf[self._string_data + start:self._string_data + end]
+
+    def _string(self, sid: int) -> str:
+        start, end = _PAIR.unpack_from(self._buf, self._offsets + _U32.size * sid)
+        return self._buf[self._string_data + start:self._string_data + end].decode("utf-8")
+
+    def _list(self, ptr: int) -> List[str]:
+        offset = self._pool + _U32.size * ptr
+        (count,) = _U32.unpack_from(self._buf, offset)
+        sids = struct.unpack_from(f"<{count}I", self._buf, offset + _U32.size)
+        return [self._string(sid) for sid in sids]
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        offset, length = self._sections["meta"]
+        return json.loads(self._buf[offset:offset + length].decode("utf-8"))
+
+    def city(self, cc: str, key: str) -> Optional[Dict[str, Any]]:
+        return self.cities.get(f"{cc}.{key}")
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self) -> "PackedDictionaries":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+def source_hashes(generated_dir: Path) -> Dict[str, str]:
+    """SHA-256 of each dictionary file packed into the binary dictionary."""
+    return {
+        name: hashlib.sha256((generated_dir / name).read_bytes()).hexdigest()
+        for name in PACKED_SOURCES
+    }
+
+
+def load_packed(
+    generated_dir: Optional[Union[str, Path]] = None,
+    verify: bool = True,
+) -> Optional[PackedDictionaries]:
+    """Open the packed dictionary if it is present and current.
+
+    Args:
+        generated_dir: Directory containing dictionaries.bin (defaults to
+            dict/generated)
+        verify: Check the recorded source hashes against the JSON files
+
+    Returns:
+        The packed dictionaries, or None if the file is missing, has an
+        unsupported format or was packed from different dictionaries
+    """
+    base = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+    path = base / PACKED_FILE
+    if not path.exists():
+        return None
+    try:
+        packed = PackedDictionaries(path)
+    except ValueError:
+        return None
+    if verify:
+        try:
+            current = source_hashes(base)
+        except FileNotFoundError:
+            current = None
+        if packed.meta.get("sources") != current:
+            packed.close()
+            return None
+    return packed
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+Exit location probes (lookupIPLocation in plugin.js), scheduled in bulk.
+
+The plugin looks up one node at a time and keeps results in memory only. A
+ProbeScheduler takes a whole subscription's servers at once:
+
+- servers are deduplicated by host, so each host is probed once
+- results (including failures, for a shorter time) are kept in a SQLite
+  ProbeStore with a TTL, so a rerun or another process reuses them
+- probes run on a thread pool, each endpoint (host of the API URL) limited
+  by its own token bucket
+- every request has a timeout; network errors, HTTP 429 and 5xx responses
+  are retried with exponential backoff (429 honours Retry-After)
+
+The API is described like the plugin's ip_lookup spec: a URL template with
+``${target}``, request headers, an optional response dataPath and the
+response fields holding region, city and IP. With a ``switch`` callback
+(tester mode: route the probe through the node itself, the URL gets an
+empty target), probes share one tester group and run one at a time.
+"""
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+
+# Default spec of the plugin (ip-api.com; 45 requests per minute when free)
+DEFAULT_URL = "http://ip-api.com/json/${target}?fields=status,message,countryCode,city,query"
+DEFAULT_MAPPING = {"region": "countryCode", "city": "city", "ip": "query"}
+
+DEFAULT_WORKERS = 8
+# Requests per second and burst of each endpoint
+DEFAULT_RATE = 45 / 60
+DEFAULT_BURST = 4
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.5
+# Wait after switching the tester group (as the plugin does)
+DEFAULT_SETTLE = 0.2
+
+# Seconds results are kept; failures are retried sooner
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_FAILURE_TTL = 3600
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    region TEXT,
+    city TEXT,
+    ip TEXT,
+    probed_at REAL NOT NULL,
+    PRIMARY KEY (source, target)
+);
+"""
+
+
+@dataclass
+class ProbeSpec:
+    """IP lookup API: request template and response mapping."""
+    url: str = DEFAULT_URL
+    headers: Dict[str, str] = field(default_factory=lambda: {"Accept": "application/json"})
+    data_path: Optional[str] = None
+    mapping: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_MAPPING))
+
+    @classmethod
+    def from_dict(cls, custom: Optional[Dict[str, Any]] = None) -> "ProbeSpec":
+        """Spec from the plugin's customIP JSON (``{request: {url, headers}, response: {...}}``).
+
+        As in the plugin, a custom spec without request.url is ignored, and
+        its request/response objects replace the defaults as a whole.
+        """
+        if not custom or not (custom.get("request") or {}).get("url"):
+            return cls()
+        request = custom["request"]
+        response = custom.get("response") or {"mapping": dict(DEFAULT_MAPPING)}
+        return cls(
+            url=request["url"],
+            headers=dict(request.get("headers") or {}),
+            data_path=response.get("dataPath"),
+            mapping=dict(response.get("mapping") or {}),
+        )
+
+    @property
+    def endpoint(self) -> str:
+        return urlsplit(self.url).netloc
+
+    def request_url(self, target: str) -> str:
+        return self.url.replace("${target}", quote(target, safe=""))
+
+    def parse(self, body: Any) -> Optional["ProbeResult"]:
+        """Location of a response body, or None if it has no region."""
+        data = body
+        for part in (self.data_path or "").split("."):
+            if part:
+                data = data.get(part) if isinstance(data, dict) else None
+        if not isinstance(data, dict):
+            return None
+        region = data.get(self.mapping.get("region", ""))
+        if not region:
+            return None
+        city = data.get(self.mapping.get("city", ""))
+        ip = data.get(self.mapping.get("ip", ""))
+        return ProbeResult(str(region), str(city) if city else None, str(ip) if ip else None)
+
+
+@dataclass
+class ProbeResult:
+    """Located exit of a server."""
+    region: str
+    city: Optional[str] = None
+    ip: Optional[str] = None
+
+
+@dataclass
+class ProbeStats:
+    """Counters of a probe run."""
+    targets: int = 0
+    unique: int = 0
+    cached: int = 0
+    probed: int = 0
+    located: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.targets} servers ({self.unique} hosts) in {self.elapsed:.2f}s: "
+            f"{self.cached} cached, {self.probed} probed ({self.located} located, "
+            f"{self.failed} failed, {self.retries} retries)"
+        )
+
+
+def normalize_host(server: str) -> str:
+    """Deduplication key of a server address (host without port or brackets)."""
+    host = server.strip()
+    if host.startswith("["):
+        host = host[1:].split("]", 1)[0]
+    elif host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    return host.rstrip(".").lower()
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` requests per second with bursts of ``burst``.
+
+    Callers reserve a token and sleep until it is due, so waiting callers
+    are served in order. A rate of 0 or None disables the limit.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = DEFAULT_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting if needed; returns the seconds waited."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class ProbeStore:
+    """Probe results with a TTL, in SQLite (in memory without a path).
+
+    Entries are keyed by API URL template and host, so stores can be shared
+    between specs. Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        ttl: float = DEFAULT_TTL,
+        failure_ttl: float = DEFAULT_FAILURE_TTL,
+    ):
+        self.path = Path(path) if path is not None else None
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path) if path is not None else ":memory:", check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+
+    def get(self, source: str, target: str) -> Tuple[bool, Optional[ProbeResult]]:
+        """(found, result) of a host; an expired entry is not found."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT region, city, ip, probed_at FROM probes WHERE source = ? AND target = ?",
+                (source, target),
+            ).fetchone()
+        if row is None:
+            return False, None
+        region, city, ip, probed_at = row
+        if time.time() - probed_at > (self.ttl if region else self.failure_ttl):
+            return False, None
+        return True, ProbeResult(region, city, ip) if region else None
+
+    def put(self, source: str, target: str, result: Optional[ProbeResult]) -> None:
+        row = (source, target, result and result.region, result and result.city, result and result.ip, time.time())
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?, ?, ?)", row)
+
+    def purge(self) -> int:
+        """Delete expired entries; returns how many were removed."""
+        now = time.time()
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "DELETE FROM probes WHERE probed_at < CASE WHEN region IS NULL THEN ? ELSE ? END",
+                (now - self.failure_ttl, now - self.ttl),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self) -> "ProbeStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class ProbeScheduler:
+    """Locate many servers with bounded concurrency and per-endpoint rate limits.
+
+    Args:
+        spec: Lookup API (defaults to the plugin's ip-api.com spec)
+        store: Result store (defaults to an in-memory one)
+        workers: Probes running at once
+        rate: Requests per second of each endpoint (None: unlimited)
+        burst: Requests an idle endpoint may send at once
+        endpoint_rates: Rates of specific endpoints (URL host), overriding rate
+        timeout: Seconds per request
+        retries: Extra attempts after a network error, 429 or 5xx
+        backoff: Seconds before the first retry, doubled for each further one
+        switch: Tester mode: called with the target before its probe to
+            route the probe through that node; probes then run one at a time
+        settle: Seconds to wait after switch()
+
+    Example:
+        >>> with ProbeScheduler(store=ProbeStore("probes.db")) as scheduler:
+        ...     located = scheduler.probe_all(["1.1.1.1", "8.8.8.8", "1.1.1.1"])
+        >>> located["8.8.8.8"].region
+        'US'
+    """
+
+    def __init__(
+        self,
+        spec: Optional[ProbeSpec] = None,
+        store: Optional[ProbeStore] = None,
+        workers: int = DEFAULT_WORKERS,
+        rate: Optional[float] = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        endpoint_rates: Optional[Dict[str, float]] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        switch: Optional[Callable[[str], None]] = None,
+        settle: float = DEFAULT_SETTLE,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.spec = spec or ProbeSpec()
+        self.store = store if store is not None else ProbeStore()
+        self.workers = 1 if switch is not None else workers
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.switch = switch
+        self.settle = settle
+        self.stats = ProbeStats()
+        self._rate = rate
+        self._burst = burst
+        self._endpoint_rates = dict(endpoint_rates or {})
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def _limiter(self, endpoint: str) -> RateLimiter:
+        with self._lock:
+            limiter = self._limiters.get(endpoint)
+            if limiter is None:
+                rate = self._endpoint_rates.get(endpoint, self._rate)
+                limiter = self._limiters[endpoint] = RateLimiter(rate, self._burst)
+            return limiter
+
+    def _fetch(self, url: str) -> Any:
+        """GET a JSON body, retrying transient failures.
+
+        Raises:
+            OSError: If the last attempt failed (URLError, HTTPError, timeout)
+            ValueError: If the body is not JSON
+        """
+        limiter = self._limiter(urlsplit(url).netloc)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            delay = self.backoff * (2 ** attempt)
+            try:
+                with urlopen(Request(url, headers=self.spec.headers), timeout=self.timeout) as resp:
+                    return json.loads(resp.read().decode("utf-8"))
+            except HTTPError as exc:
+                if exc.code not in _RETRY_STATUS or attempt >= self.retries:
+                    raise
+                retry_after = exc.headers.get("Retry-After", "") if exc.headers else ""
+                if retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            except (URLError, TimeoutError, ConnectionError):
+                if attempt >= self.retries:
+                    raise
+            attempt += 1
+            with self._lock:
+                self.stats.retries += 1
+            time.sleep(delay)
+
+    def _probe(self, target: str) -> Optional[ProbeResult]:
+        try:
+            if self.switch is not None:
+                self.switch(target)
+                time.sleep(self.settle)
+                body = self._fetch(self.spec.request_url(""))
+            else:
+                body = self._fetch(self.spec.request_url(target))
+            result = self.spec.parse(body)
+        except (OSError, ValueError):
+            result = None
+        self.store.put(self.spec.url, target, result)
+        with self._lock:
+            self.stats.probed += 1
+            if result is None:
+                self.stats.failed += 1
+            else:
+                self.stats.located += 1
+        return result
+
+    def probe_all(self, servers: Iterable[str]) -> Dict[str, Optional[ProbeResult]]:
+        """Locate servers, probing each host not in the store once.
+
+        Returns:
+            Server (as given) -> result, None where the lookup failed
+        """
+        start = time.perf_counter()
+        servers = list(servers)
+        hosts = list(dict.fromkeys(normalize_host(s) for s in servers if s and s.strip()))
+        self.stats.targets += len(servers)
+        self.stats.unique += len(hosts)
+
+        results: Dict[str, Optional[ProbeResult]] = {}
+        missing: List[str] = []
+        for host in hosts:
+            found, result = self.store.get(self.spec.url, host)
+            if found:
+                results[host] = result
+                self.stats.cached += 1
+            else:
+                missing.append(host)
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                for host, result in zip(missing, pool.map(self._probe, missing)):
+                    results[host] = result
+        self.stats.elapsed += time.perf_counter() - start
+        return {s: results.get(normalize_host(s)) for s in servers}
+
+    def probe(self, server: str) -> Optional[ProbeResult]:
+        """Locate one server (from the store when possible)."""
+        return self.probe_all([server]).get(server)
+
+    def close(self) -> None:
+        self.store.close()
+
+    def __enter__(self) -> "ProbeScheduler":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
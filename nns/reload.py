@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Reloadable engine handle: swap in updated dictionaries without downtime.
+
+The handle holds one immutable Engine snapshot. reload() loads the new
+dictionaries and compiled artifacts from the dictionary directory into a
+fresh Engine, checks the files against the SHA-256 hashes in version.json,
+and only then replaces the snapshot with a single reference assignment.
+Callers that took a snapshot (handle.engine, or a parse already running)
+finish on the old one, which is freed once the last of them lets go; the
+time from swap to release is recorded in the reload's stats.
+
+``python -m nns update`` writes version.json last, so watch() polling
+version.json only reloads once a complete update is on disk.
+"""
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .dictionaries import DEFAULT_DICT_DIR, dictionary_hashes
+from .engine import Engine, ParseResult
+from .update import verify_dictionaries
+
+
+# Seconds between version.json checks of watch()
+DEFAULT_WATCH_INTERVAL = 2.0
+
+
+@dataclass
+class ReloadStats:
+    """Outcome of one reload."""
+    version: Optional[str]
+    previous_version: Optional[str]
+    load_ms: float
+    swap_us: float
+    swapped_at: float
+    # Set when the previous engine is garbage collected
+    released_ms: Optional[float] = None
+
+    @property
+    def released(self) -> bool:
+        """Whether the previous engine has been freed."""
+        return self.released_ms is not None
+
+    def summary(self) -> str:
+        released = f"released after {self.released_ms:.0f} ms" if self.released else "not released yet"
+        return (
+            f"v{self.previous_version} -> v{self.version}: loaded in {self.load_ms:.0f} ms, "
+            f"swapped in {self.swap_us:.1f} µs, previous engine {released}"
+        )
+
+
+def _version_of(engine: Engine) -> Optional[str]:
+    return (engine.dicts.version or {}).get("version")
+
+
+class EngineHandle:
+    """Current engine of a dictionary directory, reloadable at runtime.
+
+    Args:
+        generated_dir: Dictionary directory (defaults to dict/generated)
+        verify: Refuse dictionaries that do not match version.json
+        on_reload: Called with the new engine and the reload's stats after
+            each swap
+
+    Raises:
+        RuntimeError: If verify is set and the initial dictionaries do not
+            match version.json
+
+    Example:
+        >>> handle = EngineHandle()
+        >>> engine = handle.engine          # snapshot for a unit of work
+        >>> engine.parse("香港 IEPL").region
+        'HK'
+    """
+
+    def __init__(
+        self,
+        generated_dir: Optional[Union[str, Path]] = None,
+        verify: bool = True,
+        on_reload: Optional[Callable[[Engine, ReloadStats], None]] = None,
+    ):
+        self.generated_dir = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+        self.verify = verify
+        self.on_reload = on_reload
+        self.history: List[ReloadStats] = []
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._engine, self._hashes = self._load()
+
+    @property
+    def engine(self) -> Engine:
+        """Current engine snapshot; keep using the same one for related work."""
+        return self._engine
+
+    @property
+    def version(self) -> Optional[str]:
+        return _version_of(self._engine)
+
+    def parse(self, name: str) -> ParseResult:
+        return self._engine.parse(name)
+
+    def rename(self, name: str, config: Dict[str, Any], spec: str = "v2") -> Optional[str]:
+        return self._engine.rename(name, config, spec)
+
+    # ---------- reloading ----------
+
+    def _load(self):
+        """Load and verify the directory's dictionaries (off the hot path).
+
+        Returns:
+            (engine, dictionary hashes)
+        """
+        before = dictionary_hashes(self.generated_dir)
+        if self.verify:
+            problems = verify_dictionaries(self.generated_dir)
+            if problems:
+                raise RuntimeError(
+                    f"Dictionaries in {self.generated_dir} do not match version.json: "
+                    + ", ".join(problems)
+                )
+        engine = Engine.load(self.generated_dir)
+        if dictionary_hashes(self.generated_dir) != before:
+            raise RuntimeError(f"Dictionaries in {self.generated_dir} changed while loading")
+        return engine, before
+
+    def changed(self) -> bool:
+        """Whether the directory's dictionary files differ from the loaded ones."""
+        return dictionary_hashes(self.generated_dir) != self._hashes
+
+    def reload(self, force: bool = False) -> Optional[ReloadStats]:
+        """Load the directory's current dictionaries and swap them in.
+
+        Only one reload runs at a time. Parses keep running on the current
+        engine until the swap.
+
+        Args:
+            force: Reload even if no dictionary file changed
+
+        Returns:
+            Stats of the reload, or None if nothing changed
+
+        Raises:
+            RuntimeError: If the new dictionaries do not match version.json
+                or changed while loading; the current engine stays in use
+        """
+        with self._lock:
+            if not force and not self.changed():
+                return None
+            start = time.perf_counter()
+            engine, hashes = self._load()
+            load_ms = (time.perf_counter() - start) * 1000
+
+            previous = self._engine
+            swap_start = time.perf_counter()
+            self._engine = engine
+            swapped_at = time.perf_counter()
+            self._hashes = hashes
+
+            stats = ReloadStats(
+                version=_version_of(engine),
+                previous_version=_version_of(previous),
+                load_ms=load_ms,
+                swap_us=(swapped_at - swap_start) * 1e6,
+                swapped_at=swapped_at,
+            )
+
+            def released(_ref: Any, stats: ReloadStats = stats) -> None:
+                stats.released_ms = (time.perf_counter() - stats.swapped_at) * 1000
+
+            # Kept on the stats so the callback outlives this frame
+            stats._previous_ref = weakref.ref(previous, released)  # type: ignore[attr-defined]
+            del previous
+            self.history.append(stats)
+
+        if self.on_reload is not None:
+            self.on_reload(engine, stats)
+        return stats
+
+    def reload_in_background(self, force: bool = False) -> threading.Thread:
+        """Run reload() in a daemon thread; failures are only logged by the thread (see watch())."""
+        thread = threading.Thread(target=self.reload, kwargs={"force": force}, daemon=True)
+        thread.start()
+        return thread
+
+    def watch(
+        self,
+        interval: float = DEFAULT_WATCH_INTERVAL,
+        on_error: Optional[Callable[[Exception], None]] = None,
+    ) -> threading.Thread:
+        """Reload in a background thread whenever version.json changes.
+
+        Args:
+            interval: Seconds between checks
+            on_error: Called with the error of a failed reload (the current
+                engine stays in use, and the reload is retried when
+                version.json changes again)
+        """
+        if self._watcher is not None:
+            return self._watcher
+        version_file = self.generated_dir / "version.json"
+
+        def stamp():
+            try:
+                stat = version_file.stat()
+            except FileNotFoundError:
+                return None
+            return stat.st_mtime_ns, stat.st_size
+
+        def run() -> None:
+            seen = stamp()
+            while not self._stop.wait(interval):
+                current = stamp()
+                if current == seen:
+                    continue
+                seen = current
+                try:
+                    self.reload()
+                except (OSError, ValueError, RuntimeError) as exc:
+                    if on_error is not None:
+                        on_error(exc)
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=run, name="nns-reload", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop(self) -> None:
+        """Stop watch()."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
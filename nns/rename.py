@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Proxy renaming with the semantics of the plugin's onSubscriptionUserinfo hook.
+
+A name for which the formatter returns None (status/ad line under the "hide"
+policy) is dropped; an empty formatted name falls back to the original
+(``newName || proxy.name``).
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+from .cache import ResultCache, config_hash
+from .engine import Engine
+from .formatter import SPEC_VERSIONS, merge_config
+
+
+@dataclass
+class RenameStats:
+    """Counters of a rename run."""
+    total: int = 0
+    renamed: int = 0
+    unchanged: int = 0
+    dropped: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def kept(self) -> int:
+        return self.renamed + self.unchanged
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def rate(self) -> float:
+        """Names per second."""
+        elapsed = self.elapsed
+        return self.total / elapsed if elapsed > 0 else 0.0
+
+    def count(self, name: str, new_name: Optional[str]) -> None:
+        """Record the outcome of one rename."""
+        self.total += 1
+        if new_name is None:
+            self.dropped += 1
+        elif new_name == name:
+            self.unchanged += 1
+        else:
+            self.renamed += 1
+
+    def stop(self) -> None:
+        self.finished = time.perf_counter()
+
+    def summary(self) -> str:
+        return (
+            f"{self.total} names in {self.elapsed:.2f}s ({self.rate:,.0f} names/s): "
+            f"{self.renamed} renamed, {self.unchanged} unchanged, {self.dropped} dropped"
+        )
+
+
+class UniqueNames:
+    """Make output names unique by appending " 2", " 3", ... to repeats.
+
+    A numbered name is never one already returned: after "X 2" was seen,
+    a second "X" becomes "X 3". Memory is bounded by the number of distinct
+    output names.
+
+    Example:
+        >>> unique = UniqueNames()
+        >>> [unique(n) for n in ["X 2", "X", "X", "X 2"]]
+        ['X 2', 'X', 'X 3', 'X 2 2']
+    """
+
+    def __init__(self):
+        self._used: Set[str] = set()
+        # Last number appended to each repeated name
+        self._counts: Dict[str, int] = {}
+
+    def __call__(self, name: str) -> str:
+        if name not in self._used:
+            self._used.add(name)
+            return name
+        count = self._counts.get(name, 1)
+        while True:
+            count += 1
+            candidate = f"{name} {count}"
+            if candidate not in self._used:
+                break
+        self._counts[name] = count
+        self._used.add(candidate)
+        return candidate
+
+
+class Renamer:
+    """Rename proxy names one at a time, keeping run statistics.
+
+    Args:
+        engine: Loaded engine
+        config: User config (config.json); merged over the defaults
+        spec: Output spec version, "v1" or "v2"
+        dedupe: Append " 2", " 3", ... to repeated output names. Clash and
+            sing-box require unique proxy names; off by default to match
+            the plugin (the command line turns it on for those formats)
+        cache: Result cache built for the same merged config and spec
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        config: Optional[Dict[str, Any]] = None,
+        spec: str = "v2",
+        dedupe: bool = False,
+        cache: Optional[ResultCache] = None,
+    ):
+        if spec not in SPEC_VERSIONS:
+            raise ValueError(f"Unknown spec version: {spec!r}")
+        self.engine = engine
+        self.config = merge_config(config)
+        self.spec = spec
+        self.formatter = engine.compile_formatter(self.config, spec)
+        if cache is not None:
+            if cache.config_hash != config_hash(self.config, spec):
+                raise ValueError("Cache was built for a different config or spec version")
+        self.cache = cache
+        self.dedupe = dedupe
+        self.stats = RenameStats()
+        self._unique = UniqueNames() if dedupe else None
+
+    def rename(self, name: str) -> Optional[str]:
+        """Rename one proxy name.
+
+        Returns:
+            The new name, or None if the proxy should be dropped
+        """
+        if self.cache is None:
+            new_name = self.engine.rename(name, self.formatter)
+        else:
+            cached = self.cache.get(name)
+            if cached is None:
+                parsed = self.engine.parse(name)
+                new_name = self.engine.format(parsed, self.formatter)
+                self.cache.put(name, parsed, new_name)
+            else:
+                new_name = cached.formatted
+        if new_name is None:
+            self.stats.count(name, None)
+            return None
+        new_name = new_name or name
+        if self._unique is not None:
+            new_name = self._unique(new_name)
+        self.stats.count(name, new_name)
+        return new_name
@@ -0,0 +1,610 @@
+#!/usr/bin/env python3
+"""
+Long-running local rename service (``python -m nns serve``).
+
+One process keeps the engine and per-config result caches warm and serves
+HTTP/1.1 over TCP or a Unix socket, so tools no longer pay a dictionary
+load per process. Standard library only (asyncio).
+
+Endpoints:
+    GET  /health         Dictionary version, uptime and counters
+    POST /rename         {"name": "..."} or {"names": [...]}, optionally
+                         with "config" (user config keys over the server's),
+                         "spec" and "dedupe"; returns {"name": ...} or
+                         {"names": [...]}, null for a dropped name
+    POST /rename/stream  Names one per line, of any length (Content-Length
+                         or chunked); renamed names are streamed back one per
+                         line as they are produced, an empty line for a
+                         dropped name. Query parameters: spec, dedupe=1
+    POST /reload         Reload the dictionaries if they changed (services
+                         started with an EngineHandle); ?force=1 reloads
+                         anyway. Returns the reload's stats, or
+                         {"reloaded": false}
+
+Concurrent small requests are coalesced: their names are queued and renamed
+in one pass once max_batch names are waiting or, while other requests are
+in flight, max_delay has passed.
+Larger requests and streams are renamed in slices of max_batch, yielding to
+the event loop between slices so they do not hold up small requests.
+Connections are kept alive until the client closes them, sends
+"Connection: close" or stays idle for idle_timeout seconds.
+
+With an EngineHandle (nns/reload.py) the service picks up each engine the
+handle swaps in, through POST /reload or the handle's watch(): new
+requests use the new dictionaries with fresh result caches, while requests
+already queued finish on the renamers they started with.
+"""
+import asyncio
+import json
+import os
+import signal
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import ResultCache
+from .engine import Engine
+from .formatter import SPEC_VERSIONS, merge_config
+from .reload import EngineHandle, ReloadStats
+from .rename import Renamer, UniqueNames
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Names renamed per pass, and how long a pass waits for more small requests
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_DELAY = 0.001
+
+DEFAULT_IDLE_TIMEOUT = 60.0
+# Largest /rename body (streams are not limited)
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+# Distinct request configs kept warm (least recently used ones are dropped)
+MAX_CONFIGS = 32
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    408: "Request Timeout", 409: "Conflict", 411: "Length Required", 413: "Payload Too Large",
+    431: "Request Header Fields Too Large", 500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """Error answered with a status code and a JSON {"error": message} body."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class ServiceStats:
+    """Counters of a running service."""
+    started: float = field(default_factory=time.monotonic)
+    connections: int = 0
+    requests: int = 0
+    names: int = 0
+    batches: int = 0
+    batched_names: int = 0
+    errors: int = 0
+    reloads: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "uptime": round(time.monotonic() - self.started, 3),
+            "connections": self.connections,
+            "requests": self.requests,
+            "names": self.names,
+            "batches": self.batches,
+            "mean_batch": round(self.batched_names / self.batches, 1) if self.batches else 0.0,
+            "errors": self.errors,
+            "reloads": self.reloads,
+        }
+
+
+@dataclass
+class _Pending:
+    renamer: Renamer
+    names: List[str]
+    future: "asyncio.Future[List[Optional[str]]]"
+
+
+@dataclass
+class _Request:
+    method: str
+    path: str
+    query: Dict[str, List[str]]
+    version: str
+    headers: Dict[str, str]
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    @property
+    def chunked(self) -> bool:
+        return "chunked" in self.headers.get("transfer-encoding", "").lower()
+
+
+class RenameService:
+    """Rename names for many clients with one warm engine.
+
+    Args:
+        engine: Loaded engine, or a handle whose reloads the service follows
+        config: Server user config (config.json); requests may override
+            top-level keys
+        spec: Default output spec version
+        max_batch: Names renamed per pass
+        max_delay: Seconds a pass waits for more small requests
+        cache_entries: In-memory result cache entries per config
+        idle_timeout: Seconds before an idle connection is closed
+        max_body: Largest /rename request body in bytes
+    """
+
+    def __init__(
+        self,
+        engine: Union[Engine, EngineHandle],
+        config: Optional[Dict[str, Any]] = None,
+        spec: str = "v2",
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        cache_entries: int = 100_000,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_body: int = DEFAULT_MAX_BODY,
+    ):
+        if spec not in SPEC_VERSIONS:
+            raise ValueError(f"Unknown spec version: {spec!r}")
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.handle = engine if isinstance(engine, EngineHandle) else None
+        self.engine = engine.engine if isinstance(engine, EngineHandle) else engine
+        self.user_config = dict(config or {})
+        self.spec = spec
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.cache_entries = cache_entries
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        self.stats = ServiceStats()
+        self._renamers: "OrderedDict[str, Renamer]" = OrderedDict()
+        self._queue: Optional["asyncio.Queue[_Pending]"] = None
+        self._worker: Optional["asyncio.Task[None]"] = None
+        self._active = 0  # requests being handled
+        self.dict_version = (self.engine.dicts.version or {}).get("version")
+        self.last_reload: Optional[ReloadStats] = None
+
+    def use_engine(self, engine: Engine, stats: Optional[ReloadStats] = None) -> None:
+        """Serve new requests with another engine.
+
+        Renamers and result caches of the previous engine are dropped;
+        queued requests keep theirs until they are answered.
+        """
+        if engine is self.engine:
+            return
+        self.engine = engine
+        self.dict_version = (engine.dicts.version or {}).get("version")
+        self._renamers = OrderedDict()
+        self.stats.reloads += 1
+        if stats is not None:
+            self.last_reload = stats
+
+    # ---------- renaming ----------
+
+    def renamer(self, config: Optional[Dict[str, Any]] = None, spec: Optional[str] = None) -> Renamer:
+        """Renamer (with its result cache) of a request config and spec."""
+        spec = spec or self.spec
+        key = (json.dumps(config, sort_keys=True) if config else "") + "\0" + spec
+        renamer = self._renamers.get(key)
+        if renamer is None:
+            if spec not in SPEC_VERSIONS:
+                raise ValueError(f"Unknown spec version: {spec!r}")
+            merged = merge_config({**self.user_config, **(config or {})})
+            cache = ResultCache(self.engine, merged, spec, memory_entries=self.cache_entries)
+            renamer = self._renamers[key] = Renamer(self.engine, merged, spec=spec, cache=cache)
+            if len(self._renamers) > MAX_CONFIGS:
+                self._renamers.popitem(last=False)
+        else:
+            self._renamers.move_to_end(key)
+        return renamer
+
+    async def rename(
+        self,
+        names: List[str],
+        config: Optional[Dict[str, Any]] = None,
+        spec: Optional[str] = None,
+    ) -> List[Optional[str]]:
+        """Rename names, coalescing small calls with concurrent ones.
+
+        Returns:
+            New names in input order, None for dropped names
+        """
+        renamer = self.renamer(config, spec)
+        self.stats.names += len(names)
+        if len(names) >= self.max_batch:
+            results: List[Optional[str]] = []
+            for start in range(0, len(names), self.max_batch):
+                results.extend(self._run(renamer, names[start:start + self.max_batch]))
+                await asyncio.sleep(0)
+            return results
+
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._batch_worker())
+        future: "asyncio.Future[List[Optional[str]]]" = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Pending(renamer, names, future))
+        return await future
+
+    def _run(self, renamer: Renamer, names: List[str]) -> List[Optional[str]]:
+        self.stats.batches += 1
+        self.stats.batched_names += len(names)
+        return [renamer.rename(name) for name in names]
+
+    async def _batch_worker(self) -> None:
+        queue = self._queue
+        assert queue is not None
+        while True:
+            batch = [await queue.get()]
+            size = len(batch[0].names)
+            # Wait for more only if other requests are on their way
+            if size < self.max_batch and self.max_delay > 0 and self._active > 1 and queue.empty():
+                await asyncio.sleep(self.max_delay)
+            while size < self.max_batch and not queue.empty():
+                pending = queue.get_nowait()
+                batch.append(pending)
+                size += len(pending.names)
+
+            self.stats.batches += 1
+            self.stats.batched_names += size
+            for pending in batch:
+                if pending.future.done():  # client went away
+                    continue
+                try:
+                    pending.future.set_result([pending.renamer.rename(name) for name in pending.names])
+                except Exception as exc:  # reported to the waiting request
+                    pending.future.set_exception(exc)
+
+    # ---------- HTTP ----------
+
+    async def start(
+        self,
+        host: Optional[str] = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        path: Optional[Union[str, Path]] = None,
+    ) -> asyncio.AbstractServer:
+        """Start listening on a Unix socket (path) or on host:port."""
+        if self.handle is not None:
+            # Reloads run in other threads; switch engines on the event loop
+            loop = asyncio.get_running_loop()
+            self.handle.on_reload = lambda engine, stats: loop.call_soon_threadsafe(
+                self.use_engine, engine, stats
+            )
+        if path is not None:
+            path = Path(path)
+            if path.is_socket():
+                path.unlink()  # stale socket of a previous run
+            return await asyncio.start_unix_server(self._handle, path=str(path), limit=MAX_HEADER_BYTES)
+        return await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, {"error": "Request headers too large"}, False)
+                    return
+                self.stats.requests += 1
+                self._active += 1
+                try:
+                    request = _parse_head(head)
+                    keep_alive = await self._dispatch(request, reader, writer)
+                except HTTPError as exc:
+                    self.stats.errors += 1
+                    await self._respond(writer, exc.status, {"error": str(exc)}, False)
+                    return
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except Exception as exc:  # keep serving other clients
+                    self.stats.errors += 1
+                    await self._respond(writer, 500, {"error": f"{type(exc).__name__}: {exc}"}, False)
+                    return
+                finally:
+                    self._active -= 1
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _dispatch(
+        self, request: _Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        """Answer one request; returns whether the connection stays open."""
+        routes = {
+            "/health": ("GET", self._health),
+            "/rename": ("POST", self._rename_json),
+            "/rename/stream": ("POST", self._rename_stream),
+            "/reload": ("POST", self._reload),
+        }
+        route = routes.get(request.path.rstrip("/") or "/")
+        if route is None:
+            raise HTTPError(404, f"Unknown path: {request.path}")
+        method, handler = route
+        if request.method != method:
+            raise HTTPError(405, f"{request.path} expects {method}")
+        return await handler(request, reader, writer)
+
+    async def _health(self, request: _Request, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> bool:
+        body = {
+            "status": "ok",
+            "dict_version": self.dict_version,
+            "spec": self.spec,
+            "configs": len(self._renamers),
+            **self.stats.to_dict(),
+        }
+        if self.last_reload is not None:
+            body["last_reload"] = _reload_dict(self.last_reload)
+        await self._respond(writer, 200, body, request.keep_alive)
+        return request.keep_alive
+
+    async def _rename_json(self, request: _Request, reader: asyncio.StreamReader,
+                           writer: asyncio.StreamWriter) -> bool:
+        body = await _read_body(request, reader, self.max_body)
+        try:
+            payload = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise HTTPError(400, f"Invalid JSON body: {exc}") from exc
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        single = "name" in payload
+        names = [payload["name"]] if single else payload.get("names")
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            raise HTTPError(400, 'Expected "name" (string) or "names" (list of strings)')
+        config = payload.get("config")
+        if config is not None and not isinstance(config, dict):
+            raise HTTPError(400, '"config" must be an object')
+        try:
+            results = await self.rename(names, config, payload.get("spec"))
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from exc
+
+        if payload.get("dedupe"):
+            unique = UniqueNames()
+            results = [None if r is None else unique(r) for r in results]
+        await self._respond(
+            writer, 200, {"name": results[0]} if single else {"names": results}, request.keep_alive
+        )
+        return request.keep_alive
+
+    async def _rename_stream(self, request: _Request, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> bool:
+        spec = (request.query.get("spec") or [None])[0]
+        try:
+            renamer = self.renamer(None, spec)
+        except ValueError as exc:
+            raise HTTPError(400, str(exc)) from exc
+        unique = UniqueNames() if (request.query.get("dedupe") or ["0"])[0] in ("1", "true") else None
+
+        # HTTP/1.0 clients get the body until the connection closes
+        chunked = request.version != "HTTP/1.0"
+        keep_alive = request.keep_alive and chunked
+        headers = [("Content-Type", "text/plain; charset=utf-8")]
+        headers.append(("Transfer-Encoding", "chunked") if chunked else ("Connection", "close"))
+        if keep_alive:
+            headers.append(("Connection", "keep-alive"))
+        writer.write(_status_line(200, headers))
+
+        try:
+            async for lines in _body_lines(request, reader, self.max_batch):
+                self.stats.names += len(lines)
+                out = []
+                for new_name in self._run(renamer, lines):
+                    if new_name is not None and unique is not None:
+                        new_name = unique(new_name)
+                    out.append(new_name or "")
+                data = ("\n".join(out) + "\n").encode("utf-8")
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data) if chunked else data)
+                await writer.drain()
+        except HTTPError:
+            # The response has started: end it by closing the connection
+            self.stats.errors += 1
+            return False
+        if chunked:
+            writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return keep_alive
+
+    async def _reload(self, request: _Request, reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter) -> bool:
+        if self.handle is None:
+            raise HTTPError(404, "Reloading is not enabled (no EngineHandle)")
+        if request.chunked or "content-length" in request.headers:
+            await _read_body(request, reader, self.max_body)  # ignored
+        force = (request.query.get("force") or ["0"])[0] in ("1", "true")
+        try:
+            stats = await asyncio.get_running_loop().run_in_executor(None, self.handle.reload, force)
+        except RuntimeError as exc:
+            raise HTTPError(409, str(exc)) from exc
+        if stats is None:
+            body: Dict[str, Any] = {"reloaded": False, "dict_version": self.dict_version}
+        else:
+            self.use_engine(self.handle.engine, stats)
+            body = {"reloaded": True, **_reload_dict(stats)}
+        await self._respond(writer, 200, body, request.keep_alive)
+        return request.keep_alive
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: Dict[str, Any],
+                       keep_alive: bool) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        headers = [
+            ("Content-Type", "application/json; charset=utf-8"),
+            ("Content-Length", str(len(data))),
+            ("Connection", "keep-alive" if keep_alive else "close"),
+        ]
+        writer.write(_status_line(status, headers) + data)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            self._queue = None
+
+
+def _reload_dict(stats: ReloadStats) -> Dict[str, Any]:
+    return {
+        "dict_version": stats.version,
+        "previous_version": stats.previous_version,
+        "load_ms": round(stats.load_ms, 1),
+        "swap_us": round(stats.swap_us, 2),
+        "released_ms": None if stats.released_ms is None else round(stats.released_ms, 1),
+    }
+
+
+def _status_line(status: int, headers: List[Tuple[str, str]]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}"]
+    lines += [f"{key}: {value}" for key, value in headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _parse_head(head: bytes) -> _Request:
+    try:
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, version = lines[0].split(" ")
+    except ValueError as exc:
+        raise HTTPError(400, "Malformed request line") from exc
+    if version not in ("HTTP/1.0", "HTTP/1.1"):
+        raise HTTPError(400, f"Unsupported protocol: {version}")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            raise HTTPError(400, "Malformed header line")
+        headers[key.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    return _Request(method.upper(), url.path, parse_qs(url.query), version, headers)
+
+
+async def _body_chunks(request: _Request, reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+    """Request body as it arrives (Content-Length or chunked transfer coding)."""
+    if request.chunked:
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            try:
+                size = int(size_line.split(b";", 1)[0].strip(), 16)
+            except ValueError as exc:
+                raise HTTPError(400, "Malformed chunk size") from exc
+            if size == 0:
+                # Trailer section, ended by an empty line
+                while await reader.readuntil(b"\r\n") != b"\r\n":
+                    pass
+                return
+            yield await reader.readexactly(size)
+            await reader.readexactly(2)
+        return
+    length = request.headers.get("content-length")
+    if length is None:
+        if request.method == "POST":
+            raise HTTPError(411, "Content-Length or chunked transfer coding required")
+        return
+    try:
+        remaining = int(length)
+    except ValueError as exc:
+        raise HTTPError(400, "Invalid Content-Length") from exc
+    while remaining > 0:
+        data = await reader.read(min(remaining, 1 << 16))
+        if not data:
+            raise asyncio.IncompleteReadError(b"", remaining)
+        remaining -= len(data)
+        yield data
+
+
+async def _read_body(request: _Request, reader: asyncio.StreamReader, limit: int) -> bytes:
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise HTTPError(413, f"Body larger than {limit} bytes")
+    body = bytearray()
+    async for chunk in _body_chunks(request, reader):
+        body += chunk
+        if len(body) > limit:
+            raise HTTPError(413, f"Body larger than {limit} bytes")
+    return bytes(body)
+
+
+async def _body_lines(request: _Request, reader: asyncio.StreamReader,
+                      batch: int) -> AsyncIterator[List[str]]:
+    """Lines of a streamed body in lists of at most batch lines."""
+    buffer = b""
+    lines: List[str] = []
+    async for chunk in _body_chunks(request, reader):
+        parts = (buffer + chunk).split(b"\n")
+        buffer = parts.pop()
+        for part in parts:
+            lines.append(part.rstrip(b"\r").decode("utf-8", "replace"))
+            if len(lines) >= batch:
+                yield lines
+                lines = []
+    if buffer:
+        lines.append(buffer.rstrip(b"\r").decode("utf-8", "replace"))
+    if lines:
+        yield lines
+
+
+async def serve(
+    service: RenameService,
+    host: Optional[str] = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    path: Optional[Union[str, Path]] = None,
+    ready: Optional[Any] = None,
+) -> None:
+    """Run a service until SIGINT/SIGTERM or cancellation.
+
+    Args:
+        service: Service to run
+        host, port: TCP address (ignored when path is given)
+        path: Unix socket path
+        ready: Called with the listening addresses once the server is up
+    """
+    server = await service.start(host, port, path)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # Windows, or not the main thread
+            pass
+    if ready is not None:
+        ready([str(path)] if path is not None else
+              [f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets])
+    try:
+        async with server:
+            await stop.wait()
+    finally:
+        await service.close()
+        if path is not None and Path(path).is_socket():
+            os.unlink(path)
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Streaming readers/writers for subscription files.
+
+Each format is a generator that consumes the input incrementally and yields
+output text as soon as it is known, so memory stays bounded by the largest
+single proxy entry rather than by the file size:
+
+- ``names``: one proxy name per line
+- ``clash``: Clash YAML; entries of the top-level ``proxies:`` list get their
+  ``name`` rewritten and ``proxy-groups:`` their ``proxies`` references,
+  everything else is copied verbatim
+- ``singbox``: sing-box JSON; entries of ``outbounds`` (or a bare array of
+  outbounds) get their ``tag`` rewritten and selector/urltest outbounds their
+  ``outbounds`` and ``default`` references, built-in outbounds are kept
+
+References to renamed proxies follow the new names and references to dropped
+proxies are removed, so the client still accepts the config. A group that
+comes before the last proxy is held back, with everything after it, until
+all proxies have been renamed (sing-box configs usually list selectors
+first); groups after the proxies stream as before.
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+RenameFunc = Callable[[str], Optional[str]]
+# Old proxy name -> new name, None if dropped
+NameMap = Dict[str, Optional[str]]
+
+FORMATS = ("names", "clash", "singbox")
+# Formats whose clients reject repeated proxy names/tags (the command line
+# dedupes them by default)
+UNIQUE_NAME_FORMATS = ("clash", "singbox")
+
+# Read size for the JSON stream
+CHUNK_SIZE = 1 << 16
+
+# sing-box outbound types that are not proxies
+SINGBOX_NON_PROXY_TYPES = {"direct", "block", "dns", "selector", "urltest"}
+# sing-box outbound types that reference other outbounds
+SINGBOX_GROUP_TYPES = {"selector", "urltest"}
+
+_SECTION_KEY = re.compile(r"^(proxies|proxy-groups):\s*(#.*)?$")
+_LIST_ITEM = re.compile(r"^(\s*)-(\s+|$)")
+_NAME_KEY = re.compile(r"^(\s*(?:-\s+)?)name:\s*(.*)$")
+_JSON_WS = re.compile(r"[ \t\n\r]*")
+
+
+def detect_format(filename: Optional[str]) -> str:
+    """Guess the input format from a file name (stdin defaults to ``names``)."""
+    lower = (filename or "").lower()
+    if lower.endswith((".yaml", ".yml")):
+        return "clash"
+    if lower.endswith(".json"):
+        return "singbox"
+    return "names"
+
+
+def rename_names(lines: Iterable[str], rename: RenameFunc) -> Iterator[str]:
+    """Rename a plain name list; blank lines are copied, dropped names removed."""
+    for line in lines:
+        name = line.rstrip("\r\n")
+        if not name.strip():
+            yield line
+            continue
+        new_name = rename(name)
+        if new_name is not None:
+            yield new_name + "\n"
+
+
+def _yaml():
+    try:
+        import yaml  # type: ignore
+    except ImportError as exc:
+        raise RuntimeError(
+            "PyYAML is required to read Clash YAML. Install it with: pip install pyyaml"
+        ) from exc
+    return yaml
+
+
+def _rename_clash_item(item: List[str], rename: RenameFunc, yaml: Any) -> List[str]:
+    """Rename one ``proxies`` list item; returns its output lines (empty if dropped)."""
+    try:
+        data = yaml.safe_load("".join(item))
+    except yaml.YAMLError:
+        return item
+    if not (isinstance(data, list) and len(data) == 1 and isinstance(data[0], dict)):
+        return item
+    proxy = data[0]
+    name = proxy.get("name")
+    if not isinstance(name, str):
+        return item
+
+    new_name = rename(name)
+    if new_name is None:
+        return []
+    if new_name == name:
+        return item
+
+    quoted = json.dumps(new_name, ensure_ascii=False)
+    first = item[0]
+    indent = _LIST_ITEM.match(first).group(1)
+    if first.lstrip()[1:].lstrip().startswith("{"):
+        # Flow mapping: re-emit it as JSON, which is valid YAML
+        proxy["name"] = new_name
+        return [indent + "- " + json.dumps(proxy, ensure_ascii=False, default=str) + "\n"]
+
+    # Block mapping: replace the value of the first ``name:`` key of the item
+    rest = first.lstrip()[1:].lstrip()
+    if rest:
+        key_column = len(first) - len(rest)
+    else:
+        # "-" alone on its line: keys start on the next line
+        key_column = len(item[1]) - len(item[1].lstrip()) if len(item) > 1 else 0
+    out = list(item)
+    for i, line in enumerate(out):
+        m = _NAME_KEY.match(line)
+        if m and len(m.group(1)) == key_column:
+            out[i] = f"{m.group(1)}name: {quoted}\n"
+            # A continuation of a multi-line scalar would follow at deeper indent
+            j = i + 1
+            while j < len(out) and out[j].strip() and len(out[j]) - len(out[j].lstrip()) > key_column:
+                j += 1
+            del out[i + 1:j]
+            return out
+    return item
+
+
+def _recording(rename: RenameFunc, names: NameMap) -> RenameFunc:
+    """Wrap a rename function so that every result is recorded in names."""
+    def recorded(name: str) -> Optional[str]:
+        new_name = rename(name)
+        names[name] = new_name
+        return new_name
+    return recorded
+
+
+def _rewrite_refs(refs: List[Any], names: NameMap) -> List[Any]:
+    """Group references with renamed proxies renamed and dropped ones removed."""
+    out = []
+    for ref in refs:
+        if isinstance(ref, str) and ref in names:
+            ref = names[ref]
+            if ref is None:
+                continue
+        out.append(ref)
+    return out
+
+
+def _rewrite_clash_group(item: List[str], names: NameMap, yaml: Any) -> List[str]:
+    """Rewrite the ``proxies`` references of one ``proxy-groups`` list item."""
+    try:
+        data = yaml.safe_load("".join(item))
+        # References as written: YAML 1.1 would read a proxy named NO as False
+        raw = yaml.load("".join(item), Loader=yaml.BaseLoader)
+    except yaml.YAMLError:
+        return item
+    if not (isinstance(data, list) and len(data) == 1 and isinstance(data[0], dict)):
+        return item
+    group = data[0]
+    refs = raw[0].get("proxies")
+    if not isinstance(refs, list):
+        return item
+    new_refs = _rewrite_refs(refs, names)
+    if new_refs == refs:
+        return item
+    # Re-emit as a JSON flow mapping, which is valid YAML
+    group["proxies"] = new_refs
+    indent = _LIST_ITEM.match(item[0]).group(1)
+    return [indent + "- " + json.dumps(group, ensure_ascii=False, default=str) + "\n"]
+
+
+# Emitted by _clash_pieces once the proxies section is complete
+_PROXIES_DONE = object()
+
+
+def _clash_pieces(lines: Iterable[str], rename: RenameFunc, yaml: Any) -> Iterator[Any]:
+    """Output lines of a Clash document, with proxies renamed.
+
+    ``proxy-groups`` items are yielded unresolved as lists of lines, and
+    _PROXIES_DONE when the ``proxies`` section has ended. Only one list item
+    is buffered at a time.
+    """
+    section: Optional[str] = None
+    item_indent: Optional[int] = None
+    item: List[str] = []
+    # Blank/comment lines after an item: they belong to it only if it continues
+    pending: List[str] = []
+
+    def finish(item: List[str]) -> Iterable[Any]:
+        if section == "proxies":
+            return _rename_clash_item(item, rename, yaml)
+        return [item]
+
+    for line in lines:
+        stripped = line.strip()
+        if section is not None:
+            if not stripped or stripped.startswith("#"):
+                if item:
+                    pending.append(line)
+                else:
+                    yield line
+                continue
+            m = _LIST_ITEM.match(line)
+            if m and (item_indent is None or len(m.group(1)) == item_indent):
+                if item:
+                    yield from finish(item)
+                yield from pending
+                pending = []
+                item_indent = len(m.group(1))
+                item = [line]
+                continue
+            if line[:1].isspace():
+                if item:
+                    item.extend(pending)
+                    item.append(line)
+                    pending = []
+                else:
+                    yield line
+                continue
+            # Dedent to a top-level key ends the section
+            if item:
+                yield from finish(item)
+            yield from pending
+            if section == "proxies":
+                yield _PROXIES_DONE
+            item = []
+            pending = []
+            item_indent = None
+            section = None
+
+        m = _SECTION_KEY.match(line)
+        if m:
+            section = m.group(1)
+        yield line
+
+    if item:
+        yield from finish(item)
+    yield from pending
+
+
+def rename_clash(lines: Iterable[str], rename: RenameFunc) -> Iterator[str]:
+    """Rename the ``proxies`` of a Clash YAML document line by line.
+
+    Only one proxy entry is buffered at a time. ``proxy-groups`` references
+    follow the renamed proxies; groups before the end of the ``proxies``
+    section are held until then.
+    """
+    yaml = _yaml()
+    names: NameMap = {}
+    held: Optional[List[Union[str, List[str]]]] = None
+    proxies_done = False
+
+    def release(pieces: List[Union[str, List[str]]]) -> Iterator[str]:
+        for piece in pieces:
+            if isinstance(piece, list):
+                yield from _rewrite_clash_group(piece, names, yaml)
+            else:
+                yield piece
+
+    for piece in _clash_pieces(lines, _recording(rename, names), yaml):
+        if piece is _PROXIES_DONE:
+            proxies_done = True
+            if held is not None:
+                yield from release(held)
+                held = None
+        elif isinstance(piece, list) and not proxies_done:
+            held = (held or []) + [piece]
+        elif held is not None:
+            held.append(piece)
+        elif isinstance(piece, list):
+            yield from _rewrite_clash_group(piece, names, yaml)
+        else:
+            yield piece
+    if held is not None:
+        yield from release(held)
+
+
+class _JsonStream:
+    """Chunked reader exposing a growable buffer for incremental JSON decoding."""
+
+    def __init__(self, source: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read the next chunk; discards the consumed part of the buffer."""
+        if self.eof:
+            return False
+        chunk = self.source.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_ws(self) -> str:
+        """Skip whitespace, returning it; the next character is then available (or EOF)."""
+        skipped = ""
+        while True:
+            end = _JSON_WS.match(self.buf, self.pos).end()
+            skipped += self.buf[self.pos:end]
+            self.pos = end
+            if self.pos < len(self.buf) or not self.fill():
+                return skipped
+
+    def peek(self) -> str:
+        return self.buf[self.pos] if self.pos < len(self.buf) else ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"Expected {ch!r} at offset {self.pos} of the JSON stream")
+        self.pos += 1
+
+    def decode(self, decoder: json.JSONDecoder) -> Tuple[Any, str]:
+        """Decode one JSON value, reading more chunks until it is complete.
+
+        Returns:
+            The value and its source text
+        """
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number may continue in the next chunk
+            if end == len(self.buf) and not self.eof and isinstance(value, (int, float)):
+                if self.fill():
+                    continue
+            text = self.buf[self.pos:end]
+            self.pos = end
+            return value, text
+
+
+def _rewrite_singbox_group(outbound: Dict[str, Any], text: str, names: NameMap) -> str:
+    """Source text of a selector/urltest outbound with its references rewritten."""
+    refs = outbound.get("outbounds")
+    changed = False
+    if isinstance(refs, list):
+        new_refs = _rewrite_refs(refs, names)
+        if new_refs != refs:
+            outbound["outbounds"] = new_refs
+            changed = True
+    default = outbound.get("default")
+    if isinstance(default, str) and default in names:
+        if names[default] is None:
+            del outbound["default"]
+        else:
+            outbound["default"] = names[default]
+        changed = True
+    return json.dumps(outbound, ensure_ascii=False) if changed else text
+
+
+def _iter_outbounds(stream: _JsonStream, decoder: json.JSONDecoder,
+                    rename: RenameFunc, indent: str) -> Iterator[str]:
+    """Rename the elements of a JSON array whose ``[`` has been consumed.
+
+    Group outbounds are resolved at the end of the array, once every proxy
+    was renamed; output from the first group on is held until then.
+    """
+    names: NameMap = {}
+    # Output pieces from the first group on: text, or (prefix, group, text)
+    held: Optional[List[Union[str, Tuple[str, Dict[str, Any], str]]]] = None
+    first = True
+    while True:
+        stream.skip_ws()
+        if stream.peek() == "]":
+            stream.pos += 1
+            for piece in held or []:
+                if isinstance(piece, tuple):
+                    prefix, group, text = piece
+                    yield prefix + _rewrite_singbox_group(group, text, names)
+                else:
+                    yield piece
+            yield ("\n" + indent[:-2] if not first else "") + "]"
+            return
+        if not first:
+            stream.expect(",")
+            stream.skip_ws()
+        outbound, text = stream.decode(decoder)
+        is_dict = isinstance(outbound, dict)
+        if (
+            is_dict
+            and isinstance(outbound.get("tag"), str)
+            and outbound.get("type") not in SINGBOX_NON_PROXY_TYPES
+        ):
+            new_tag = rename(outbound["tag"])
+            names[outbound["tag"]] = new_tag
+            if new_tag is None:
+                continue
+            if new_tag != outbound["tag"]:
+                outbound["tag"] = new_tag
+                text = json.dumps(outbound, ensure_ascii=False)
+        prefix = ("\n" if first else ",\n") + indent
+        first = False
+        if is_dict and outbound.get("type") in SINGBOX_GROUP_TYPES:
+            held = (held or []) + [(prefix, outbound, text)]
+        elif held is not None:
+            held.append(prefix + text)
+        else:
+            yield prefix + text
+
+
+def rename_singbox(source: TextIO, rename: RenameFunc,
+                   chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Rename the outbounds of a sing-box config (or a bare outbound array).
+
+    The document is read in chunks; outbounds are decoded one at a time and
+    all other values are copied verbatim.
+    """
+    decoder = json.JSONDecoder()
+    stream = _JsonStream(source, chunk_size)
+    yield stream.skip_ws()
+
+    if stream.peek() == "[":
+        stream.pos += 1
+        yield "["
+        yield from _iter_outbounds(stream, decoder, rename, "  ")
+    else:
+        stream.expect("{")
+        yield "{"
+        first = True
+        while True:
+            yield stream.skip_ws()
+            if stream.peek() == "}":
+                stream.pos += 1
+                yield "}"
+                break
+            if not first:
+                stream.expect(",")
+                yield "," + stream.skip_ws()
+            key, key_text = stream.decode(decoder)
+            ws = stream.skip_ws()
+            stream.expect(":")
+            yield key_text + ws + ":" + stream.skip_ws()
+            if key == "outbounds" and stream.peek() == "[":
+                stream.pos += 1
+                yield "["
+                yield from _iter_outbounds(stream, decoder, rename, "    ")
+            else:
+                _, value_text = stream.decode(decoder)
+                yield value_text
+            first = False
+
+    # Trailing whitespace
+    while True:
+        yield stream.buf[stream.pos:]
+        stream.pos = len(stream.buf)
+        if not stream.fill():
+            break
+
+
+def rename_stream(fmt: str, source: TextIO, rename: RenameFunc) -> Iterator[str]:
+    """Dispatch to the reader/writer of a format."""
+    if fmt == "names":
+        return rename_names(source, rename)
+    if fmt == "clash":
+        return rename_clash(source, rename)
+    if fmt == "singbox":
+        return rename_singbox(source, rename)
+    raise ValueError(f"Unknown format: {fmt!r}")
+
+
+def write_stream(chunks: Iterable[str], out: TextIO) -> None:
+    """Write output chunks as they are produced."""
+    for chunk in chunks:
+        if chunk:
+            out.write(chunk)
+    out.flush()
+
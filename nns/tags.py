@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tag aliases contained in node name tokens (matchTagsV2 in plugin.js).
+
+Chinese names often run a tag into the surrounding words ("香港家宽解锁"), so
+a token with Chinese characters yields every tag alias it contains, not
+just an exact match. Instead of testing the token against each alias of
+tag_alias_map.json, the aliases are compiled into an Aho-Corasick automaton
+(tag_index.json, written by build_tags.py): a token is scanned once, in
+time linear in its length plus the number of hits, however many tags
+there are.
+"""
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from .automaton import AhoCorasick
+from .dictionaries import DEFAULT_DICT_DIR
+from .matcher import normalize
+
+
+# Compiled tag index artifact (dict/generated/tag_index.json)
+TAG_INDEX_FILE = "tag_index.json"
+TAG_INDEX_FORMAT = 1
+TAG_INDEX_SOURCES = ["tag_alias_map.json"]
+
+_CJK = re.compile(r"[\u4e00-\u9fa5]")
+# Multipliers and bare numbers are never tags
+_NUMERIC = re.compile(r"^[x×]\d+(\.\d+)?$|^\d+$")
+
+
+class TagIndex:
+    """Exact and contained tag alias lookup for tokens.
+
+    Only aliases that survive normalization unchanged can occur in a
+    normalized token, so the automaton holds just those; exact lookups use
+    the full alias map.
+    """
+
+    def __init__(self, alias_map: Dict[str, str], automaton: Optional[AhoCorasick] = None):
+        self.alias_map = alias_map
+        if automaton is None:
+            automaton = AhoCorasick([a for a in alias_map if a and normalize(a) == a])
+        self.automaton = automaton
+        self.codes = [alias_map[a] for a in automaton.patterns]
+
+    @classmethod
+    def from_artifact(cls, alias_map: Dict[str, str], data: Dict[str, Any]) -> "TagIndex":
+        """Restore an index from tag_index.json without rebuilding the automaton."""
+        return cls(alias_map, AhoCorasick.from_tables(data["aliases"], data["automaton"]))
+
+    def to_artifact(self) -> Dict[str, Any]:
+        return {
+            "format": TAG_INDEX_FORMAT,
+            "aliases": self.automaton.patterns,
+            "automaton": self.automaton.to_tables(),
+        }
+
+    def contained(self, norm: str) -> Set[int]:
+        """Pattern IDs of the aliases occurring in a normalized text."""
+        return {pattern_id for pattern_id, _, _ in self.automaton.find_all(norm)}
+
+    def find(self, tokens: Iterable[str], excluded: Iterable[str] = ()) -> List[str]:
+        """Tag codes of a name's tokens (matchTagsV2 in plugin.js).
+
+        Args:
+            tokens: Raw tokens of a node name
+            excluded: Normalized tokens already used by other fields; they
+                are skipped, and aliases occurring in any of them are
+                ignored
+
+        Returns:
+            Sorted tag codes
+        """
+        excluded = set(excluded)
+        blocked: Optional[Set[int]] = None
+        tags: Set[str] = set()
+        for token in tokens:
+            norm = normalize(token)
+            if norm in excluded or _NUMERIC.match(norm):
+                continue
+            if _CJK.search(token):
+                if blocked is None:
+                    blocked = set().union(*(self.contained(ex) for ex in excluded))
+                tags.update(self.codes[i] for i in self.contained(norm) - blocked)
+            elif norm in self.alias_map:
+                tags.add(self.alias_map[norm])
+        return sorted(tags)
+
+
+def source_hashes(generated_dir: Path) -> Dict[str, str]:
+    """SHA-256 of each dictionary file the tag index is compiled from."""
+    return {
+        name: hashlib.sha256((generated_dir / name).read_bytes()).hexdigest()
+        for name in TAG_INDEX_SOURCES
+    }
+
+
+def load_tag_index(
+    alias_map: Dict[str, str],
+    generated_dir: Optional[Union[str, Path]] = None,
+    verify: bool = True,
+) -> Optional[TagIndex]:
+    """Load the compiled tag index if it is present and current.
+
+    Args:
+        alias_map: Loaded tag_alias_map.json
+        generated_dir: Directory containing tag_index.json (defaults to
+            dict/generated)
+        verify: Check the recorded source hashes against the dictionary files
+
+    Returns:
+        The index, or None if the artifact is missing, has an unsupported
+        format or was compiled from a different tag_alias_map.json
+    """
+    base = Path(generated_dir) if generated_dir is not None else DEFAULT_DICT_DIR
+    path = base / TAG_INDEX_FILE
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("format") != TAG_INDEX_FORMAT:
+        return None
+    if verify:
+        try:
+            if data.get("sources") != source_hashes(base):
+                return None
+        except FileNotFoundError:
+            return None
+    return TagIndex.from_artifact(alias_map, data)
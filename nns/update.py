@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Incremental dictionary updates from a release store (see scripts/release.py).
+
+A release store holds releases.json (the published versions) and, per
+version, manifest.json with the SHA-256, size and gzip size of every file,
+the gzip-compressed files and delta patches from earlier releases. The
+manifest lists each patch under the SHA-256 of the file it applies to.
+
+An update hashes the local files and fetches only the files that differ:
+a patch when one exists for the local content, the compressed file
+otherwise. Every result is checked against the manifest before anything is
+written, and version.json is replaced last, so an interrupted update leaves
+a consistent directory that the next run completes.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.request import urlopen
+
+from .delta import apply_patch
+from .dictionaries import DEFAULT_DICT_DIR, DICT_FILES
+from .matcher import MATCHER_FILE
+from .packed import PACKED_FILE
+from .tags import TAG_INDEX_FILE
+
+
+RELEASE_FORMAT = 1
+RELEASES_FILE = "releases.json"
+MANIFEST_FILE = "manifest.json"
+
+# Files published in a release; version.json is written last on update
+RELEASE_FILES = [name for name in DICT_FILES.values() if name != "version.json"] + [
+    MATCHER_FILE,
+    TAG_INDEX_FILE,
+    PACKED_FILE,
+    "version.json",
+]
+
+# Parallel downloads per update
+DOWNLOAD_WORKERS = 4
+
+
+def version_key(version: str) -> Tuple[int, ...]:
+    """Sort key of a dotted version ("1.10.0" > "1.9.0")."""
+    return tuple(int(part) for part in re.findall(r"\d+", str(version)))
+
+
+def sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_store(base: str, path: str, timeout: float = 30) -> bytes:
+    """Read a file of a release store given as a URL or a directory."""
+    if re.match(r"^(https?|file)://", base):
+        with urlopen(f"{base.rstrip('/')}/{path}", timeout=timeout) as resp:
+            return resp.read()
+    return (Path(base) / path).read_bytes()
+
+
+def _read_local(path: Path) -> Optional[bytes]:
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_name, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@dataclass
+class UpdateStats:
+    """Outcome of an update."""
+    version: str = ""
+    unchanged: List[str] = field(default_factory=list)
+    patched: List[str] = field(default_factory=list)
+    downloaded: List[str] = field(default_factory=list)
+    bytes_fetched: int = 0
+    # Compressed size of the whole release, i.e. the cost of a full download
+    release_bytes: int = 0
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    def summary(self) -> str:
+        share = self.bytes_fetched / self.release_bytes if self.release_bytes else 0.0
+        return (
+            f"v{self.version}: {len(self.patched)} patched, {len(self.downloaded)} downloaded, "
+            f"{len(self.unchanged)} unchanged; fetched {self.bytes_fetched:,} bytes "
+            f"({share:.1%} of a full download) in {self.elapsed:.2f}s"
+        )
+
+
+def load_manifest(base: str, version: Optional[str] = None) -> Dict[str, Any]:
+    """Manifest of a release (the latest one by default)."""
+    if version is None:
+        releases = json.loads(read_store(base, RELEASES_FILE))
+        version = releases["latest"]
+    manifest = json.loads(read_store(base, f"{version}/{MANIFEST_FILE}"))
+    if manifest.get("format") != RELEASE_FORMAT:
+        raise ValueError(f"Unsupported release format: {manifest.get('format')!r}")
+    return manifest
+
+
+def _fetch_file(base: str, version: str, name: str, entry: Dict[str, Any],
+                local: Optional[bytes]) -> Tuple[str, bytes, int]:
+    """Rebuild one file of a release; returns (how, content, bytes fetched)."""
+    fetched = 0
+    patch_entry = entry.get("patches", {}).get(sha256(local)) if local is not None else None
+    if patch_entry is not None:
+        patch = read_store(base, f"{version}/{patch_entry['path']}")
+        fetched += len(patch)
+        try:
+            return "patched", apply_patch(local, patch), fetched
+        except ValueError:
+            pass  # fall back to the full file
+    compressed = read_store(base, f"{version}/{entry['path']}")
+    data = gzip.decompress(compressed)
+    if sha256(data) != entry["sha256"]:
+        raise ValueError(f"{name}: downloaded file does not match the release SHA-256")
+    return "downloaded", data, fetched + len(compressed)
+
+
+def update_dictionaries(
+    base: str,
+    dict_dir: Optional[Union[str, Path]] = None,
+    version: Optional[str] = None,
+    dry_run: bool = False,
+) -> UpdateStats:
+    """Bring a dictionary directory to a release.
+
+    Args:
+        base: Release store (URL or directory)
+        dict_dir: Dictionary directory to update (defaults to dict/generated)
+        version: Release to install (defaults to the latest)
+        dry_run: Fetch and verify, but do not write anything
+
+    Returns:
+        What was fetched and how
+
+    Raises:
+        ValueError: If a file cannot be rebuilt to its release SHA-256
+        OSError: If the store cannot be read
+    """
+    target = Path(dict_dir) if dict_dir is not None else DEFAULT_DICT_DIR
+    manifest = load_manifest(base, version)
+    stats = UpdateStats(version=manifest["version"])
+    files: Dict[str, Dict[str, Any]] = manifest["files"]
+    stats.release_bytes = sum(entry["compressed_size"] for entry in files.values())
+
+    local = {name: _read_local(target / name) for name in files}
+    stale = [
+        name for name in files
+        if local[name] is None or sha256(local[name]) != files[name]["sha256"]
+    ]
+    stats.unchanged = [name for name in files if name not in stale]
+
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+        futures = {
+            name: pool.submit(_fetch_file, base, stats.version, name, files[name], local[name])
+            for name in stale
+        }
+        results = {name: future.result() for name, future in futures.items()}
+
+    for name in stale:
+        how, _, fetched = results[name]
+        getattr(stats, how).append(name)
+        stats.bytes_fetched += fetched
+
+    if not dry_run and stale:
+        target.mkdir(parents=True, exist_ok=True)
+        # version.json last: until it is replaced, the directory still
+        # reads as the old version and a rerun picks up where this stopped
+        for name in sorted(stale, key=lambda n: n == "version.json"):
+            _write_atomic(target / name, results[name][1])
+    stats.finished = time.perf_counter()
+    return stats
+
+
+def verify_dictionaries(
+    dict_dir: Optional[Union[str, Path]] = None,
+    manifest: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """Check dictionary files against recorded SHA-256 hashes.
+
+    Args:
+        dict_dir: Dictionary directory (defaults to dict/generated)
+        manifest: Release manifest to check against; by default the
+            hashes recorded in the directory's version.json are used
+
+    Returns:
+        One message per missing or modified file (empty if all match)
+    """
+    base = Path(dict_dir) if dict_dir is not None else DEFAULT_DICT_DIR
+    if manifest is not None:
+        expected = {name: entry["sha256"] for name, entry in manifest["files"].items()}
+    else:
+        recorded = json.loads((base / "version.json").read_text(encoding="utf-8")).get("files", {})
+        expected = {
+            name: recorded[name]["sha256"]
+            for name in RELEASE_FILES
+            if isinstance(recorded.get(name), dict) and "sha256" in recorded[name]
+        }
+    problems = []
+    for name, digest in expected.items():
+        data = _read_local(base / name)
+        if data is None:
+            problems.append(f"{name}: missing")
+        elif sha256(data) != digest:
+            problems.append(f"{name}: SHA-256 mismatch")
+    return problems
@@ -88,9 +88,11 @@ const DICT_FILE_LIST = [
     "tag_alias_map.json",
     "cities.json",
     "city_alias_map.json",
+    "city_conflicts.json",
     "keywords_status.json",
     "keywords_ad.json",
-    "keywords_connectors.json"
+    "keywords_connectors.json",
+    "matcher.json"
 ]
 
 //枚举项
@@ -103,9 +105,11 @@ const DICT_ENUM = {
     TAG_ALIAS_MAP: "tag_alias_map.json",
     CITIES: "cities.json",
     CITY_ALIAS_MAP: "city_alias_map.json",
+    CITY_CONFLICTS: "city_conflicts.json",
     KEYWORDS_STATUS: "keywords_status.json",
     KEYWORDS_AD: "keywords_ad.json",
-    KEYWORDS_CONNECTORS: "keywords_connectors.json"
+    KEYWORDS_CONNECTORS: "keywords_connectors.json",
+    MATCHER: "matcher.json"
 }
 
 // NNS 字典 CDN 源列表（按优先级排序，已测试可用）
@@ -121,6 +125,7 @@ const DICT_CDN_SOURCES = [
 // ========== 字典加载 ==========
 
 let DICTS = {} // 缓存所有字典数据
+let INDEX_EXTENDED = false // 用户扩展是否修改了索引来源（国家/城市/线路/标签）
 
 const ensureDir = async (path) => {
     if (!(await Plugins.FileExists(path))) {
@@ -179,10 +184,10 @@ const downloadWithRetry = async (fileName, targetPath) => {
     throw new Error(`所有 CDN 源都无法下载 ${fileName}: ${lastError}`)
 }
 
-const ensureDictFile = async (fileName) => {
+const ensureDictFile = async (fileName, force = false) => {
     await ensureDir(DICT_DIR)
     const filePath = `${DICT_DIR}/${fileName}`
-    if (await Plugins.FileExists(filePath)) return filePath
+    if (!force && await Plugins.FileExists(filePath)) return filePath
 
     // 下载到临时文件，再移动/覆盖（更安全）
     await ensureDir(CACHE_DIR)
@@ -197,12 +202,12 @@ const ensureDictFile = async (fileName) => {
 }
 
 // 限制并发下载（避免并发过高）
-const downloadDictsWithLimit = async (fileList, limit = 3) => {
+const downloadDictsWithLimit = async (fileList, limit = 3, force = false) => {
     const results = []
     for (let i = 0; i < fileList.length; i += limit) {
         const batch = fileList.slice(i, i + limit)
         const batchResults = await Promise.all(
-            batch.map(fileName => ensureDictFile(fileName))
+            batch.map(fileName => ensureDictFile(fileName, force))
         )
         results.push(...batchResults)
 
@@ -244,10 +249,12 @@ const mergeUserExtensions = () => {
     const tryParse = (val) => {
         try { return val ? JSON.parse(val) : null; } catch (e) { return null; }
     };
+    INDEX_EXTENDED = false;
 
     // 1. 合并国家别名
     const customCountries = tryParse(Plugin.customCountries);
     if (customCountries) {
+        INDEX_EXTENDED = true;
         DICTS.COUNTRIES = DICTS.COUNTRIES || {};
         for (const [code, data] of Object.entries(customCountries)) {
             if (DICTS.COUNTRIES[code]) {
@@ -261,6 +268,7 @@ const mergeUserExtensions = () => {
     // 2. 合并线路别名
     const customLines = tryParse(Plugin.customLines);
     if (customLines) {
+        INDEX_EXTENDED = true;
         DICTS.LINE_ALIAS_MAP = DICTS.LINE_ALIAS_MAP || {};
         DICTS.LINES = DICTS.LINES || {};
         for (const [code, data] of Object.entries(customLines)) {
@@ -276,6 +284,7 @@ const mergeUserExtensions = () => {
     // 3. 合并标签别名
     const customTags = tryParse(Plugin.customTags);
     if (customTags) {
+        INDEX_EXTENDED = true;
         DICTS.TAG_ALIAS_MAP = DICTS.TAG_ALIAS_MAP || {};
         DICTS.TAGS = DICTS.TAGS || {};
         for (const [code, data] of Object.entries(customTags)) {
@@ -291,6 +300,7 @@ const mergeUserExtensions = () => {
     // 4. 合并城市别名
     const customCities = tryParse(Plugin.customCities);
     if (customCities) {
+        INDEX_EXTENDED = true;
         DICTS.CITIES = DICTS.CITIES || {};
         for (const [reg, cities] of Object.entries(customCities)) {
             DICTS.CITIES[reg] = DICTS.CITIES[reg] || {};
@@ -331,22 +341,41 @@ const v2Tokenize = (text) => {
     return segments.map(s => s.trim()).filter(Boolean);
 };
 
+// 优先级矩阵 (同长度时的权重)
+const CAT_PRIORITY = { region: 10, city: 9, line: 8, tag: 5 };
+const MATCHER_FORMAT = 1;
+
+// 加载构建时预编译的索引 (matcher.json：已规范化、已排序、已去重)
+// 版本不一致或用户扩展了索引来源时返回 null，回退到运行时构建
+const loadCompiledIndex = () => {
+    const compiled = DICTS.MATCHER;
+    if (!compiled || compiled.format !== MATCHER_FORMAT || INDEX_EXTENDED) return null;
+    if (!Array.isArray(compiled.entries) || compiled.version !== DICTS.VERSION?.version) return null;
+
+    return compiled.entries.map(([alias, category, code, region]) => {
+        const entry = { alias, code, type: category, category, weight: CAT_PRIORITY[category] };
+        if (category === 'city') entry.region = region;
+        return entry;
+    });
+};
+
 // 构建全语义索引 (按别名长度倒序 + 分类优先级，用于贪婪匹配)
 let UNIVERSAL_INDEX = null;
 const buildUniversalIndex = () => {
     if (UNIVERSAL_INDEX) return UNIVERSAL_INDEX;
 
+    const compiledIndex = loadCompiledIndex();
+    if (compiledIndex) {
+        UNIVERSAL_INDEX = compiledIndex;
+        return compiledIndex;
+    }
+
     const index = [];
     const countries = DICTS.COUNTRIES || {};
     const cities = DICTS.CITIES || {};
-    const lines = DICTS.LINES || {};
     const lineAliasMap = DICTS.LINE_ALIAS_MAP || {};
-    const tags = DICTS.TAGS || {};
     const tagAliasMap = DICTS.TAG_ALIAS_MAP || {};
 
-    // 优先级矩阵 (同长度时的权重)
-    const CAT_PRIORITY = { region: 10, city: 9, line: 8, tag: 5 };
-
     // 1. 国家/地区
     for (const [code, data] of Object.entries(countries)) {
         (data.aliases || []).forEach(alias => {
@@ -381,8 +410,11 @@ const buildUniversalIndex = () => {
     // 1. 长度倒序 (最贪婪)
     // 2. 如果长度相同，按分类优先级倒序
     index.sort((a, b) => (b.alias.length - a.alias.length) || (b.weight - a.weight));
-    UNIVERSAL_INDEX = index;
-    return index;
+
+    // 同一别名只有第一条可能被接受，去掉其余重复项 (与预编译的 matcher.json 一致)
+    const seen = new Set();
+    UNIVERSAL_INDEX = index.filter(entry => !seen.has(entry.alias) && seen.add(entry.alias));
+    return UNIVERSAL_INDEX;
 };
 
 // 贪婪提取所有语义匹配项
@@ -416,29 +448,28 @@ const findMatchesGreedy = (nodeName) => {
 
 // ========== 版本检查 ==========
 
-// 获取本地字典版本
-const getLocalVersion = async () => {
+// 读取本地 version.json
+const getLocalVersionData = async () => {
     try {
         const versionPath = `${DICT_DIR}/version.json`;
         if (await Plugins.FileExists(versionPath)) {
             const content = await Plugins.ReadFile(versionPath);
-            const data = JSON.parse(content);
-            return data.version || '0.0.0';
+            return JSON.parse(content);
         }
     } catch (error) {
         Plugins.LogWarning(`读取本地版本失败: ${error}`);
     }
-    return '0.0.0';
+    return null;
 }
 
-// 获取远程字典版本
-const fetchRemoteVersion = async () => {
+// 获取远程 version.json
+const fetchRemoteVersionData = async () => {
     for (const cdnBase of DICT_CDN_SOURCES) {
         try {
             const url = `${cdnBase}/version.json`;
             const { body } = await Plugins.HttpGet(url, {});
             if (body && body.version) {
-                return body.version;
+                return body;
             }
         } catch (error) {
             continue; // 尝试下一个 CDN
@@ -448,17 +479,38 @@ const fetchRemoteVersion = async () => {
     return null;
 }
 
-// 比较版本号 (简单的字符串比较，适用于 semver)
+// 比较版本号（按数字逐段比较："1.10.0" > "1.9.0"）
 const isNewerVersion = (remote, local) => {
     if (!remote || !local) return false;
-    return remote > local;
+    const parse = v => (String(v).match(/\d+/g) || []).map(Number);
+    const a = parse(remote);
+    const b = parse(local);
+    for (let i = 0; i < Math.max(a.length, b.length); i++) {
+        const diff = (a[i] || 0) - (b[i] || 0);
+        if (diff !== 0) return diff > 0;
+    }
+    return false;
+}
+
+// 远程内容与本地不同的字典文件（按 version.json 中记录的 SHA-256 比较；无记录时视为已变化）
+const changedDictFiles = (remoteData, localData) => {
+    const remoteFiles = (remoteData && remoteData.files) || {};
+    const localFiles = (localData && localData.files) || {};
+    return DICT_FILE_LIST.filter(fileName => {
+        if (fileName === 'version.json') return false;
+        const remoteHash = remoteFiles[fileName] && remoteFiles[fileName].sha256;
+        const localHash = localFiles[fileName] && localFiles[fileName].sha256;
+        return !remoteHash || remoteHash !== localHash;
+    });
 }
 
 // 检查并更新字典
 const checkAndUpdateDictionaries = async () => {
     try {
-        const localVersion = await getLocalVersion();
-        const remoteVersion = await fetchRemoteVersion();
+        const localData = await getLocalVersionData();
+        const localVersion = (localData && localData.version) || '0.0.0';
+        const remoteData = await fetchRemoteVersionData();
+        const remoteVersion = remoteData && remoteData.version;
 
         if (!remoteVersion) {
             Plugins.LogInfo(`字典版本检查完成 (本地: ${localVersion}, 远程: 无法获取)`);
@@ -467,15 +519,18 @@ const checkAndUpdateDictionaries = async () => {
 
         if (isNewerVersion(remoteVersion, localVersion)) {
             Plugins.message.info(`发现新版本字典 (${localVersion} → ${remoteVersion})，正在更新...`);
-            Plugins.LogInfo(`开始更新字典: ${localVersion} → ${remoteVersion}`);
 
-            // 强制重新下载所有文件
-            await downloadDictsWithLimit(DICT_FILE_LIST, 3);
+            // 只下载内容有变化的文件；version.json 最后写入，中途失败时下次检查会继续更新
+            const changedFiles = changedDictFiles(remoteData, localData);
+            Plugins.LogInfo(`开始更新字典: ${localVersion} → ${remoteVersion}（${changedFiles.length + 1}/${DICT_FILE_LIST.length} 个文件）`);
+            await downloadDictsWithLimit(changedFiles, 3, true);
+            await ensureDictFile('version.json', true);
 
             // 重新加载字典
             await loadDictionaries();
             mergeUserExtensions();
             UNIVERSAL_INDEX = null;
+            KEYWORD_MATCHERS = {};
 
             Plugins.message.success(`字典已更新到 v${remoteVersion}`);
             Plugins.LogInfo(`字典更新完成: v${remoteVersion}`);
@@ -511,6 +566,7 @@ const ensureDictionaries = async () => {
         await loadDictionaries();
         mergeUserExtensions();
         UNIVERSAL_INDEX = null; // 字典重载后强制销毁索引缓存
+        KEYWORD_MATCHERS = {};
 
         // 记录版本信息
         if (DICTS.VERSION) {
@@ -619,32 +675,81 @@ const extractMultiplier = (nodeName) => {
     return null
 }
 
-// 检查是否是状态行
-const isStatusLine = (nodeName) => {
-    const patterns = DICTS.KEYWORDS_STATUS?.patterns || []
-    return patterns.some(pattern => {
+// 关键词匹配器缓存 (字典重载后需清空)
+let KEYWORD_MATCHERS = {}
+const KEYWORDS_FORMAT = 1
+
+// 获取合并后的关键词匹配器：一个合并正则 + 字面量预过滤
+// 优先使用构建时生成的 compiled；用户追加了规则时在运行时合并（跳过无效规则）
+const getKeywordMatcher = (dictKey) => {
+    if (KEYWORD_MATCHERS[dictKey]) return KEYWORD_MATCHERS[dictKey]
+
+    const patterns = DICTS[dictKey]?.patterns || []
+    const compiled = DICTS[dictKey]?.compiled
+    let matcher = null
+
+    const isCurrent = compiled && compiled.format === KEYWORDS_FORMAT &&
+        Array.isArray(compiled.rules) && compiled.rules.length === patterns.length &&
+        compiled.rules.every((rule, i) => rule.pattern === patterns[i])
+
+    if (isCurrent) {
         try {
-            const regex = new RegExp(pattern, 'i')
-            return regex.test(nodeName)
-        } catch {
-            return false
+            matcher = {
+                regex: compiled.rules.length ? new RegExp(compiled.combined, 'i') : null,
+                rules: compiled.rules,
+                prefilter: compiled.prefilter || null
+            }
+        } catch (error) {
+            Plugins.LogWarning(`${dictKey} 合并正则无效，回退到运行时合并: ${error}`)
         }
-    })
-}
+    }
 
-// 检查是否是广告行
-const isAdLine = (nodeName) => {
-    const patterns = DICTS.KEYWORDS_AD?.patterns || []
-    return patterns.some(pattern => {
-        try {
-            const regex = new RegExp(pattern, 'i')
-            return regex.test(nodeName)
-        } catch {
-            return false
+    if (!matcher) {
+        const rules = []
+        let group = 1
+        patterns.forEach((pattern, id) => {
+            try {
+                // 统计规则内部的捕获组数量，用于定位命中的规则
+                const groups = new RegExp(`${pattern}|`).exec('').length - 1
+                rules.push({ id, pattern, group })
+                group += 1 + groups
+            } catch {
+                // 跳过无效规则
+            }
+        })
+        matcher = {
+            regex: rules.length ? new RegExp(rules.map(r => `(${r.pattern})`).join('|'), 'i') : null,
+            rules,
+            prefilter: null
         }
-    })
+    }
+
+    KEYWORD_MATCHERS[dictKey] = matcher
+    return matcher
 }
 
+// 返回命中的规则 ID（patterns 中的下标），未命中返回 null
+const matchKeywordRule = (dictKey, nodeName) => {
+    const matcher = getKeywordMatcher(dictKey)
+    if (!matcher.regex) return null
+
+    if (matcher.prefilter) {
+        const lowered = nodeName.toLowerCase()
+        if (!matcher.prefilter.some(literal => lowered.includes(literal))) return null
+    }
+
+    const match = matcher.regex.exec(nodeName)
+    if (!match) return null
+    const rule = matcher.rules.find(r => match[r.group] !== undefined)
+    return rule ? rule.id : null
+}
+
+// 检查是否是状态行
+const isStatusLine = (nodeName) => matchKeywordRule('KEYWORDS_STATUS', nodeName) !== null
+
+// 检查是否是广告行
+const isAdLine = (nodeName) => matchKeywordRule('KEYWORDS_AD', nodeName) !== null
+
 // 规范化文本（用于别名匹配）- 保留中文字符
 const normalizeText = (text) => {
     // 只移除空格和标点，保留中文、英文、数字
@@ -800,30 +905,20 @@ const calculateScore = (candidate, nodeName, matches) => {
     return score;
 };
 
-// 解决城市冲突（当 city_alias_map 返回数组时）
-const resolveCityConflict = (cityRefs, contextCountries) => {
-    if (!Array.isArray(cityRefs) || cityRefs.length === 0) {
-        return null;
-    }
-
-    if (cityRefs.length === 1) {
-        return cityRefs[0];
-    }
-
-    // 策略 1: 上下文国家匹配
-    for (const ref of cityRefs) {
-        const countryCode = ref.split('.')[0];
-        if (contextCountries.includes(countryCode)) {
-            return ref;
-        }
-    }
-
-    // 策略 2: 统计先验（美国城市更常见）
-    const usCityRef = cityRefs.find(ref => ref.startsWith('US.'));
-    if (usCityRef) return usCityRef;
-
-    // 策略 3: 默认取第一个
-    return cityRefs[0];
+// 解决城市冲突（多个城市共用的别名，查构建时生成的 city_conflicts.json）
+// 名称中第一个有对应候选城市的国家决定城市，否则取该别名的默认城市
+const resolveCityConflicts = (matches) => {
+    const conflicts = DICTS.CITY_CONFLICTS?.aliases;
+    if (!conflicts) return matches;
+
+    const contextCountries = matches.filter(m => m.category === 'region').map(m => m.code);
+    return matches.map(m => {
+        if (m.category !== 'city' || !Object.prototype.hasOwnProperty.call(conflicts, m.alias)) return m;
+        const conflict = conflicts[m.alias];
+        const country = contextCountries.find(cc => Object.prototype.hasOwnProperty.call(conflict.context, cc));
+        const [region, code] = country !== undefined ? conflict.context[country] : conflict.default;
+        return { ...m, code, region };
+    });
 };
 
 // 从线路/标签推断国家（降级策略）
@@ -886,7 +981,7 @@ const parseNodeName = (nodeName) => {
     result.mult = extractMultiplier(nodeName);
 
     // 2. 全语义贪婪匹配
-    const matches = findMatchesGreedy(nodeName);
+    const matches = resolveCityConflicts(findMatchesGreedy(nodeName));
     const tagCodes = new Set();
     let lineCode = null;
 
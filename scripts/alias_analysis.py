@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Alias shadowing analysis of the generated dictionaries.
+
+The universal matcher tries aliases longest first, then by category
+priority (region > city > line > tag), and only the first index entry of a
+normalized alias can ever be accepted. An alias that normalizes to the same
+string as an alias of a higher-priority category therefore never wins: it
+only adds entries to the runtime index.
+
+build_cities.py and build_match_tables.py use claimed_aliases() to leave
+such aliases out of the match tables they write (cities.json aliases,
+line_alias_map.json, tag_alias_map.json). The declared alias lists
+(city_alias_map.json, lines.json and tags.json aliases) stay complete, so
+analyze() can still report every shadowed alias.
+"""
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.automaton import AhoCorasick  # noqa: E402
+from nns.dictionaries import load_json  # noqa: E402
+from nns.keywords import KeywordMatcher  # noqa: E402
+from nns.matcher import CATEGORY_PRIORITY, normalize  # noqa: E402
+
+
+REPORT_FORMAT = 1
+
+# Categories from the highest priority down (ties between equal-length
+# aliases go to the first one)
+CATEGORIES = sorted(CATEGORY_PRIORITY, key=CATEGORY_PRIORITY.get, reverse=True)
+
+
+class Owner(NamedTuple):
+    """One declared alias: its spelling, normalized form and entity."""
+    alias: str
+    norm: str
+    category: str
+    code: str  # "CC.Key" for cities
+
+
+def declared_aliases(generated_dir: Path, categories: Iterable[str] = CATEGORIES) -> Iterator[Owner]:
+    """Declared aliases of the given categories, in matching order.
+
+    Aliases of the match tables come first, in the order the matcher reads
+    them, so the first owner of a normalized alias is the one that wins;
+    declared aliases missing from the match tables (city_alias_map.json,
+    lines.json, tags.json) follow. Aliases that normalize to nothing are
+    skipped.
+    """
+    wanted = set(categories)
+    for category in CATEGORIES:
+        if category not in wanted:
+            continue
+        if category == "region":
+            entries = [
+                (alias, code)
+                for code, data in load_json(generated_dir / "countries.json").items()
+                for alias in data.get("aliases") or []
+            ]
+        elif category == "city":
+            cities = load_json(generated_dir / "cities.json") if (generated_dir / "cities.json").exists() else {}
+            entries = [
+                (alias, f"{country_code}.{city_key}")
+                for country_code, by_key in cities.items()
+                for city_key, data in by_key.items()
+                for alias in data.get("aliases") or []
+            ]
+            listed = {alias for alias, _ in entries}
+            entries += [
+                (alias, ref)
+                for alias, refs in load_json(generated_dir / "city_alias_map.json").items()
+                if alias not in listed
+                for ref in refs
+            ]
+        else:
+            prefix = "line" if category == "line" else "tag"
+            alias_map_path = generated_dir / f"{prefix}_alias_map.json"
+            entries = list(load_json(alias_map_path).items()) if alias_map_path.exists() else []
+            entries += [
+                (alias, code)
+                for code, data in load_json(generated_dir / f"{prefix}s.json").items()
+                for alias in data.get("aliases") or []
+            ]
+        for alias, code in dict.fromkeys(entries):
+            norm = normalize(alias)
+            if norm:
+                yield Owner(alias, norm, category, code)
+
+
+def claimed_aliases(generated_dir: Path, categories: Iterable[str]) -> Dict[str, Owner]:
+    """Normalized aliases already taken by the given categories, with their first owner.
+
+    A builder drops its aliases found here: they can never win against the
+    higher-priority owner.
+    """
+    claimed: Dict[str, Owner] = {}
+    for owner in declared_aliases(generated_dir, categories):
+        claimed.setdefault(owner.norm, owner)
+    return claimed
+
+
+def split_claimed(
+    aliases: Iterable[str], claimed: Dict[str, Owner]
+) -> Tuple[List[str], List[Tuple[str, Owner]]]:
+    """Aliases to keep in a match table, and the dropped ones with their owner."""
+    kept: List[str] = []
+    dropped: List[Tuple[str, Owner]] = []
+    for alias in aliases:
+        owner = claimed.get(normalize(alias))
+        if owner is None:
+            kept.append(alias)
+        else:
+            dropped.append((alias, owner))
+    return kept, dropped
+
+
+def print_dropped(dropped: List[Tuple[str, Owner]], table: str, shown: int = 10) -> None:
+    """Console summary of the aliases a builder left out of a match table."""
+    if not dropped:
+        return
+    print(f"  {len(dropped)} aliases left out of {table} (claimed by a higher-priority category):")
+    for alias, owner in sorted(dropped)[:shown]:
+        print(f"    '{alias}' -> {owner.category} {owner.code}")
+    if len(dropped) > shown:
+        print(f"    ... and {len(dropped) - shown} more")
+
+
+def analyze(generated_dir: Path) -> Dict[str, Any]:
+    """Shadowing report of the declared aliases in generated_dir.
+
+    Returns:
+        A dict with:
+            summary: Counts of the sections below and of all aliases
+            dead: Normalized alias -> {"winner": [category, code],
+                "shadowed": [[category, code], ...]} for aliases declared by
+                several entities where the losers can never match
+            conflicts: Normalized alias -> city refs, for aliases shared
+                only by cities (resolved at runtime by city_conflicts.json)
+            filtered: Normalized alias -> {"owner": [category, code],
+                "rule": "status" | "ad", "pattern": ...} for aliases that
+                make a name made of just that alias a status or ad line
+            contained: Normalized alias -> [[longer alias, category, code],
+                ...], the longer aliases of other categories that contain it
+                (where the longer one is found first and takes the text)
+    """
+    owners: Dict[str, List[Owner]] = {}
+    spellings = 0
+    for owner in declared_aliases(generated_dir):
+        spellings += 1
+        entities = owners.setdefault(owner.norm, [])
+        if all((o.category, o.code) != (owner.category, owner.code) for o in entities):
+            entities.append(owner)
+
+    dead: Dict[str, Any] = {}
+    conflicts: Dict[str, List[str]] = {}
+    for norm, entities in sorted(owners.items()):
+        if len(entities) < 2:
+            continue
+        winner = entities[0]
+        if all(o.category == "city" for o in entities):
+            conflicts[norm] = [o.code for o in entities]
+            continue
+        dead[norm] = {
+            "winner": [winner.category, winner.code],
+            "shadowed": [[o.category, o.code] for o in entities[1:]],
+        }
+
+    filtered: Dict[str, Any] = {}
+    rules = {
+        name: KeywordMatcher(load_json(generated_dir / f"keywords_{name}.json"))
+        for name in ("status", "ad")
+        if (generated_dir / f"keywords_{name}.json").exists()
+    }
+    for norm, entities in sorted(owners.items()):
+        winner = entities[0]
+        for name, matcher in rules.items():
+            rule = _first_rule(matcher, {norm, winner.alias})
+            if rule is not None:
+                filtered[norm] = {
+                    "owner": [winner.category, winner.code],
+                    "rule": name,
+                    "pattern": matcher.pattern_for(rule),
+                }
+                break
+
+    # Containment between the winning aliases of different categories
+    winners = sorted(owners)
+    automaton = AhoCorasick(winners)
+    contained: Dict[str, List[List[str]]] = {}
+    for text in winners:
+        outer = owners[text][0]
+        for pattern_id in sorted({p for p, _, _ in automaton.find_all(text)}):
+            inner = winners[pattern_id]
+            if inner != text and owners[inner][0].category != outer.category:
+                contained.setdefault(inner, []).append([text, outer.category, outer.code])
+
+    return {
+        "format": REPORT_FORMAT,
+        "summary": {
+            "spellings": spellings,
+            "aliases": len(owners),
+            "dead": sum(len(entry["shadowed"]) for entry in dead.values()),
+            "conflicts": len(conflicts),
+            "filtered": len(filtered),
+            "contained": len(contained),
+        },
+        "dead": dead,
+        "conflicts": conflicts,
+        "filtered": filtered,
+        "contained": dict(sorted(contained.items())),
+    }
+
+
+def _first_rule(matcher: KeywordMatcher, texts: Iterable[str]) -> Optional[int]:
+    for text in sorted(texts):
+        rule = matcher.search(text)
+        if rule is not None:
+            return rule
+    return None
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Incremental build driver for the dictionaries.
+
+Every artifact records the SHA-256 of its inputs (source YAML, upstream
+generated files and the build code itself) and the SHA-256, size and gzip
+size of its outputs in version.json. A run rebuilds only the artifacts whose
+inputs changed or whose outputs are missing or were modified, and reports
+why each artifact was built or skipped. matcher.json and tag_index.json
+also embed the dictionary version, which the plugin checks against
+version.json; they are rebuilt when it no longer matches (release.py
+stamps a new one).
+
+Builders run in parallel subprocesses as a dependency DAG: cities waits for
+countries, while lines, tags and keywords only read their own sources. The
+steps that combine dictionaries run once their sources are done: the match
+tables (line/tag aliases pruned against the higher-priority dictionaries),
+the matcher, the alias report and the packed binary dictionary. A full
+build therefore takes about as long as countries -> cities -> match tables
+-> matcher, not the sum of the builders. Selecting an artifact also
+selects everything downstream of it.
+
+dict/sources/cities.yaml is hand-maintained: it is an input of cities, never
+an output the driver regenerates. generate_cities_yaml.py, which seeds it
+from countries.json and overwrites it, only runs when cities_yaml is named
+on the command line.
+
+Usage:
+    python scripts/build.py [ARTIFACT ...] [--force] [--dry-run] [--adopt] [-j N]
+
+build_countries.py fetches CLDR/ISO data into dict/sources/snapshots/ and
+the snapshots are tracked as inputs, but upstream is only queried when
+countries is built: use --force countries to check for upstream changes
+(unchanged sources cost one conditional request each). Set NNS_OFFLINE=1 to
+build from the snapshots without network access. The snapshots are not
+part of the repository: on a fresh checkout, run build_countries.py once
+with network access (or seed them from local copies with
+--source-url NAME=file:///...) before building countries offline. --adopt
+records the current files as up to date without building (e.g. for a
+checkout whose version.json has no build records yet).
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from build_match_tables import DEFER_ENV as MATCH_TABLES_DEFER_ENV
+from build_matcher import DEFER_ENV as MATCHER_DEFER_ENV
+from version_manager import current_version, gzip_bytes, update_version_file
+
+
+# Version for generated files
+VERSION = "1.0.0"
+
+ROOT = Path(__file__).resolve().parents[1]
+SCRIPTS_DIR = ROOT / "scripts"
+GENERATED_DIR = ROOT / "dict" / "generated"
+
+# Build code shared by several builders
+COMMON_CODE = ["scripts/utils.py", "scripts/version_manager.py"]
+MATCHER_CODE = [
+    "scripts/build_matcher.py",
+    "nns/automaton.py",
+    "nns/dictionaries.py",
+    "nns/matcher.py",
+]
+# Alias shadowing analysis, used by build_cities and build_match_tables to
+# prune the match tables
+ALIAS_CODE = ["scripts/alias_analysis.py"]
+
+# Upstream source snapshots written by build_countries.py
+SNAPSHOTS = [
+    "dict/sources/snapshots/cldr_en.json",
+    "dict/sources/snapshots/cldr_zh.json",
+    "dict/sources/snapshots/iso3166.json",
+]
+
+
+@dataclass
+class Artifact:
+    """One builder script with the files it reads and writes (repo-relative)."""
+    name: str
+    script: str
+    inputs: List[str]
+    outputs: List[str]
+    deps: List[str] = field(default_factory=list)
+    # Inputs that may legitimately be absent (hashed as None)
+    optional: List[str] = field(default_factory=list)
+    # Only built when named on the command line, never because it is stale
+    # (its outputs are sources that are edited by hand)
+    explicit: bool = False
+    # Outputs that embed the dictionary version of version.json
+    versioned: List[str] = field(default_factory=list)
+
+
+ARTIFACTS: List[Artifact] = [
+    Artifact(
+        "countries", "build_countries.py",
+        ["dict/sources/countries_patch.yaml", "scripts/source_cache.py"]
+        + SNAPSHOTS + COMMON_CODE + MATCHER_CODE,
+        ["dict/generated/countries.json", "dict/generated/country_alias_map.json"],
+        optional=SNAPSHOTS,
+    ),
+    Artifact(
+        "cities_yaml", "generate_cities_yaml.py",
+        ["dict/generated/countries.json"],
+        ["dict/sources/cities.yaml"],
+        deps=["countries"],
+        explicit=True,
+    ),
+    Artifact(
+        "cities", "build_cities.py",
+        [
+            "dict/sources/cities.yaml",
+            "dict/sources/city_conflicts.yaml",
+            "dict/generated/countries.json",
+        ] + COMMON_CODE + ALIAS_CODE + MATCHER_CODE,
+        [
+            "dict/generated/cities.json",
+            "dict/generated/city_alias_map.json",
+            "dict/generated/city_conflicts.json",
+        ],
+        deps=["countries", "cities_yaml"],
+    ),
+    Artifact(
+        "lines", "build_lines.py",
+        ["dict/sources/lines.yaml"] + COMMON_CODE + MATCHER_CODE,
+        ["dict/generated/lines.json"],
+    ),
+    Artifact(
+        "tags", "build_tags.py",
+        ["dict/sources/tags.yaml"] + COMMON_CODE + MATCHER_CODE,
+        ["dict/generated/tags.json"],
+    ),
+    Artifact(
+        "match_tables", "build_match_tables.py",
+        [
+            "dict/sources/lines.yaml",
+            "dict/sources/tags.yaml",
+            "dict/generated/countries.json",
+            "dict/generated/cities.json",
+            "dict/generated/city_alias_map.json",
+            "dict/generated/lines.json",
+            "dict/generated/tags.json",
+            "nns/tags.py",
+        ] + COMMON_CODE + ALIAS_CODE + MATCHER_CODE,
+        [
+            "dict/generated/line_alias_map.json",
+            "dict/generated/tag_alias_map.json",
+            "dict/generated/tag_index.json",
+        ],
+        deps=["countries", "cities", "lines", "tags"],
+        versioned=["dict/generated/tag_index.json"],
+    ),
+    Artifact(
+        "keywords", "build_keywords.py",
+        [
+            "dict/sources/keywords_status.yaml",
+            "dict/sources/keywords_ad.yaml",
+            "dict/sources/keywords_connectors.yaml",
+            "nns/keywords.py",
+        ],
+        [
+            "dict/generated/keywords_status.json",
+            "dict/generated/keywords_ad.json",
+            "dict/generated/keywords_connectors.json",
+        ],
+    ),
+    Artifact(
+        "matcher", "build_matcher.py",
+        [
+            "dict/generated/countries.json",
+            "dict/generated/cities.json",
+            "dict/generated/line_alias_map.json",
+            "dict/generated/tag_alias_map.json",
+            "scripts/version_manager.py",
+        ] + MATCHER_CODE,
+        ["dict/generated/matcher.json"],
+        deps=["countries", "cities", "match_tables"],
+        versioned=["dict/generated/matcher.json"],
+    ),
+    Artifact(
+        "aliases", "build_alias_report.py",
+        [
+            "dict/generated/countries.json",
+            "dict/generated/cities.json",
+            "dict/generated/city_alias_map.json",
+            "dict/generated/lines.json",
+            "dict/generated/line_alias_map.json",
+            "dict/generated/tags.json",
+            "dict/generated/tag_alias_map.json",
+            "dict/generated/keywords_status.json",
+            "dict/generated/keywords_ad.json",
+            "scripts/version_manager.py",
+            "nns/automaton.py",
+            "nns/keywords.py",
+        ] + ALIAS_CODE,
+        ["dict/reports/alias_report.json"],
+        deps=["countries", "cities", "lines", "tags", "match_tables", "keywords"],
+    ),
+    Artifact(
+        "packed", "build_packed.py",
+        [
+            "dict/generated/countries.json",
+            "dict/generated/country_alias_map.json",
+            "dict/generated/lines.json",
+            "dict/generated/line_alias_map.json",
+            "dict/generated/tags.json",
+            "dict/generated/tag_alias_map.json",
+            "dict/generated/cities.json",
+            "dict/generated/city_alias_map.json",
+            "dict/generated/keywords_status.json",
+            "dict/generated/keywords_ad.json",
+            "dict/generated/keywords_connectors.json",
+            "scripts/version_manager.py",
+            "nns/dictionaries.py",
+            "nns/packed.py",
+        ],
+        ["dict/generated/dictionaries.bin"],
+        deps=["countries", "cities", "lines", "tags", "match_tables", "keywords"],
+    ),
+]
+
+ARTIFACTS_BY_NAME: Dict[str, Artifact] = {a.name: a for a in ARTIFACTS}
+
+# Artifacts whose outputs embed the dictionary version
+VERSIONED_ARTIFACTS = [a.name for a in ARTIFACTS if a.versioned]
+
+
+def file_hash(path: Path) -> Optional[str]:
+    """SHA-256 of a file, or None if it does not exist."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def input_hashes(artifact: Artifact) -> Dict[str, Optional[str]]:
+    """Hashes of an artifact's inputs, including its own script."""
+    paths = [f"scripts/{artifact.script}"] + artifact.inputs
+    return {p: file_hash(ROOT / p) for p in dict.fromkeys(paths)}
+
+
+def record_key(output: str) -> str:
+    """version.json key of an output file (its file name)."""
+    return Path(output).name
+
+
+def load_records(generated_dir: Path = GENERATED_DIR) -> Dict[str, dict]:
+    try:
+        data = json.loads((generated_dir / "version.json").read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def embedded_version(path: Path) -> Optional[str]:
+    """The "version" of a JSON artifact, or None if it has none."""
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return data.get("version") if isinstance(data, dict) else None
+
+
+def stale_reason(artifact: Artifact, records: Dict[str, dict]) -> Optional[str]:
+    """Why an artifact must be rebuilt, or None if it is up to date."""
+    current = input_hashes(artifact)
+    missing_inputs = [p for p, h in current.items() if h is None and p not in artifact.optional]
+    if missing_inputs:
+        return f"missing input {missing_inputs[0]}"
+
+    for output in artifact.outputs:
+        record = records.get(record_key(output)) or {}
+        output_hash = file_hash(ROOT / output)
+        if output_hash is None:
+            return f"missing output {output}"
+        if "sha256" not in record or "inputs" not in record:
+            return f"no build record for {record_key(output)}"
+        if record["sha256"] != output_hash:
+            return f"{output} was modified"
+        recorded_inputs = record["inputs"]
+        changed = [p for p, h in current.items() if recorded_inputs.get(p) != h]
+        if changed:
+            more = f" (+{len(changed) - 1} more)" if len(changed) > 1 else ""
+            return f"changed {changed[0]}{more}"
+
+    if artifact.versioned:
+        version = current_version(GENERATED_DIR)
+        for output in artifact.versioned:
+            embedded = embedded_version(ROOT / output)
+            if embedded != version:
+                return f"{output} is for version {embedded}, not {version}"
+    return None
+
+
+def output_record(path: Path) -> Dict[str, Any]:
+    """SHA-256, size and gzip size of a built file."""
+    data = path.read_bytes()
+    return {
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "size": len(data),
+        "compressed_size": len(gzip_bytes(data)),
+    }
+
+
+def record_build(artifact: Artifact, generated_dir: Path = GENERATED_DIR) -> None:
+    """Store input hashes and output hashes/sizes of a freshly built artifact in version.json."""
+    inputs = input_hashes(artifact)
+    update_version_file(
+        generated_dir,
+        VERSION,
+        {
+            record_key(output): {**output_record(ROOT / output), "inputs": inputs}
+            for output in artifact.outputs
+        },
+        merge=True,
+    )
+
+
+def run_builder(artifact: Artifact) -> Tuple[int, str]:
+    """Run a builder script in a subprocess.
+
+    The match tables and the universal matcher are deferred to their own
+    artifacts, so that builders running in parallel do not each recompile
+    them.
+
+    Returns:
+        Exit code and the combined stdout/stderr of the script
+    """
+    env = dict(os.environ)
+    if artifact.name != "match_tables":
+        env[MATCH_TABLES_DEFER_ENV] = "1"
+    if artifact.name != "matcher":
+        env[MATCHER_DEFER_ENV] = "1"
+    proc = subprocess.run(
+        [sys.executable, str(SCRIPTS_DIR / artifact.script)],
+        cwd=str(ROOT),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding="utf-8",
+    )
+    return proc.returncode, proc.stdout
+
+
+def select(names: List[str]) -> List[str]:
+    """Selected artifacts plus everything downstream of them.
+
+    Explicit artifacts are only selected by name.
+    """
+    selected = set(names or (a.name for a in ARTIFACTS if not a.explicit))
+    changed = True
+    while changed:
+        changed = False
+        for artifact in ARTIFACTS:
+            if artifact.explicit:
+                continue
+            if artifact.name not in selected and selected.intersection(artifact.deps):
+                selected.add(artifact.name)
+                changed = True
+    return [a.name for a in ARTIFACTS if a.name in selected]
+
+
+def topological_order(names: List[str]) -> List[Artifact]:
+    """Artifacts in dependency order (restricted to the given names)."""
+    wanted = set(names)
+    ordered: List[Artifact] = []
+    seen = set()
+
+    def visit(name: str) -> None:
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in ARTIFACTS_BY_NAME[name].deps:
+            visit(dep)
+        if name in wanted:
+            ordered.append(ARTIFACTS_BY_NAME[name])
+
+    for artifact in ARTIFACTS:
+        visit(artifact.name)
+    return ordered
+
+
+def build(
+    names: List[str],
+    force: bool = False,
+    dry_run: bool = False,
+    adopt: bool = False,
+    jobs: Optional[int] = None,
+) -> Tuple[int, List[Tuple[str, str, str]]]:
+    """Bring the selected artifacts (and their dependents) up to date.
+
+    Artifacts run as a dependency DAG: each one starts as soon as the
+    artifacts it depends on have finished, up to ``jobs`` at a time, so a
+    full rebuild takes about as long as the slowest chain. Staleness is
+    checked when an artifact becomes ready, after its inputs were rebuilt.
+    A failed builder does not stop the run; artifacts depending on it are
+    skipped.
+
+    Args:
+        names: Artifacts to consider (all of them if empty)
+        force: Rebuild even if up to date
+        dry_run: Only report what would be built
+        adopt: Record the current outputs as built instead of building
+        jobs: Maximum builders running at once (defaults to all that are ready)
+
+    Returns:
+        Exit code and a (name, status, reason) row per artifact, in
+        dependency order
+    """
+    order = topological_order(select(names))
+    selected = {a.name for a in order}
+    pending = {a.name: a for a in order}
+    done: set = set()
+    failed: set = set()
+    rows: Dict[str, Tuple[str, str]] = {}
+
+    def schedule(pool: ThreadPoolExecutor, running: Dict[Future, Tuple[Artifact, str, float]]) -> bool:
+        progress = False
+        for name, artifact in list(pending.items()):
+            deps = [d for d in artifact.deps if d in selected]
+            failed_deps = [d for d in deps if d in failed]
+            if failed_deps:
+                del pending[name]
+                failed.add(name)
+                rows[name] = ("skipped", f"dependency {failed_deps[0]} failed")
+                progress = True
+                continue
+            if not all(d in done for d in deps):
+                continue
+            del pending[name]
+            progress = True
+            if force:
+                reason = "forced"
+            elif artifact.explicit:
+                reason = "requested"
+            else:
+                reason = stale_reason(artifact, load_records())
+            if reason is None:
+                rows[name] = ("skipped", "up to date")
+                done.add(name)
+            elif dry_run:
+                rows[name] = ("would build", reason)
+                done.add(name)
+            elif adopt:
+                if any(file_hash(ROOT / output) is None for output in artifact.outputs):
+                    rows[name] = ("failed", f"{reason}; cannot adopt missing outputs")
+                    failed.add(name)
+                else:
+                    record_build(artifact)
+                    rows[name] = ("adopted", reason)
+                    done.add(name)
+            else:
+                running[pool.submit(run_builder, artifact)] = (artifact, reason, time.perf_counter())
+        return progress
+
+    running: Dict[Future, Tuple[Artifact, str, float]] = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(ARTIFACTS)) as pool:
+        while pending or running:
+            if schedule(pool, running) and not running:
+                continue
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                artifact, reason, started = running.pop(future)
+                code, output = future.result()
+                elapsed = time.perf_counter() - started
+                print(f"── {artifact.name} ({artifact.script}) ──")
+                print(output.rstrip("\n"))
+                if code != 0:
+                    failed.add(artifact.name)
+                    rows[artifact.name] = ("failed", f"{reason}; exit code {code}")
+                    continue
+                record_build(artifact)
+                done.add(artifact.name)
+                rows[artifact.name] = ("built", f"{reason} ({elapsed:.2f}s)")
+
+    report = [(a.name,) + rows[a.name] for a in order if a.name in rows]
+    return (1 if failed else 0), report
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Incrementally build dict/generated")
+    parser.add_argument("artifacts", nargs="*", metavar="ARTIFACT",
+                        help=f"Artifacts to build (default: all): {', '.join(ARTIFACTS_BY_NAME)}")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be built")
+    parser.add_argument("--adopt", action="store_true",
+                        help="Record current outputs as up to date without building")
+    parser.add_argument("-j", "--jobs", type=int,
+                        help="Maximum builders running at once (default: no limit)")
+    args = parser.parse_args()
+    unknown = [name for name in args.artifacts if name not in ARTIFACTS_BY_NAME]
+    if unknown:
+        parser.error(f"unknown artifact: {unknown[0]}")
+
+    start = time.perf_counter()
+    code, report = build(args.artifacts, force=args.force, dry_run=args.dry_run, adopt=args.adopt,
+                         jobs=args.jobs)
+    elapsed = time.perf_counter() - start
+
+    print()
+    for name, status, reason in report:
+        mark = {"built": "✓", "adopted": "✓", "skipped": "·", "failed": "✗"}.get(status, "•")
+        print(f"{mark} {name:<12} {status}: {reason}")
+    built = sum(1 for _, status, _ in report if status == "built")
+    skipped = sum(1 for _, status, _ in report if status == "skipped")
+    print(f"  {built} built, {skipped} skipped in {elapsed * 1000:.0f}ms")
+    return code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Build dict/reports/alias_report.json: which aliases can never win.
+
+Lists, for the generated dictionaries (see alias_analysis.py):
+  - dead aliases, shadowed by an equal alias of a higher-priority category
+    or an earlier entity (the match tables of cities, lines and tags
+    already leave these out)
+  - aliases shared by several cities, resolved by city_conflicts.json
+  - aliases that turn a name into a status or ad line on their own
+  - cross-category containment: aliases found inside a longer alias of
+    another category
+
+Review the report when changing a source YAML: a new dead alias usually
+means the alias was meant for the other entity.
+"""
+import json
+import sys
+from pathlib import Path
+
+from alias_analysis import analyze
+from version_manager import update_version_file, write_atomic
+
+
+# Version for generated files
+VERSION = "1.0.0"
+
+# Entries of each section printed to the console
+SHOWN = 10
+
+
+def main() -> int:
+    root = Path(__file__).resolve().parents[1]
+    generated_dir = root / "dict" / "generated"
+    report_path = root / "dict" / "reports" / "alias_report.json"
+
+    missing = [
+        name for name in (
+            "countries.json", "city_alias_map.json", "lines.json", "tags.json",
+        ) if not (generated_dir / name).exists()
+    ]
+    if missing:
+        print(f"Error: missing {', '.join(missing)}", file=sys.stderr)
+        return 1
+
+    report = analyze(generated_dir)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    write_atomic(report_path, json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+
+    summary = report["summary"]
+    update_version_file(generated_dir, VERSION, {report_path.name: dict(summary)})
+
+    print(f"✓ Generated {report_path}")
+    print(
+        f"  {summary['aliases']} aliases ({summary['spellings']} spellings), "
+        f"{summary['dead']} dead, {summary['conflicts']} city conflicts, "
+        f"{summary['filtered']} filtered, {summary['contained']} contained in other categories"
+    )
+    for alias, entry in list(report["dead"].items())[:SHOWN]:
+        winner = " ".join(entry["winner"])
+        losers = ", ".join(" ".join(owner) for owner in entry["shadowed"])
+        print(f"    '{alias}': {losers} shadowed by {winner}")
+    if len(report["dead"]) > SHOWN:
+        print(f"    ... and {len(report['dead']) - SHOWN} more")
+    for alias, entry in list(report["filtered"].items())[:SHOWN]:
+        owner = " ".join(entry["owner"])
+        print(f"    '{alias}' ({owner}) alone matches {entry['rule']} rule {entry['pattern']!r}")
+    if len(report["filtered"]) > SHOWN:
+        print(f"    ... and {len(report['filtered']) - SHOWN} more")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,19 +2,86 @@
 """
 Build cities.json from cities.yaml source file.
 Generates a normalized dictionary of cities grouped by country.
+
+Also writes city_conflicts.json, the disambiguation table of aliases that
+several cities share (after matcher normalization). Each entry lists the
+city to use for a context country (a country also named in the node name)
+and a default; defaults come from city_conflicts.yaml, falling back to the
+US candidate, then to the first one in cities.yaml.
 """
 import json
 import sys
 from pathlib import Path
-from typing import Dict, Set
+from typing import Any, Dict, List, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-from utils import compact_alias
-from version_manager import update_version_file
+from nns.matcher import normalize  # noqa: E402
+from utils import compact_alias  # noqa: E402
+from alias_analysis import claimed_aliases, print_dropped, split_claimed  # noqa: E402
+from build_matcher import write_matcher  # noqa: E402
+from version_manager import update_version_file  # noqa: E402
 
 
 # Version for generated files
 VERSION = "1.0.0"
 
+CONFLICTS_FORMAT = 1
+
+# Fallback default for conflicts not listed in city_conflicts.yaml
+PREFERRED_COUNTRY = "US"
+
+
+def build_conflict_table(
+    cities: Dict[str, Dict[str, Any]], defaults: Dict[str, str]
+) -> Dict[str, Any]:
+    """Disambiguation table of normalized aliases shared by several cities.
+
+    Args:
+        cities: cities.json content
+        defaults: Alias -> "CC.Key" default (aliases normalized here)
+
+    Returns:
+        city_conflicts.json content
+
+    Raises:
+        ValueError: If a default is not a candidate of its alias, or names
+            an alias without conflict
+    """
+    candidates: Dict[str, List[str]] = {}
+    for country_code, by_key in cities.items():
+        for city_key, info in by_key.items():
+            ref = f"{country_code}.{city_key}"
+            for alias in info["aliases"]:
+                refs = candidates.setdefault(normalize(alias), [])
+                if ref not in refs and normalize(alias):
+                    refs.append(ref)
+
+    wanted = {normalize(alias): ref for alias, ref in defaults.items()}
+    aliases: Dict[str, Any] = {}
+    for alias in sorted(candidates):
+        refs = candidates[alias]
+        if len(refs) < 2:
+            continue
+        default = wanted.pop(alias, None)
+        if default is None:
+            default = next((r for r in refs if r.startswith(f"{PREFERRED_COUNTRY}.")), refs[0])
+        elif default not in refs:
+            raise ValueError(f"city_conflicts.yaml: {default} is not a candidate of '{alias}' ({refs})")
+        context: Dict[str, List[str]] = {}
+        for ref in refs:
+            country_code, city_key = ref.split(".", 1)
+            # Two cities of one country: the country cannot tell them apart
+            context.setdefault(country_code, [country_code, city_key])
+        aliases[alias] = {
+            "candidates": refs,
+            "default": default.split(".", 1),
+            "context": context,
+        }
+    if wanted:
+        raise ValueError(f"city_conflicts.yaml: no conflict for {', '.join(sorted(wanted))}")
+    return {"format": CONFLICTS_FORMAT, "aliases": aliases}
+
 
 def main() -> int:
     root = Path(__file__).resolve().parents[1]
@@ -22,6 +89,7 @@ def main() -> int:
     generated_dir = root / "dict" / "generated"
     
     cities_yaml = sources_dir / "cities.yaml"
+    conflicts_yaml = sources_dir / "city_conflicts.yaml"
     
     if not cities_yaml.exists():
         print(f"Error: {cities_yaml} not found", file=sys.stderr)
@@ -41,6 +109,19 @@ def main() -> int:
     if not isinstance(data, dict) or "cities" not in data:
         raise ValueError("cities.yaml must contain a 'cities' mapping at the root.")
     
+    conflict_defaults: Dict[str, str] = {}
+    if conflicts_yaml.exists():
+        with conflicts_yaml.open("r", encoding="utf-8") as f:
+            conflict_defaults = (yaml.safe_load(f) or {}).get("defaults") or {}
+
+    # Aliases of countries always win over equal city aliases, so they are
+    # left out of cities.json (city_alias_map.json still lists them)
+    claimed = (
+        claimed_aliases(generated_dir, ["region"])
+        if (generated_dir / "countries.json").exists() else {}
+    )
+    dropped: List[Tuple[str, Any]] = []
+
     cities_by_country = data["cities"]
     result = {}
     alias_map: Dict[str, Set[str]] = {}  # Use set to collect all candidates
@@ -79,10 +160,19 @@ def main() -> int:
             # Remove empty strings
             normalized_aliases.discard("")
             
+            kept, shadowed = split_claimed(sorted(normalized_aliases), claimed)
+            if not kept:
+                # Every alias is also the country's (Guatemala, Kuwait, ...):
+                # keep the key's own alias rather than ship an entry without
+                # any (it still never wins against the country)
+                own = compact_alias(city_key)
+                kept = [own]
+                shadowed = [(alias, owner) for alias, owner in shadowed if alias != own]
+            dropped.extend(shadowed)
             result[country_code][city_key] = {
                 "name_en": name_en,
                 "name_zh": name_zh,
-                "aliases": sorted(normalized_aliases)
+                "aliases": kept
             }
             
             # Build reverse alias map (alias -> set of country_code.city_key)
@@ -111,22 +201,33 @@ def main() -> int:
     
     # Count and report conflicts (aliases with multiple candidates)
     conflicts = {k: v for k, v in alias_map_output.items() if len(v) > 1}
+
+    # Write city_conflicts.json (runtime disambiguation table)
+    table = build_conflict_table(result, conflict_defaults)
+    conflicts_path = generated_dir / "city_conflicts.json"
+    conflicts_path.write_text(
+        json.dumps(table, ensure_ascii=False, indent=2) + "\n",
+        encoding="utf-8",
+    )
     
     # Update version.json (merges with existing data)
     update_version_file(
         generated_dir,
         VERSION,
         {
-            "cities.json": {"countries": len(result), "cities": total_cities},
-            "city_alias_map.json": {"aliases": len(alias_map_output), "conflicts": len(conflicts)}
+            "cities.json": {"countries": len(result), "cities": total_cities, "shadowed": len(dropped)},
+            "city_alias_map.json": {"aliases": len(alias_map_output), "conflicts": len(conflicts)},
+            "city_conflicts.json": {"format": CONFLICTS_FORMAT, "aliases": len(table["aliases"])},
         }
     )
     version_path = generated_dir / "version.json"
     
     print(f"✓ Generated {cities_path}")
     print(f"✓ Generated {alias_map_path}")
+    print(f"✓ Generated {conflicts_path}")
     print(f"✓ Generated {version_path}")
     print(f"  {len(result)} countries, {total_cities} cities, {len(alias_map_output)} aliases")
+    print_dropped(dropped, "cities.json")
     
     if conflicts:
         print(f"⚠ {len(conflicts)} alias conflicts detected:")
@@ -136,6 +237,12 @@ def main() -> int:
             print(f"    '{alias}' -> {refs}")
         if len(conflicts) > 10:
             print(f"    ... and {len(conflicts) - 10} more conflicts")
+    for alias, entry in table["aliases"].items():
+        print(f"    '{alias}': default {'.'.join(entry['default'])}, by country "
+              + ", ".join(f"{cc} -> {'.'.join(ref)}" for cc, ref in entry["context"].items()))
+    
+    # Recompile the universal matcher (cities are one of its sources)
+    write_matcher(generated_dir)
     
     return 0
 
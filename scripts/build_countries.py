@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
+import argparse
 import json
+import os
 import re
 import sys
 from pathlib import Path
 from typing import Dict, List, Optional
-from urllib.error import HTTPError, URLError
-from urllib.request import urlopen
 
 from utils import compact_alias, normalize_spaces
+from build_matcher import write_matcher
+from source_cache import Source, fetch_sources
 from version_manager import update_version_file
 
 
@@ -28,30 +30,17 @@ ISO3166_URLS = [
     "master/all/all.json"
 ]
 
-# Version for generated files
-VERSION = "1.0.0"
+SOURCES = [
+    Source("cldr_en", CLDR_EN_URLS),
+    Source("cldr_zh", CLDR_ZH_URLS),
+    Source("iso3166", ISO3166_URLS),
+]
 
+# Set to "1" to build from the source snapshots without network access
+OFFLINE_ENV = "NNS_OFFLINE"
 
-def fetch_json(urls: List[str]) -> dict:
-    """Fetch JSON from a list of URLs, trying each until one succeeds.
-    
-    Args:
-        urls: List of URLs to try
-        
-    Returns:
-        Parsed JSON data as dict
-        
-    Raises:
-        RuntimeError: If all URLs fail to fetch
-    """
-    last_error = None
-    for url in urls:
-        try:
-            with urlopen(url, timeout=30) as resp:
-                return json.loads(resp.read().decode("utf-8"))
-        except (URLError, HTTPError, json.JSONDecodeError, TimeoutError) as exc:
-            last_error = exc
-    raise RuntimeError(f"Failed to fetch JSON from: {urls}") from last_error
+# Version for generated files
+VERSION = "1.0.0"
 
 
 def flag_emoji(cc: str) -> str:
@@ -110,17 +99,50 @@ def merge_aliases(base: List[str], extra: List[str]) -> List[str]:
     return sorted(merged)
 
 
-def main() -> int:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build countries.json from CLDR and ISO-3166 data.")
+    parser.add_argument(
+        "--offline", action="store_true", default=os.environ.get(OFFLINE_ENV) == "1",
+        help=f"build from the source snapshots only (also set by {OFFLINE_ENV}=1)",
+    )
+    parser.add_argument(
+        "--snapshot-dir", type=Path,
+        help="source snapshot directory (default: dict/sources/snapshots)",
+    )
+    parser.add_argument(
+        "--source-url", action="append", default=[], metavar="NAME=URL",
+        help="fetch a source from URL instead, e.g. a local mirror "
+             f"({', '.join(s.name for s in SOURCES)})",
+    )
+    return parser.parse_args(argv)
+
+
+def source_list(overrides: List[str]) -> List[Source]:
+    urls = {s.name: s.urls for s in SOURCES}
+    for item in overrides:
+        name, sep, url = item.partition("=")
+        if not sep or name not in urls:
+            raise SystemExit(f"Invalid --source-url {item!r}: expected one of {', '.join(urls)}=URL")
+        urls[name] = [url]
+    return [Source(name, source_urls) for name, source_urls in urls.items()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
     root = Path(__file__).resolve().parents[1]
     sources_dir = root / "dict" / "sources"
     generated_dir = root / "dict" / "generated"
     patch_path = sources_dir / "countries_patch.yaml"
+    snapshot_dir = args.snapshot_dir or sources_dir / "snapshots"
 
     generated_dir.mkdir(parents=True, exist_ok=True)
 
-    cldr_en = fetch_json(CLDR_EN_URLS)
-    cldr_zh = fetch_json(CLDR_ZH_URLS)
-    iso_list = fetch_json(ISO3166_URLS)
+    fetched = fetch_sources(source_list(args.source_url), snapshot_dir, offline=args.offline)
+    for item in fetched.values():
+        print(f"  source {item.summary()}")
+    cldr_en = fetched["cldr_en"].data
+    cldr_zh = fetched["cldr_zh"].data
+    iso_list = fetched["iso3166"].data
 
     en_territories = cldr_en["main"]["en"]["localeDisplayNames"]["territories"]
     zh_territories = cldr_zh["main"]["zh"]["localeDisplayNames"]["territories"]
@@ -211,6 +233,9 @@ def main() -> int:
     print(f"✓ Generated {version_path}")
     print(f"  {len(result)} countries, {len(alias_map)} aliases")
     
+    # Recompile the universal matcher (countries are one of its sources)
+    write_matcher(generated_dir)
+    
     # Report code_aliases
     if code_aliases:
         print(f"  {len(code_aliases)} custom code aliases applied")
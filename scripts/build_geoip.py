@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Build geoip.bin: the offline IP geolocation index.
+
+Compiles a local IP-range CSV into sorted integer range arrays for IPv4 and
+IPv6 (see nns/geoip.py for the layout). Rows are either
+
+    start,end,country[,city]      first and last address of the range
+    network,country[,city]        CIDR block
+
+with an optional header row and "#" comments. Country codes not in
+countries.json are dropped. A city becomes the key of the cities.json city
+of that country with the same name or alias (case, accents and punctuation
+ignored); other cities are left out and the range locates the country only.
+Adjacent ranges with the same location are merged; overlapping ranges are
+an error.
+
+The CSV is not shipped (IP databases have their own licenses): download one,
+e.g. DB-IP "IP to City Lite" with its columns cut to start,end,country,city,
+and run
+
+    python scripts/build_geoip.py path/to/ranges.csv
+
+geoip.bin records the SHA-256 of cities.json and is ignored by the engine
+once cities.json changes; rebuild it then.
+"""
+import argparse
+import csv
+import hashlib
+import ipaddress
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.dictionaries import load_json  # noqa: E402
+from nns.geoip import GEOIP_FILE, GeoIPIndex, Location, Range, pack_geoip, source_hashes  # noqa: E402
+from version_manager import write_atomic  # noqa: E402
+
+
+# Version for generated files
+VERSION = "1.0.0"
+
+DEFAULT_CSV = Path("dict") / "sources" / "geoip.csv"
+
+
+def fold(name: str) -> str:
+    """Comparison key of a city name: no case, accents, spaces or punctuation."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(ch for ch in decomposed.casefold() if ch.isalnum())
+
+
+def city_keys(cities: Dict[str, Dict[str, dict]]) -> Dict[str, Dict[str, str]]:
+    """Per country: folded city name/alias -> cities.json key."""
+    keys: Dict[str, Dict[str, str]] = {}
+    for country_code, by_key in cities.items():
+        names = keys.setdefault(country_code.upper(), {})
+        for key, city in by_key.items():
+            for name in [key, city.get("name_en") or "", city.get("name_zh") or ""] + list(city.get("aliases") or []):
+                folded = fold(name)
+                if folded:
+                    names.setdefault(folded, key)
+    return keys
+
+
+def read_ranges(path: Path) -> Iterator[Tuple[int, int, int, str, str, int]]:
+    """Rows of the CSV as (version, start, end, country, city, line number)."""
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        for line_no, row in enumerate(csv.reader(f), 1):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            try:
+                if "/" in row[0]:
+                    network = ipaddress.ip_network(row[0], strict=False)
+                    first, last, rest = network[0], network[-1], row[1:]
+                else:
+                    first, last, rest = ipaddress.ip_address(row[0]), ipaddress.ip_address(row[1]), row[2:]
+            except (ValueError, IndexError):
+                if line_no == 1:
+                    continue  # header
+                raise ValueError(f"{path}:{line_no}: not an IP range: {','.join(row)}")
+            if first.version != last.version or int(first) > int(last) or not rest:
+                raise ValueError(f"{path}:{line_no}: invalid range {row[0]}")
+            yield first.version, int(first), int(last), rest[0].upper(), rest[1] if len(rest) > 1 else "", line_no
+
+
+def compile_ranges(
+    path: Path, countries: Dict[str, dict], cities: Dict[str, Dict[str, dict]]
+) -> Tuple[List[Range], List[Range], List[Location], Dict[str, int]]:
+    """Sorted, merged IPv4/IPv6 ranges with location ids, the locations and counters."""
+    known = {code.upper() for code in countries}
+    keys = city_keys(cities)
+    locations: Dict[Location, int] = {}
+    families: Dict[int, List[Tuple[int, int, int, int]]] = {4: [], 6: []}
+    counts = {"rows": 0, "unknown_country": 0, "cities": 0, "unmapped_cities": 0}
+
+    for version, start, end, country, city, line_no in read_ranges(path):
+        counts["rows"] += 1
+        if country not in known:
+            counts["unknown_country"] += 1
+            continue
+        city_key: Optional[str] = None
+        if city:
+            city_key = keys.get(country, {}).get(fold(city))
+            counts["cities" if city_key else "unmapped_cities"] += 1
+        location = (country, city_key)
+        location_id = locations.setdefault(location, len(locations))
+        families[version].append((start, end, location_id, line_no))
+
+    merged: Dict[int, List[Range]] = {}
+    for version, rows in families.items():
+        rows.sort()
+        out: List[Range] = []
+        previous_line = 0
+        for start, end, location_id, line_no in rows:
+            if out and start <= out[-1][1]:
+                raise ValueError(f"{path}:{line_no}: range overlaps the range of line {previous_line}")
+            if out and start == out[-1][1] + 1 and location_id == out[-1][2]:
+                out[-1] = (out[-1][0], end, location_id)
+            else:
+                out.append((start, end, location_id))
+            previous_line = line_no
+        merged[version] = out
+    return merged[4], merged[6], list(locations), counts
+
+
+def write_geoip(csv_path: Path, generated_dir: Path, version: str = VERSION) -> Path:
+    """Compile csv_path into generated_dir/geoip.bin.
+
+    Raises:
+        ValueError: If the CSV has malformed or overlapping ranges
+        RuntimeError: If the written file does not read back identical (it
+            is removed)
+    """
+    countries = load_json(generated_dir / "countries.json")
+    cities = load_json(generated_dir / "cities.json")
+    ipv4, ipv6, locations, counts = compile_ranges(csv_path, countries, cities)
+    meta = {
+        "version": version,
+        "sources": {
+            **source_hashes(generated_dir),
+            csv_path.name: hashlib.sha256(csv_path.read_bytes()).hexdigest(),
+        },
+        "locations": [list(location) for location in locations],
+    }
+    data = pack_geoip(ipv4, ipv6, meta)
+
+    geoip_path = generated_dir / GEOIP_FILE
+    write_atomic(geoip_path, data)
+    try:
+        with GeoIPIndex(geoip_path) as index:
+            columns = (
+                (index._v4_starts, 0, ipv4), (index._v4_ends, 1, ipv4), (index._v4_locations, 2, ipv4),
+                (index._v6_starts, 0, ipv6), (index._v6_ends, 1, ipv6), (index._v6_locations, 2, ipv6),
+            )
+            if any(len(column) != len(ranges) or any(column[i] != r[field] for i, r in enumerate(ranges))
+                   for column, field, ranges in columns):
+                raise RuntimeError(f"{GEOIP_FILE}: ranges do not read back identical")
+            del columns
+    except BaseException:
+        geoip_path.unlink()
+        raise
+
+    print(f"✓ Generated {geoip_path}")
+    print(
+        f"  {len(ipv4):,} IPv4 and {len(ipv6):,} IPv6 ranges from {counts['rows']:,} rows, "
+        f"{len(locations):,} locations, {len(data):,} bytes"
+    )
+    if counts["unknown_country"]:
+        print(f"  {counts['unknown_country']:,} rows with a country not in countries.json left out")
+    if counts["cities"] or counts["unmapped_cities"]:
+        print(
+            f"  {counts['cities']:,} rows located to a cities.json city, "
+            f"{counts['unmapped_cities']:,} to their country only (city not in cities.json)"
+        )
+    return geoip_path
+
+
+def main() -> int:
+    root = Path(__file__).resolve().parents[1]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("csv", nargs="?", type=Path, default=root / DEFAULT_CSV,
+                        help=f"IP-range CSV (default: {DEFAULT_CSV})")
+    parser.add_argument("--dict-dir", type=Path, default=root / "dict" / "generated",
+                        help="Directory of the generated dictionaries")
+    args = parser.parse_args()
+    if not args.csv.exists():
+        print(f"Error: {args.csv} not found (the IP-range CSV is not shipped, see --help)", file=sys.stderr)
+        return 1
+    try:
+        write_geoip(args.csv, args.dict_dir)
+    except ValueError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,11 +2,19 @@
 """
 Build keywords_status.json and keywords_ad.json from YAML source files.
 Generates pattern lists for filtering status lines and advertising content.
+
+Pattern files are validated at build time and get a "compiled" section: one
+combined alternation (each pattern is a capturing group, so callers can tell
+which rule fired) plus a literal prefilter list.
 """
 import json
 import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.keywords import compile_keywords  # noqa: E402
+
 
 def build_keyword_file(yaml_path: Path, json_path: Path) -> int:
     """Build a single keyword JSON file from YAML source."""
@@ -31,6 +39,13 @@ def build_keyword_file(yaml_path: Path, json_path: Path) -> int:
     # Handle simple patterns list
     if "patterns" in data and isinstance(data["patterns"], list):
         data["patterns"] = sorted(set(p for p in data["patterns"] if p))
+        
+        # Validate and merge patterns
+        try:
+            data["compiled"] = compile_keywords(data["patterns"])
+        except ValueError as exc:
+            print(f"Error: {yaml_path.name}: {exc}", file=sys.stderr)
+            return 1
     
     # Write to JSON
     json_path.write_text(
@@ -39,6 +54,13 @@ def build_keyword_file(yaml_path: Path, json_path: Path) -> int:
     )
     
     print(f"✓ Generated {json_path}")
+    compiled = data.get("compiled")
+    if compiled:
+        prefilter = compiled["prefilter"]
+        print(
+            f"  {len(compiled['rules'])} patterns, "
+            f"{len(prefilter) if prefilter is not None else 'no'} prefilter literals"
+        )
     return 0
 
 
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Build the pruned match tables: line_alias_map.json, tag_alias_map.json and
+tag_index.json.
+
+lines.json and tags.json list every declared alias. Their match tables
+leave out the aliases that normalize to an alias of a higher-priority
+category (region > city > line), which can never win (see
+alias_analysis.py), and tag_index.json is the automaton that finds the
+remaining tag aliases inside CJK tokens (nns/tags.py).
+
+build_lines.py and build_tags.py call write_match_tables() after writing
+their dictionaries. The build driver (build.py) sets NNS_DEFER_MATCH_TABLES=1
+for them and runs this step once after countries, cities, lines and tags,
+so those builders never wait for each other.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.dictionaries import load_json  # noqa: E402
+from nns.tags import TAG_INDEX_FILE, TAG_INDEX_FORMAT, TagIndex, source_hashes  # noqa: E402
+from alias_analysis import Owner, claimed_aliases, print_dropped, split_claimed  # noqa: E402
+from build_matcher import write_matcher  # noqa: E402
+from version_manager import current_version, update_version_file, write_atomic  # noqa: E402
+
+
+# Environment variable that makes write_match_tables a no-op (set by build.py)
+DEFER_ENV = "NNS_DEFER_MATCH_TABLES"
+
+MATCH_TABLE_SOURCES = ["countries.json", "city_alias_map.json", "lines.json", "tags.json"]
+
+
+def declared_order(yaml_path: Path, key: str, entries: Dict[str, Any]) -> List[str]:
+    """Entry names in source YAML order (lines.json and tags.json are sorted).
+
+    An alias declared by two entries goes to the later one, so the order
+    decides the owner.
+    """
+    import yaml  # type: ignore
+
+    with yaml_path.open("r", encoding="utf-8") as f:
+        declared = [name for name in (yaml.safe_load(f) or {}).get(key) or {} if name in entries]
+    return declared + [name for name in entries if name not in declared]
+
+
+def match_table(
+    entries: Dict[str, Any], order: List[str], claimed: Dict[str, Owner]
+) -> Tuple[Dict[str, str], List[Tuple[str, Owner]]]:
+    """Alias -> entry map without claimed aliases, and the dropped aliases."""
+    alias_map: Dict[str, str] = {}
+    dropped: List[Tuple[str, Owner]] = []
+    for name in order:
+        kept, shadowed = split_claimed(entries[name]["aliases"], claimed)
+        dropped.extend(shadowed)
+        for alias in kept:
+            alias_map[alias] = name
+    return alias_map, dropped
+
+
+def write_match_tables(
+    generated_dir: Path, sources_dir: Path, version: Optional[str] = None
+) -> bool:
+    """Write line_alias_map.json, tag_alias_map.json and tag_index.json.
+
+    Args:
+        generated_dir: Directory containing the generated dictionaries
+        sources_dir: Directory of lines.yaml and tags.yaml (declaration order)
+        version: Dictionary version recorded in tag_index.json (defaults
+            to version.json's)
+
+    Returns:
+        False if a source file is missing or the build is deferred
+    """
+    if os.environ.get(DEFER_ENV) == "1":
+        print("  · match tables deferred to the build driver")
+        return False
+
+    missing = [name for name in MATCH_TABLE_SOURCES if not (generated_dir / name).exists()]
+    if missing:
+        print(f"  ⚠ Skipped match tables: missing {', '.join(missing)}")
+        return False
+
+    version = version or current_version(generated_dir)
+
+    # Lines first: their match table is part of what tags lose to
+    written = {}
+    for name, key, categories in (
+        ("line", "lines", ["region", "city"]),
+        ("tag", "tags", ["region", "city", "line"]),
+    ):
+        entries = load_json(generated_dir / f"{key}.json")
+        order = declared_order(sources_dir / f"{key}.yaml", key, entries)
+        alias_map, dropped = match_table(entries, order, claimed_aliases(generated_dir, categories))
+        alias_map_path = generated_dir / f"{name}_alias_map.json"
+        write_atomic(
+            alias_map_path,
+            json.dumps(alias_map, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
+        )
+        written[name] = (alias_map, dropped)
+        print(f"✓ Generated {alias_map_path}")
+        print(f"  {len(alias_map)} aliases")
+        print_dropped(dropped, alias_map_path.name)
+
+    # tag_index.json: contained-alias automaton for CJK tokens
+    tag_index = TagIndex(written["tag"][0])
+    index_path = generated_dir / TAG_INDEX_FILE
+    write_atomic(
+        index_path,
+        json.dumps(
+            {"version": version, "sources": source_hashes(generated_dir), **tag_index.to_artifact()},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ) + "\n",
+    )
+    print(f"✓ Generated {index_path}")
+
+    metadata: Dict[str, Dict[str, Any]] = {
+        f"{name}_alias_map.json": {"aliases": len(alias_map), "shadowed": len(dropped)}
+        for name, (alias_map, dropped) in written.items()
+    }
+    metadata[TAG_INDEX_FILE] = {
+        "format": TAG_INDEX_FORMAT,
+        "aliases": len(tag_index.automaton),
+        "states": tag_index.automaton.state_count,
+    }
+    update_version_file(generated_dir, version, metadata)
+    return True
+
+
+def main() -> int:
+    root = Path(__file__).resolve().parents[1]
+    generated_dir = root / "dict" / "generated"
+    if not write_match_tables(generated_dir, root / "dict" / "sources"):
+        return 1
+    # Recompile the universal matcher (the line and tag maps are among its sources)
+    write_matcher(generated_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
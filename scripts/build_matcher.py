@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Build matcher.json: the precompiled universal alias index.
+
+Aliases from countries, cities, lines and tags are normalized, sorted by
+length and category priority, deduplicated and compiled into an
+Aho-Corasick automaton once at build time, so runtimes can load the index
+directly instead of rebuilding it on every start.
+
+Called by build_countries.py, build_cities.py, build_lines.py,
+build_tags.py and build_match_tables.py after they write their outputs; can
+also be run on its own.
+The build driver (build.py) sets NNS_DEFER_MATCHER=1 for those builders and
+compiles the matcher once after all of them have finished.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.dictionaries import Dictionaries, load_json  # noqa: E402
+from nns.matcher import (  # noqa: E402
+    MATCHER_FILE,
+    MATCHER_FORMAT,
+    MATCHER_SOURCES,
+    UniversalMatcher,
+    source_hashes,
+)
+from version_manager import current_version, update_version_file, write_atomic  # noqa: E402
+
+
+# Environment variable that makes write_matcher a no-op (set by build.py)
+DEFER_ENV = "NNS_DEFER_MATCHER"
+
+
+def write_matcher(generated_dir: Path, version: Optional[str] = None) -> Optional[Path]:
+    """Compile the dictionaries in generated_dir into matcher.json.
+
+    Args:
+        generated_dir: Directory containing the generated dictionaries
+        version: Dictionary version recorded in the artifact (defaults to
+            version.json's; the plugin ignores an artifact of another version)
+
+    Returns:
+        Path of the written artifact, or None if a source file is missing
+        or the build is deferred
+    """
+    if os.environ.get(DEFER_ENV) == "1":
+        print(f"  · {MATCHER_FILE} deferred to the build driver")
+        return None
+
+    missing = [name for name in MATCHER_SOURCES if not (generated_dir / name).exists()]
+    if missing:
+        print(f"  ⚠ Skipped {MATCHER_FILE}: missing {', '.join(missing)}")
+        return None
+
+    version = version or current_version(generated_dir)
+    dicts = Dictionaries(
+        countries=load_json(generated_dir / "countries.json"),
+        cities=load_json(generated_dir / "cities.json"),
+        line_alias_map=load_json(generated_dir / "line_alias_map.json"),
+        tag_alias_map=load_json(generated_dir / "tag_alias_map.json"),
+    )
+    matcher = UniversalMatcher.from_dictionaries(dicts)
+
+    sources = source_hashes(generated_dir)
+    artifact = {"version": version, "sources": sources}
+    artifact.update(matcher.to_artifact())
+
+    matcher_path = generated_dir / MATCHER_FILE
+    write_atomic(
+        matcher_path,
+        json.dumps(artifact, ensure_ascii=False, separators=(",", ":")) + "\n",
+    )
+
+    update_version_file(
+        generated_dir,
+        version,
+        {
+            MATCHER_FILE: {
+                "format": MATCHER_FORMAT,
+                "entries": len(matcher.entries),
+                "states": matcher.automaton.state_count,
+                "sources": sources,
+            }
+        }
+    )
+
+    print(f"✓ Generated {matcher_path}")
+    print(f"  {len(matcher.entries)} aliases, {matcher.automaton.state_count} automaton states")
+    return matcher_path
+
+
+def main() -> int:
+    root = Path(__file__).resolve().parents[1]
+    generated_dir = root / "dict" / "generated"
+    return 0 if write_matcher(generated_dir) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Build dictionaries.bin: the memory-mappable binary dictionary.
+
+Packs the entity tables, alias maps and keyword lists of dict/generated into
+one file (see nns/packed.py for the layout), then reopens it and checks that
+every entry reads back identical to the JSON files. Run after the JSON
+dictionaries change; the build driver (build.py) does this automatically.
+"""
+import sys
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.dictionaries import load_dictionaries  # noqa: E402
+from nns.packed import (  # noqa: E402
+    LIST_MAPS,
+    PACKED_FILE,
+    PACKED_FORMAT,
+    SCALAR_MAPS,
+    PackedDictionaries,
+    pack_dictionaries,
+    source_hashes,
+)
+from version_manager import update_version_file, write_atomic  # noqa: E402
+
+
+# Version for generated files
+VERSION = "1.0.0"
+
+
+def write_packed(generated_dir: Path, version: str = VERSION) -> Optional[Path]:
+    """Pack the dictionaries in generated_dir into dictionaries.bin.
+
+    Returns:
+        Path of the written artifact
+
+    Raises:
+        RuntimeError: If the written file does not read back identical (it
+            is removed)
+    """
+    dicts = load_dictionaries(generated_dir)
+    sources = source_hashes(generated_dir)
+    data = pack_dictionaries(dicts, {"version": version, "sources": sources})
+
+    packed_path = generated_dir / PACKED_FILE
+    write_atomic(packed_path, data)
+    try:
+        with PackedDictionaries(packed_path) as packed:
+            for name in SCALAR_MAPS + LIST_MAPS + ["countries", "lines", "tags"]:
+                if dict(getattr(packed, name)) != getattr(dicts, name):
+                    raise RuntimeError(f"{PACKED_FILE}: {name} does not read back identical")
+            if len(packed.cities) != sum(len(c) for c in dicts.cities.values()) or any(
+                packed.city(cc, key) != city
+                for cc, by_key in dicts.cities.items()
+                for key, city in by_key.items()
+            ):
+                raise RuntimeError(f"{PACKED_FILE}: cities do not read back identical")
+            strings = packed.string_count
+    except BaseException:
+        packed_path.unlink()
+        raise
+
+    update_version_file(
+        generated_dir,
+        version,
+        {
+            PACKED_FILE: {
+                "format": PACKED_FORMAT,
+                "bytes": len(data),
+                "strings": strings,
+                "sources": sources,
+            }
+        }
+    )
+
+    json_bytes = sum((generated_dir / name).stat().st_size for name in sources)
+    print(f"✓ Generated {packed_path}")
+    print(f"  {len(data):,} bytes ({json_bytes:,} bytes of JSON), {strings} interned strings")
+    return packed_path
+
+
+def main() -> int:
+    root = Path(__file__).resolve().parents[1]
+    generated_dir = root / "dict" / "generated"
+    return 0 if write_packed(generated_dir) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,12 +2,22 @@
 """
 Build tags.json from tags.yaml source file.
 Generates a normalized dictionary of tags and their aliases.
+tag_alias_map.json, the match table, and tag_index.json, the automaton that
+finds tag aliases contained in CJK tokens (nns/tags.py), are written by
+build_match_tables.py.
 """
 import json
 import sys
 from pathlib import Path
 
+from build_matcher import write_matcher
+from build_match_tables import write_match_tables
 from utils import compact_alias
+from version_manager import update_version_file
+
+
+# Version for generated files
+VERSION = "1.0.0"
 
 
 def main() -> int:
@@ -37,7 +47,6 @@ def main() -> int:
     
     tags = data["tags"]
     result = {}
-    alias_map = {}
     
     for tag_type, info in tags.items():
         if not isinstance(info, dict):
@@ -70,10 +79,6 @@ def main() -> int:
             "display_zh": display_zh,
             "aliases": sorted(normalized_aliases)
         }
-        
-        # Build reverse alias map
-        for alias in normalized_aliases:
-            alias_map[alias] = tag_type
     
     # Write tags.json
     generated_dir.mkdir(parents=True, exist_ok=True)
@@ -83,16 +88,23 @@ def main() -> int:
         encoding="utf-8",
     )
     
-    # Write tag_alias_map.json for quick lookups
-    alias_map_path = generated_dir / "tag_alias_map.json"
-    alias_map_path.write_text(
-        json.dumps(alias_map, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
-        encoding="utf-8",
+    # Update version.json (merges with existing data)
+    update_version_file(
+        generated_dir,
+        VERSION,
+        {
+            "tags.json": {"tags": len(result)}
+        }
     )
+    version_path = generated_dir / "version.json"
     
     print(f"✓ Generated {tags_path}")
-    print(f"✓ Generated {alias_map_path}")
-    print(f"  {len(result)} tag types, {len(alias_map)} aliases")
+    print(f"✓ Generated {version_path}")
+    print(f"  {len(result)} tag types")
+    
+    # Rebuild the match tables and the universal matcher (tags are one of their sources)
+    write_match_tables(generated_dir, sources_dir)
+    write_matcher(generated_dir)
     
     return 0
 
@@ -0,0 +1,86 @@
+#!/usr/bin/env node
+/**
+ * Run plugin/plugin.js outside GUI.for.SingBox and dump its parse/format output.
+ *
+ * Usage: node scripts/conformance.js <names.txt> [config.json]
+ *
+ * Each non-empty line of <names.txt> is parsed with parseNodeName and formatted
+ * with formatNodeName; one JSON object per line is written to stdout.
+ * Dictionaries are read from dict/generated. Used by scripts/conformance.py.
+ */
+const fs = require('fs')
+const path = require('path')
+const vm = require('vm')
+
+const ROOT = path.resolve(__dirname, '..')
+const GENERATED_DIR = path.join(ROOT, 'dict', 'generated')
+const PLUGIN_ID = 'nns'
+
+const [namesPath, configPath] = process.argv.slice(2)
+if (!namesPath) {
+    console.error('usage: node scripts/conformance.js <names.txt> [config.json]')
+    process.exit(2)
+}
+
+const userConfig = configPath ? fs.readFileSync(configPath, 'utf-8') : null
+
+// 将插件内的虚拟路径映射到仓库文件
+const resolvePath = (p) => {
+    const dictPrefix = `data/${PLUGIN_ID}/dict/`
+    if (p.startsWith(dictPrefix)) return path.join(GENERATED_DIR, p.slice(dictPrefix.length))
+    return null
+}
+
+const noop = () => { }
+const Plugins = {
+    FileExists: async (p) => {
+        if (p === `data/${PLUGIN_ID}/config.json`) return userConfig !== null
+        const real = resolvePath(p)
+        return real !== null && fs.existsSync(real)
+    },
+    ReadFile: async (p) => {
+        if (p === `data/${PLUGIN_ID}/config.json`) return userConfig
+        return fs.readFileSync(resolvePath(p), 'utf-8')
+    },
+    LogInfo: noop,
+    LogWarning: noop,
+    LogError: (msg) => console.error(msg),
+    message: { info: noop, success: noop, warn: noop, error: noop }
+}
+
+const context = vm.createContext({
+    Plugin: { id: PLUGIN_ID, name: 'nns', config: {} },
+    Plugins,
+    // stdout 只输出结果，插件日志转到 stderr
+    console: { log: console.error, warn: console.error, error: console.error }
+})
+
+const source = fs.readFileSync(path.join(ROOT, 'plugin', 'plugin.js'), 'utf-8')
+vm.runInContext(
+    `${source}\n;globalThis.__nns = { Configuration, ensureDictionaries, parseNodeName, formatNodeName }`,
+    context,
+    { filename: 'plugin.js' }
+)
+
+const main = async () => {
+    const { Configuration, ensureDictionaries, parseNodeName, formatNodeName } = context.__nns
+    // 与 GUI 一致：Plugin.config 为配置项的默认值
+    context.Plugin.config = Object.fromEntries(
+        Object.entries(Configuration).map(([key, item]) => [key, item.default])
+    )
+    await ensureDictionaries()
+
+    const names = fs.readFileSync(namesPath, 'utf-8').split('\n').filter(Boolean)
+    const out = []
+    for (const name of names) {
+        const parsed = parseNodeName(name)
+        const formatted = await formatNodeName({ ...parsed, path: [...parsed.path], tags: [...parsed.tags] })
+        out.push(JSON.stringify({ parsed, formatted }))
+    }
+    process.stdout.write(out.join('\n') + '\n')
+}
+
+main().catch((error) => {
+    console.error(error)
+    process.exit(1)
+})
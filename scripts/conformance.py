@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Check that the Python engine (nns/) and the JS engine (plugin/plugin.js)
+produce byte-identical parse and format results on a shared corpus. Names
+are formatted both by format_node_name and by a compiled formatter; a
+name where the two disagree is reported as a difference.
+
+Usage:
+    python scripts/conformance.py [names.txt] [--config config.json]
+
+Requires Node.js. Exits with 1 if any name differs.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from nns import Engine, merge_config  # noqa: E402
+from nns.formatter import format_number  # noqa: E402
+
+
+DEFAULT_CORPUS = ROOT / "spec" / "corpus" / "names.txt"
+
+
+def to_js_json(value: Any) -> str:
+    """Serialize like JSON.stringify (JS number formatting, no spaces)."""
+    if isinstance(value, bool) or value is None:
+        return json.dumps(value)
+    if isinstance(value, (int, float)):
+        return format_number(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return "[" + ",".join(to_js_json(v) for v in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ",".join(
+            f"{json.dumps(k, ensure_ascii=False)}:{to_js_json(v)}" for k, v in value.items()
+        ) + "}"
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def run_js(names_path: Path, config_path: Path = None) -> List[str]:
+    cmd = ["node", str(ROOT / "scripts" / "conformance.js"), str(names_path)]
+    if config_path:
+        cmd.append(str(config_path))
+    proc = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", check=True)
+    return proc.stdout.splitlines()
+
+
+def run_python(names_path: Path, config_path: Path = None) -> List[str]:
+    user_config = None
+    if config_path:
+        user_config = json.loads(config_path.read_text(encoding="utf-8"))
+    engine = Engine.load()
+    config = merge_config(user_config)
+    compiled = engine.compile_formatter(config)
+
+    out = []
+    names = [n for n in names_path.read_text(encoding="utf-8").split("\n") if n]
+    for name in names:
+        parsed = engine.parse(name)
+        formatted = engine.format(parsed, config)
+        result = {"parsed": parsed.to_dict(), "formatted": formatted}
+        if compiled(parsed) != formatted:
+            result["compiled"] = compiled(parsed)
+        out.append(to_js_json(result))
+    return out
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("names", nargs="?", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--config", type=Path, help="user config.json to apply")
+    args = parser.parse_args()
+
+    js_lines = run_js(args.names, args.config)
+    py_lines = run_python(args.names, args.config)
+
+    if len(js_lines) != len(py_lines):
+        print(f"✗ Line count differs: js={len(js_lines)} python={len(py_lines)}")
+        return 1
+
+    diffs = [(js, py) for js, py in zip(js_lines, py_lines) if js != py]
+    if diffs:
+        print(f"✗ {len(diffs)}/{len(js_lines)} names differ:")
+        for js, py in diffs[:10]:
+            print(f"    js: {js}")
+            print(f"    py: {py}")
+        if len(diffs) > 10:
+            print(f"    ... and {len(diffs) - 10} more")
+        return 1
+
+    print(f"✓ {len(js_lines)} names identical ({args.names})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Publish the generated dictionaries as a release with delta patches.
+
+Writes to a release store (default: dist/releases):
+
+    releases.json                   published versions and the latest one
+    <version>/manifest.json         SHA-256, size, gzip size and patches per file
+    <version>/<file>.gz             precompressed file
+    <version>/patches/<file>.<sha>.patch
+                                    delta from an earlier release's file,
+                                    <sha> being a prefix of its SHA-256
+
+Patches are made from each of the previous --keep releases, for every file
+whose content changed, and kept only when smaller than the compressed file.
+Clients apply them with ``python -m nns update`` (nns/update.py), which
+fetches just the files that differ from the local copy.
+
+A --version newer than dict/generated/version.json is written into it
+before the files are hashed, so the released version.json (which clients
+compare versions against) names the release. matcher.json and
+tag_index.json, which embed that version, are rebuilt with it: the plugin
+ignores a compiled index of another version.
+
+Usage:
+    python scripts/release.py [--out DIR] [--version VERSION] [--keep N] [--force]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from nns.delta import make_patch  # noqa: E402
+from nns.update import (  # noqa: E402
+    MANIFEST_FILE,
+    RELEASE_FILES,
+    RELEASE_FORMAT,
+    RELEASES_FILE,
+    verify_dictionaries,
+)
+from build import VERSIONED_ARTIFACTS, build  # noqa: E402
+from version_manager import gzip_bytes, update_version_file, version_key, write_atomic  # noqa: E402
+
+
+ROOT = Path(__file__).resolve().parents[1]
+GENERATED_DIR = ROOT / "dict" / "generated"
+DEFAULT_OUT = ROOT / "dist" / "releases"
+
+# Earlier releases to make patches from
+DEFAULT_KEEP = 5
+
+
+def load_releases(out: Path) -> Dict[str, Any]:
+    try:
+        return json.loads((out / RELEASES_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"format": RELEASE_FORMAT, "latest": None, "versions": []}
+
+
+def load_release_file(out: Path, version: str, manifest: Dict[str, Any], name: str) -> bytes:
+    return gzip.decompress((out / version / manifest["files"][name]["path"]).read_bytes())
+
+
+def stamp_version(version: str) -> None:
+    """Record the release version in dict/generated/version.json.
+
+    The artifacts that embed the version are rebuilt for it (they are
+    already up to date when version.json names the release).
+
+    Raises:
+        RuntimeError: If version.json names a newer version, or rebuilding
+            the artifacts failed
+    """
+    current = json.loads((GENERATED_DIR / "version.json").read_text(encoding="utf-8"))["version"]
+    if version_key(version) < version_key(current):
+        raise RuntimeError(f"Version {version} is not newer than version.json ({current})")
+    if version != current:
+        update_version_file(GENERATED_DIR, version, {}, merge=True)
+    code, report = build(VERSIONED_ARTIFACTS)
+    failed = [f"{name} ({reason})" for name, status, reason in report if status == "failed"]
+    if code != 0:
+        raise RuntimeError(f"Could not rebuild for version {version}: {', '.join(failed)}")
+
+
+def publish(
+    out: Path, version: str, keep: int = DEFAULT_KEEP, force: bool = False
+) -> Tuple[Dict[str, Any], bool]:
+    """Write a release of the generated dictionaries to a release store.
+
+    Returns:
+        The release manifest, and whether it was written (False if the
+        version was already published with the same content)
+
+    Raises:
+        RuntimeError: If the dictionaries do not match their version.json
+            records, version.json names a newer version, or the version was
+            already published with different content (without force)
+    """
+    stamp_version(version)
+    problems = verify_dictionaries(GENERATED_DIR)
+    if problems:
+        raise RuntimeError(
+            "Generated files do not match version.json (run scripts/build.py): "
+            + ", ".join(problems)
+        )
+
+    contents = {name: (GENERATED_DIR / name).read_bytes() for name in RELEASE_FILES}
+    hashes = {name: hashlib.sha256(data).hexdigest() for name, data in contents.items()}
+
+    releases = load_releases(out)
+    release_dir = out / version
+    if version in releases["versions"]:
+        manifest = json.loads((release_dir / MANIFEST_FILE).read_text(encoding="utf-8"))
+        if {name: entry["sha256"] for name, entry in manifest["files"].items()} == hashes:
+            return manifest, False
+        if not force:
+            raise RuntimeError(f"Version {version} was already published with different content")
+        shutil.rmtree(release_dir)
+        releases["versions"].remove(version)
+
+    previous = sorted(
+        (v for v in releases["versions"] if version_key(v) < version_key(version)),
+        key=version_key,
+    )[-keep:] if keep > 0 else []
+    old_manifests = {
+        v: json.loads((out / v / MANIFEST_FILE).read_text(encoding="utf-8")) for v in previous
+    }
+
+    (release_dir / "patches").mkdir(parents=True, exist_ok=True)
+    files: Dict[str, Any] = {}
+    for name, data in contents.items():
+        compressed = gzip_bytes(data)
+        (release_dir / f"{name}.gz").write_bytes(compressed)
+        entry: Dict[str, Any] = {
+            "sha256": hashes[name],
+            "size": len(data),
+            "compressed_size": len(compressed),
+            "path": f"{name}.gz",
+            "patches": {},
+        }
+        # Newest first, so a content shared by several releases is diffed once
+        for old_version in reversed(previous):
+            old_entry = old_manifests[old_version]["files"].get(name)
+            if not old_entry or old_entry["sha256"] in (hashes[name], *entry["patches"]):
+                continue
+            patch = make_patch(load_release_file(out, old_version, old_manifests[old_version], name), data)
+            if len(patch) >= len(compressed):
+                continue
+            path = f"patches/{name}.{old_entry['sha256'][:16]}.patch"
+            (release_dir / path).write_bytes(patch)
+            entry["patches"][old_entry["sha256"]] = {
+                "from": old_version,
+                "path": path,
+                "size": len(patch),
+            }
+        files[name] = entry
+
+    manifest = {"format": RELEASE_FORMAT, "version": version, "files": files}
+    write_atomic(release_dir / MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+    releases["versions"] = sorted(releases["versions"] + [version], key=version_key)
+    releases["latest"] = releases["versions"][-1]
+    write_atomic(out / RELEASES_FILE, json.dumps(releases, indent=2) + "\n")
+    return manifest, True
+
+
+def report(manifest: Dict[str, Any]) -> List[str]:
+    lines = []
+    for name, entry in manifest["files"].items():
+        patches = entry["patches"].values()
+        deltas = ", ".join(f"{p['from']}: {p['size']:,} B" for p in patches)
+        lines.append(
+            f"  {name:<26}{entry['size']:>9,} B, gz {entry['compressed_size']:>8,} B"
+            + (f"; patches from {deltas}" if deltas else "")
+        )
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Publish dict/generated as a release with delta patches")
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUT, help="Release store directory")
+    parser.add_argument("--version", help="Release version (default: version.json)")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP,
+                        help=f"Earlier releases to make patches from (default: {DEFAULT_KEEP})")
+    parser.add_argument("--force", action="store_true",
+                        help="Replace a published version whose content differs")
+    args = parser.parse_args()
+
+    version = args.version
+    if version is None:
+        version = json.loads((GENERATED_DIR / "version.json").read_text(encoding="utf-8"))["version"]
+    try:
+        manifest, written = publish(args.out, version, keep=args.keep, force=args.force)
+    except RuntimeError as exc:
+        print(f"✗ {exc}", file=sys.stderr)
+        return 1
+    if not written:
+        print(f"· {version} is already published in {args.out} with the same content")
+        return 0
+    print(f"✓ Published {version} to {args.out}")
+    for line in report(manifest):
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Local snapshot cache for the upstream sources of build_countries.py.
+
+Each source is stored as ``<name>.json`` in the snapshot directory, and
+index.json records the URL it came from with its ETag, Last-Modified and
+SHA-256. Online, all sources are requested concurrently with conditional
+headers (If-None-Match / If-Modified-Since); a 304 reuses the snapshot. If a
+source cannot be fetched, its snapshot is used instead. Offline, the
+snapshot is the only input and no request is made.
+"""
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from version_manager import locked, write_atomic
+
+
+INDEX_FILE = "index.json"
+
+DEFAULT_TIMEOUT = 30
+
+
+@dataclass
+class Source:
+    """An upstream JSON document, with fallback URLs tried in order."""
+    name: str
+    urls: List[str]
+
+
+@dataclass
+class FetchResult:
+    """Outcome of loading one source."""
+    name: str
+    data: Any
+    status: str
+    url: Optional[str] = None
+
+    def summary(self) -> str:
+        return f"{self.name}: {self.status}" + (f" ({self.url})" if self.url else "")
+
+
+def load_index(snapshot_dir: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        index = json.loads((snapshot_dir / INDEX_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return index if isinstance(index, dict) else {}
+
+
+def _read_snapshot(snapshot_dir: Path, name: str) -> Optional[bytes]:
+    try:
+        return (snapshot_dir / f"{name}.json").read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def _fetch_one(
+    source: Source,
+    entry: Dict[str, Any],
+    snapshot: Optional[bytes],
+    timeout: float,
+) -> Tuple[str, Optional[bytes], Optional[Dict[str, Any]], Optional[str], Optional[Exception]]:
+    """Request a source; returns (status, body, new index entry, url, error)."""
+    last_error: Optional[Exception] = None
+    for url in source.urls:
+        headers = {"User-Agent": "nns-build"}
+        if snapshot is not None and entry.get("url") == url:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            with urlopen(Request(url, headers=headers), timeout=timeout) as resp:
+                body = resp.read()
+                json.loads(body.decode("utf-8"))
+                new_entry = {
+                    "url": url,
+                    "etag": resp.headers.get("ETag"),
+                    "last_modified": resp.headers.get("Last-Modified"),
+                    "sha256": hashlib.sha256(body).hexdigest(),
+                    "fetched": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                }
+                return "fetched", body, new_entry, url, None
+        except HTTPError as exc:
+            if exc.code == 304 and snapshot is not None:
+                return "unchanged", snapshot, None, url, None
+            last_error = exc
+        except (URLError, json.JSONDecodeError, UnicodeDecodeError, TimeoutError, OSError) as exc:
+            last_error = exc
+    return "failed", None, None, None, last_error
+
+
+def fetch_sources(
+    sources: List[Source],
+    snapshot_dir: Path,
+    offline: bool = False,
+    timeout: float = DEFAULT_TIMEOUT,
+) -> Dict[str, FetchResult]:
+    """Load every source, refreshing the snapshots when online.
+
+    Args:
+        sources: Sources to load
+        snapshot_dir: Directory holding the snapshots and index.json
+        offline: Use the snapshots only, without any network access
+        timeout: Per-request timeout in seconds
+
+    Returns:
+        Result per source name
+
+    Raises:
+        RuntimeError: If a source has neither a usable response nor a snapshot
+    """
+    index = load_index(snapshot_dir)
+    snapshots = {s.name: _read_snapshot(snapshot_dir, s.name) for s in sources}
+
+    if offline:
+        missing = [s.name for s in sources if snapshots[s.name] is None]
+        if missing:
+            raise RuntimeError(
+                f"Offline mode: no snapshot for {', '.join(missing)} in {snapshot_dir}. "
+                "Run build_countries.py once with network access (or with "
+                "--source-url NAME=file:///path/to/copy.json) to create it."
+            )
+        return {
+            s.name: FetchResult(s.name, json.loads(snapshots[s.name]), "offline snapshot")
+            for s in sources
+        }
+
+    with ThreadPoolExecutor(max_workers=len(sources) or 1) as pool:
+        futures = {
+            s.name: pool.submit(_fetch_one, s, index.get(s.name) or {}, snapshots[s.name], timeout)
+            for s in sources
+        }
+        outcomes = {name: future.result() for name, future in futures.items()}
+
+    results: Dict[str, FetchResult] = {}
+    updated: Dict[str, Dict[str, Any]] = {}
+    errors = []
+    for source in sources:
+        status, body, new_entry, url, error = outcomes[source.name]
+        if status == "failed":
+            snapshot = snapshots[source.name]
+            if snapshot is None:
+                errors.append(f"{source.name}: {error}")
+                continue
+            status, body = f"snapshot (fetch failed: {error})", snapshot
+        if new_entry is not None:
+            updated[source.name] = new_entry
+            if body != snapshots[source.name]:
+                snapshot_dir.mkdir(parents=True, exist_ok=True)
+                write_atomic(snapshot_dir / f"{source.name}.json", body.decode("utf-8"))
+            else:
+                status = "fetched, content unchanged"
+        results[source.name] = FetchResult(source.name, json.loads(body), status, url)
+
+    if updated:
+        index_path = snapshot_dir / INDEX_FILE
+        with locked(index_path):
+            index = load_index(snapshot_dir)
+            index.update(updated)
+            write_atomic(index_path, json.dumps(index, ensure_ascii=False, indent=2, sort_keys=True) + "\n")
+
+    if errors:
+        raise RuntimeError("Failed to fetch sources without a snapshot:\n  " + "\n  ".join(errors))
+    return results
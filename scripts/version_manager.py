@@ -2,16 +2,109 @@
 """
 Shared version management for NNS build scripts.
 Ensures version.json is properly merged across multiple script runs.
+
+Updates hold an exclusive lock on version.json.lock for the whole
+read-modify-write and replace the file atomically, so builders running in
+parallel never lose each other's metadata or leave a partial file behind.
 """
+import gzip
 import json
+import os
+import re
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, Tuple, Union
+
+
+# Dictionary version of a directory without version.json
+DEFAULT_VERSION = "1.0.0"
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+    import msvcrt
+
+
+def version_key(version: str) -> Tuple[int, ...]:
+    """Sort key of a dotted version ("1.10.0" > "1.9.0")."""
+    return tuple(int(part) for part in re.findall(r"\d+", str(version)))
+
+
+def current_version(generated_dir: Path) -> str:
+    """Dictionary version named by version.json (stamped by release.py).
+
+    Artifacts that embed the version (matcher.json, tag_index.json) take it
+    from here, so a rebuild never writes back an older one.
+    """
+    try:
+        with (generated_dir / "version.json").open("r", encoding="utf-8") as f:
+            return json.load(f).get("version") or DEFAULT_VERSION
+    except (FileNotFoundError, json.JSONDecodeError):
+        return DEFAULT_VERSION
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    """Deterministic gzip (no timestamp), as published for downloads."""
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+@contextmanager
+def locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive inter-process lock associated with a file.
+
+    Args:
+        path: File to protect; the lock lives in ``<path>.lock``
+    """
+    lock_path = path.with_name(path.name + ".lock")
+    with open(lock_path, "a+b") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_atomic(path: Path, text: Union[str, bytes]) -> None:
+    """Write a text (or binary) file via a temporary file and rename.
+
+    Readers see either the old or the new content, never a partial file.
+    """
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        if isinstance(text, bytes):
+            f = os.fdopen(fd, "wb")
+        else:
+            f = os.fdopen(fd, "w", encoding="utf-8", newline="\n")
+        with f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600; keep the usual permissions
+        os.chmod(tmp_name, path.stat().st_mode & 0o777 if path.exists() else 0o644)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
 
 
 def update_version_file(
     generated_dir: Path,
     version: str,
-    file_metadata: Dict[str, Dict[str, Any]]
+    file_metadata: Dict[str, Dict[str, Any]],
+    merge: bool = False,
 ) -> None:
     """Update version.json with metadata from current script.
     
@@ -21,6 +114,8 @@ def update_version_file(
         generated_dir: Directory where version.json is stored
         version: Version string (e.g., "1.0.0")
         file_metadata: Dictionary mapping filenames to their metadata
+        merge: Merge the keys into each file's existing metadata instead of
+            replacing it
         
     Example:
         update_version_file(
@@ -33,7 +128,16 @@ def update_version_file(
         )
     """
     version_path = generated_dir / "version.json"
-    
+    with locked(version_path):
+        _update_version_data(version_path, version, file_metadata, merge)
+
+
+def _update_version_data(
+    version_path: Path,
+    version: str,
+    file_metadata: Dict[str, Dict[str, Any]],
+    merge: bool,
+) -> None:
     # Load existing version data if present
     if version_path.exists():
         try:
@@ -44,18 +148,26 @@ def update_version_file(
     else:
         version_data = {"version": version, "files": {}}
     
-    # Update version if newer (simple string comparison for semver)
-    if version > version_data.get("version", "0.0.0"):
+    # Update version if newer
+    if version_key(version) > version_key(version_data.get("version", "0.0.0")):
         version_data["version"] = version
     
     # Merge file metadata
     if "files" not in version_data:
         version_data["files"] = {}
     
-    version_data["files"].update(file_metadata)
+    if merge:
+        for file_name, metadata in file_metadata.items():
+            existing = version_data["files"].get(file_name)
+            if isinstance(existing, dict):
+                version_data["files"][file_name] = {**existing, **metadata}
+            else:
+                version_data["files"][file_name] = metadata
+    else:
+        version_data["files"].update(file_metadata)
     
     # Write back
-    version_path.write_text(
+    write_atomic(
+        version_path,
         json.dumps(version_data, ensure_ascii=False, indent=2, sort_keys=True) + "\n",
-        encoding="utf-8",
     )
@@ -0,0 +1,87 @@
+"""ResultCache stores shared by several processes (nns batch workers)."""
+import sqlite3
+
+import pytest
+
+from nns import Engine, ResultCache, merge_config
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return Engine.load()
+
+
+def test_two_caches_on_one_file(engine, tmp_path):
+    path = tmp_path / "cache.db"
+    config = merge_config()
+    first = ResultCache(engine, config, path=path, disk_entries=1_000)
+    second = ResultCache(engine, config, path=path, disk_entries=1_000)
+    names = [f"香港 {i:03d}" for i in range(300)]
+
+    # Both write new rows and touch each other's rows, flushing in turn
+    for i, name in enumerate(names):
+        cache = first if i % 2 else second
+        cache.put(name, engine.parse(name), engine.rename(name))
+        if i % 50 == 49:
+            first.flush()
+            second.flush()
+    first.flush()
+    second.flush()
+    for name in names[::3]:
+        assert second.get(name) is not None or first.get(name) is not None
+    first.flush()
+    second.flush()
+    second.put(names[0], engine.parse(names[0]), engine.rename(names[0]))
+    second.flush()
+
+    rows = sqlite3.connect(str(path)).execute("SELECT COUNT(*), COUNT(DISTINCT name) FROM results").fetchone()
+    assert rows == (300, 300)
+    first.close()
+    second.close()
+
+
+def test_eviction_counts_rows_of_every_process(engine, tmp_path):
+    path = tmp_path / "cache.db"
+    config = merge_config()
+    first = ResultCache(engine, config, path=path, disk_entries=100)
+    second = ResultCache(engine, config, path=path, disk_entries=100)
+    for i in range(80):
+        name = f"日本 {i:03d}"
+        first.put(name, engine.parse(name), engine.rename(name))
+    first.flush()
+    for i in range(80):
+        name = f"美国 {i:03d}"
+        second.put(name, engine.parse(name), engine.rename(name))
+    second.flush()
+
+    assert len(second) == 100
+    # The least recently used rows (the first process's) went first
+    db = sqlite3.connect(str(path))
+    assert db.execute("SELECT COUNT(*) FROM results WHERE name LIKE '美国%'").fetchone()[0] == 80
+    first.close()
+    second.close()
+
+
+def test_version_change_keeps_namespace_ids(engine, tmp_path, monkeypatch):
+    path = tmp_path / "cache.db"
+    config = merge_config()
+    old = ResultCache(engine, config, path=path)
+    old.put("日本 01", engine.parse("日本 01"), "stale")
+    old.flush()
+
+    # Dictionaries updated on disk while the old process keeps running
+    import nns.cache
+    hashes = nns.cache.dictionary_hashes(engine.dicts.source_dir)
+    monkeypatch.setattr(nns.cache, "dictionary_hashes", lambda _: {**hashes, "version.json": "new"})
+    new = ResultCache(engine, config, path=path)
+    assert new.stats.invalidations == 1 and len(new) == 0
+    assert new._ns_id != old._ns_id
+
+    # Late writes of the old process never show up in the new namespace
+    old.put("美国 01", engine.parse("美国 01"), "stale")
+    old.flush()
+    assert new.get("美国 01") is None
+    db = sqlite3.connect(str(path))
+    assert len(new) == db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 1
+    old.close()
+    new.close()
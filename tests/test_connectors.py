@@ -0,0 +1,36 @@
+"""Connector segmentation (segment_connectors, SPEC v2 §7)."""
+import pytest
+
+from nns import Engine
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return Engine.load(segment_connectors=True)
+
+
+@pytest.mark.parametrize("name, region, path, exit", [
+    ("加拿大 经由 香港 落地 美国", "CA", ["HK"], "US"),
+    ("英国 -> 香港 -> 日本 -> 美国", "GB", ["HK", "JP"], "US"),
+    ("香港 落地 美国", "HK", [], "US"),
+    # ISO codes joined by arrows: no alias may span a connector ("sg→hk" is not GH)
+    ("SG→HK", "SG", [], "HK"),
+    ("HK->SG->US", "HK", ["SG"], "US"),
+    ("US->JP->SG->HK", "US", ["JP", "SG"], "HK"),
+])
+def test_segments(engine, name, region, path, exit):
+    parsed = engine.parse(name)
+    assert (parsed.region, parsed.path, parsed.exit) == (region, path, exit)
+
+
+def test_plugin_mode_unchanged():
+    # Without segment_connectors the exit is the region, as in plugin.js
+    parsed = Engine.load().parse("加拿大 经由 香港 落地 美国")
+    assert parsed.region == parsed.exit == "US"
+
+
+def test_connector_case_folding_is_ascii(engine):
+    # As in plugin.js, "exıt" (dotless i) is not the connector "exit"
+    assert [c.kind for c in engine.lex("香港 EXIT 日本").connectors] == ["exit"]
+    assert engine.lex("香港 exıt 日本").connectors == []
+    engine.parse("香港 [exıt:JP]")
@@ -0,0 +1,23 @@
+"""Unique output names (UniqueNames) and the command line's dedupe default."""
+import pytest
+
+from nns.cli import build_parser, _dedupe
+from nns.rename import UniqueNames
+
+
+def test_numbered_names_skip_existing_names():
+    unique = UniqueNames()
+    names = ["X", "X 2", "X", "X", "X 3"]
+    assert [unique(n) for n in names] == ["X", "X 2", "X 3", "X 4", "X 3 2"]
+
+
+@pytest.mark.parametrize("flags, fmt, expected", [
+    ([], "clash", True),
+    ([], "singbox", True),
+    ([], "names", False),
+    (["--no-dedupe"], "clash", False),
+    (["--dedupe"], "names", True),
+])
+def test_dedupe_default(flags, fmt, expected):
+    args = build_parser().parse_args(["rename", *flags])
+    assert _dedupe(args, fmt) is expected
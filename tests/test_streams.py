@@ -0,0 +1,62 @@
+"""Group references in the Clash and sing-box writers (nns.streams)."""
+import io
+import json
+
+import pytest
+
+from nns.streams import rename_clash, rename_singbox
+
+NAMES = {"hk": "🇭🇰 香港 01", "jp": "🇯🇵 日本 01", "ad": None}
+
+
+def rename(name):
+    return NAMES.get(name, name)
+
+
+CLASH_PROXIES = """proxies:
+  - {name: hk, type: ss, server: a, port: 1}
+  - name: jp
+    type: ss
+    server: b
+    port: 2
+  - {name: ad, type: ss, server: c, port: 3}
+"""
+CLASH_GROUPS = """proxy-groups:
+  - name: auto
+    type: url-test
+    proxies:
+      - hk
+      - ad
+      - DIRECT
+  - {name: select, type: select, proxies: [auto, jp, ad]}
+"""
+
+
+@pytest.mark.parametrize("document", [
+    CLASH_PROXIES + CLASH_GROUPS,
+    # Groups before the proxies are held until the proxies have been renamed
+    CLASH_GROUPS + CLASH_PROXIES,
+])
+def test_clash_groups(document):
+    yaml = pytest.importorskip("yaml")
+    out = yaml.safe_load("".join(rename_clash(io.StringIO(document + "rules:\n  - MATCH,select\n"), rename)))
+    assert [p["name"] for p in out["proxies"]] == ["🇭🇰 香港 01", "🇯🇵 日本 01"]
+    assert [g["proxies"] for g in out["proxy-groups"]] == [
+        ["🇭🇰 香港 01", "DIRECT"],
+        ["auto", "🇯🇵 日本 01"],
+    ]
+
+
+def test_singbox_groups():
+    config = {"outbounds": [
+        {"type": "selector", "tag": "select", "outbounds": ["auto", "jp", "ad"], "default": "ad"},
+        {"type": "urltest", "tag": "auto", "outbounds": ["hk", "jp"]},
+        {"type": "ss", "tag": "hk"},
+        {"type": "ss", "tag": "jp"},
+        {"type": "ss", "tag": "ad"},
+        {"type": "direct", "tag": "direct"},
+    ], "route": {"final": "select"}}
+    out = json.loads("".join(rename_singbox(io.StringIO(json.dumps(config, indent=2)), rename, chunk_size=16)))
+    assert [o["tag"] for o in out["outbounds"]] == ["select", "auto", "🇭🇰 香港 01", "🇯🇵 日本 01", "direct"]
+    assert out["outbounds"][0] == {"type": "selector", "tag": "select", "outbounds": ["auto", "🇯🇵 日本 01"]}
+    assert out["outbounds"][1]["outbounds"] == ["🇭🇰 香港 01", "🇯🇵 日本 01"]